@@ -1,44 +1,104 @@
-import openai
 import base64  
+import importlib
 import streamlit as st
-import numpy as np
-import queue
-import tempfile
-import wave
+import threading
 import time
-import re
 import os
+import uuid
 from dotenv import load_dotenv  # ✅ Import dotenv
-from pydub import AudioSegment
-from audiorecorder import audiorecorder
-import io
-
-# ✅ Load environment variables from .env file
-load_dotenv()
-
-# ✅ Get API keys and secrets
-openai.api_key = os.getenv("OPENAI_API_KEY")
-prompt_text = os.getenv("AI_PROMPT_TEXT")
-korean_profanity_list = os.getenv("KOREAN_PROFANITY", "").split(",")
+import sys
+
+# ✅ Shared helpers live in backend/ (imported flat, like the backend does)
+# ⚡ Heavy modules (numpy audio helpers, the recorder, the OpenAI SDK) are imported where they are first used
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+from context_window import create_compactor, summary_prompt
+from tts_cache import create_tts_cache
+from profanity import ModerationPolicy, ProfanityFilter
+from turn_pipeline import run_turn_sync
+from providers import BlockingProvider, create_provider
+from metrics import failed_fast, log_payload, serve_metrics, span
+from moderation_batcher import create_moderation_batcher
+from scheduler import UpstreamUnavailable, create_scheduler
+from shared_cache import create_shared_cache
+from analytics import create_analytics
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# ✅ Load environment variables from .env file, once per server process (Streamlit reruns this script on every click)
+@st.cache_resource
+def load_settings():
+    load_dotenv()
+    settings = {
+        "prompt_text": os.getenv("AI_PROMPT_TEXT"),
+        "korean_profanity_list": os.getenv("KOREAN_PROFANITY", "").split(","),
+    }
 
-# ✅ Debugging: Check if secrets are loaded
-if openai.api_key:
-    print("✅ API Key loaded successfully.")
-else:
-    print("❌ Failed to load API Key!")
+    # ✅ Debugging: Check if secrets are loaded
+    if os.getenv("OPENAI_API_KEY"):
+        print("✅ API Key loaded successfully.")
+    else:
+        print("❌ Failed to load API Key!")
 
-if prompt_text:
-    print("✅ Prompt text loaded successfully.")
-else:
-    print("❌ Failed to load prompt text!")
+    if settings["prompt_text"]:
+        print("✅ Prompt text loaded successfully.")
+    else:
+        print("❌ Failed to load prompt text!")
 
-if korean_profanity_list:
-    print("✅ Profanity list loaded successfully.")
-else:
-    print("❌ Failed to load profanity list!")
+    if settings["korean_profanity_list"]:
+        print("✅ Profanity list loaded successfully.")
+    else:
+        print("❌ Failed to load profanity list!")
+    return settings
 
-# Audio queue for real-time recording
-q = queue.Queue()
+# ✅ Get API keys and secrets
+settings = load_settings()
+prompt_text = settings["prompt_text"]
+korean_profanity_list = settings["korean_profanity_list"]
+
+# 🔌 Chat / moderation / speech vendor (LLM_PROVIDER=openai | stub, LLM_CASSETTE for record/replay)
+# 🚦 Every call goes through the upstream scheduler (UPSTREAM_* caps, deadlines, retries, breaker)
+@st.cache_resource
+def get_provider():
+    return BlockingProvider(create_provider(), create_scheduler())
+
+# 🗄️ Cache tier shared with the other app / backend processes on this machine (SHARED_CACHE_DB)
+@st.cache_resource
+def get_shared_cache():
+    return create_shared_cache()
+
+# 📈 Stage timings (STT, TTS, moderation, upstream) as Prometheus metrics when METRICS_PORT is set
+@st.cache_resource
+def start_metrics_server():
+    port = os.getenv("METRICS_PORT")
+    return serve_metrics(int(port)) if port else None
+
+start_metrics_server()
+
+# ⚡ Import the heavy modules in the background while the learner fills in the first form
+@st.cache_resource
+def warm_up_imports():
+    def load():
+        for name in ("openai", "numpy", "audio_utils", "vad", "reply_cache"):
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+    thread = threading.Thread(target=load, name="warm-up-imports", daemon=True)
+    thread.start()
+    return thread
+
+warm_up_imports()
+
+# 📒 Turns, strikes, STT/TTS durations and topic choices for progress tracking (ANALYTICS_DB)
+# Events go to a bounded queue; a background thread writes them in batches
+@st.cache_resource
+def get_analytics():
+    return create_analytics()
+
+def track(kind, **data):
+    """Queue an analytics event for this learner and conversation (never waits on the database)."""
+    analytics = get_analytics()
+    if analytics:
+        analytics.record(kind, st.session_state.get("learner_id"), st.session_state.get("conversation_id"), **data)
 
 # 🔹 Initialize session state variables **at the start**
 if "chat_active" not in st.session_state:
@@ -47,44 +107,54 @@ if "conversation_history" not in st.session_state:
     st.session_state.conversation_history = []
 if "response_count" not in st.session_state:
     st.session_state.response_count = 0
+if "autoplayed_count" not in st.session_state:
+    st.session_state.autoplayed_count = 0  # Assistant replies already autoplayed
 if "strike_count" not in st.session_state:
     st.session_state.strike_count = 0  # Track user warnings
 if "user_info" not in st.session_state:
     st.session_state.user_info = None
 if "custom_prompts" not in st.session_state:
     st.session_state.custom_prompts = None
+if "learner_id" not in st.session_state:
+    st.session_state.learner_id = uuid.uuid4().hex  # opaque: learners sharing a name stay apart
 
 # Profanity warning system (3 strikes)
 if "strike_count" not in st.session_state:
     st.session_state.strike_count = 0  # Track user warnings
 
-def callback(indata, frames, time, status):
-    """Callback function to store audio data"""
-    if status:
-        print(status)
-    q.put(indata.copy())
-
 # ✅ Define OpenAI Moderation API function
+@st.cache_resource
+def get_moderation_batcher():
+    # Lives on the provider's event loop, shared by every browser session of this server
+    provider = get_provider()
+
+    async def moderate_batch(texts):
+        return await provider.scheduler.call("moderation", lambda: provider.provider.moderate_batch(texts))
+
+    return create_moderation_batcher(moderate_batch, shared=get_shared_cache())
+
+def moderate_remote(text):
+    """OpenAI Moderation API: (flagged, flagged_categories), micro-batched across concurrent sessions"""
+    return get_provider().run(get_moderation_batcher().moderate(text))
+
+# ✅ Profanity automaton is compiled once per server process, not on every rerun
+@st.cache_resource
+def get_moderation_policy():
+    return ModerationPolicy(
+        ProfanityFilter(korean_profanity_list),
+        moderate_remote,
+        mode=os.getenv("PROFANITY_REMOTE_POLICY", "tiered"),  # always | tiered | deferred
+    )
+
 def check_profanity(text):
     """Check for inappropriate content using a custom Korean profanity list & OpenAI Moderation API."""
-       
-    # ✅ Check for Korean curse words first
-    flagged_words = [word for word in korean_profanity_list if word in text]
-
-    # ✅ OpenAI Moderation API Check
-    response = openai.moderations.create(input=text, model="text-moderation-latest")
-    result = response.results[0]
-    flagged = result.flagged  # True if inappropriate content is detected
-    
-    # ✅ Fix: Convert categories to dictionary & handle None values
-    categories_dict = result.categories.model_dump()
-    flagged_categories = [category for category, score in categories_dict.items() if score is not None and score > 0.5]
-
-    # ✅ If any profanity is found (either from custom list or API), return flagged status
-    if flagged_words or flagged:
-        return True, flagged_categories, flagged_words  # ✅ Return flagged status, categories, & detected words
-    else:
-        return False, [], []  # ✅ No flagged words detected
+    # ✅ Local jamo-aware match first; the remote API is only called when it can change the outcome
+    policy = get_moderation_policy()
+    with span("moderation", policy.mode):
+        result = policy.check(text)
+    if os.getenv("PROFANITY_STATS"):
+        print("📊 Moderation stats:", policy.report(), get_moderation_batcher().report())
+    return result  # ✅ (flagged, categories, detected words)
     
 # ✅ Function to autoplay audio in Streamlit
 def autoplay_audio(audio_path):
@@ -109,111 +179,119 @@ def autoplay_audio(audio_path):
 def suggest_better_response(user_input):
     """Use AI to suggest a better, appropriate response instead of blocking."""
     prompt = f"사용자가 부적절한 내용을 입력했습니다: '{user_input}'. 이를 정중하게 바꾸고, 대화에 적절한 방식으로 다시 표현해주세요."
-    response = openai.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=[{"role": "system", "content": prompt}]
+    return get_provider().chat([{"role": "system", "content": prompt}], model="gpt-4-turbo", endpoint="suggest")
+
+# ✅ Token-budgeted context: old turns are folded into a cached rolling summary
+@st.cache_resource
+def get_compactor():
+    return create_compactor()
+
+def summarize_turns(previous_summary, turns):
+    """Fold older turns into the rolling conversation summary."""
+    summary = get_provider().chat(
+        summary_prompt(previous_summary, turns),
+        model=os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4-turbo"),
+        temperature=0,
+        endpoint="summary"
     )
-    return response.choices[0].message.content
+    return summary.strip()
 
-# ✅ Define chatbot response function
-def chatbot_response(conversation_history):
-    """Generate chatbot response using OpenAI GPT-4"""
-    print("📡 Sending message history to GPT-4:", conversation_history)  # Debugging
+# ✅ Early-turn replies of the predefined topics, shared by every browser session (REPLY_CACHE=1)
+@st.cache_resource
+def get_reply_cache():
+    from reply_cache import create_reply_cache  # numpy
 
-    response = openai.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=conversation_history
-    )
+    return create_reply_cache()
 
-    chatbot_reply = response.choices[0].message.content
-    print("🤖 GPT-4 Response:", chatbot_reply)  # Debugging
+# ✅ Define chatbot response function
+def chatbot_response(conversation_history, compactor=None, reply_cache=None, allowed=None):
+    """Generate chatbot response using OpenAI GPT-4 (cached only once `allowed`, the moderation verdict, is True)"""
+    reply_cache = reply_cache or get_reply_cache()
+    cached = reply_cache.get(conversation_history) if reply_cache else None
+    if cached is not None:
+        log_payload("🔁 Cached response:", cached)
+        return cached
+
+    start = time.perf_counter()
+    messages = (compactor or get_compactor()).compact(conversation_history, summarize_turns)
+    log_payload("📡 Sending message history to GPT-4:", messages)  # LOG_PAYLOADS=1 to debug
+
+    try:
+        chatbot_reply = get_provider().chat(messages, model="gpt-4-turbo")
+    except UpstreamUnavailable as e:
+        # 🚦 Overloaded / circuit open / deadline passed: answer right away instead of hanging
+        failed_fast("streamlit", e)
+        return "⚠️ 지금 사용자가 많아요. 잠시 후 다시 말해 주세요."
+    log_payload("🤖 GPT-4 Response:", chatbot_reply)
+    if reply_cache:
+        reply_cache.put_when(allowed, conversation_history, chatbot_reply.strip(), time.perf_counter() - start)
+        if os.getenv("PROFANITY_STATS"):
+            print("📊 Reply cache stats:", reply_cache.report())
     return chatbot_reply
 
-def record_audio():
-    """Records audio using streamlit-audiorecorder and saves it as a WAV file."""
-    st.write("🎙️ **녹음 시작! (15초 동안 자동으로 녹음됩니다)**")
-    
-    # 🎙️ Start recording immediately
-    audio = audiorecorder()
-    
-    # ✅ If recorded audio is available
-    if audio is not None and len(audio.raw_data) > 0:
-        st.write("✅ **녹음 완료!** 텍스트 변환 중...")
-        st.audio(audio.raw_data, format="audio/wav")  # Play recorded audio
-        
-        # ✅ Save recorded audio as a temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmpfile:
-            tmpfile_path = tmpfile.name
-            
-            # ✅ Convert recorded data to WAV format using PyDub
-            audio_segment = AudioSegment.from_raw(io.BytesIO(audio.raw_data), sample_width=2, frame_rate=44100, channels=2)
-            audio_segment.export(tmpfile_path, format="wav")
-            
-            return tmpfile_path  # ✅ Return saved file path
+def transcribe_audio_whisper_api(audio_files):
+    """Send in-memory audio segments ([(filename, bytes)]) to OpenAI Whisper API and return transcribed text"""
+    def transcribe(audio_file):
+        return get_provider().transcribe(audio_file, model="whisper-1")
 
+    if len(audio_files) == 1:
+        return transcribe(audio_files[0])
 
-    
-    st.error("🚨 **Recording Failed!** No audio captured.")
-    return None  # Return None if recording fails
+    # ✅ Long utterances: transcribe segments concurrently, join in order
+    with ThreadPoolExecutor(max_workers=len(audio_files)) as pool:
+        return " ".join(pool.map(transcribe, audio_files))
 
-def transcribe_audio_whisper_api(audio_path):
-    """Send audio file to OpenAI Whisper API and return transcribed text"""
-    with open(audio_path, "rb") as audio_file:
-        response = openai.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file
-        )
-    return response.text
+# ✅ TTS results are cached on disk by (text, voice, model), shared across reruns
+TTS_MODEL = "tts-1"
+TTS_VOICE = "alloy"  # Choose from: alloy, nova, shimmer, echo
+
+@st.cache_resource
+def get_tts_cache():
+    return create_tts_cache(shared=get_shared_cache())
 
 # ✅ Define Whisper TTS function
 def whisper_tts(text):
-    """Convert chatbot response to speech using OpenAI's TTS API with a 1-second delay and autoplay."""
-    response = openai.audio.speech.create(
-        model="tts-1",
-        voice="alloy",  # Choose from: alloy, nova, shimmer, echo
-        input=text
-    )
-    
-    # Save the audio response
-    audio_path = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3").name
-    with open(audio_path, "wb") as audio_file:
-        audio_file.write(response.content)
-
-    # ⏳ Add a 1-second delay before playing
-    time.sleep(1)
+    """Convert chatbot response to speech using OpenAI's TTS API (cached; synthesized once per text)."""
+    def synthesize(text):
+        return get_provider().speech(text, voice=TTS_VOICE, model=TTS_MODEL)
 
-    return audio_path
+    return get_tts_cache().get_or_create(text, TTS_VOICE, TTS_MODEL, synthesize)
 
 # ✅ Function to autoplay audio in Streamlit
 def record_audio():
-    """Automatically records audio for 15 seconds when the button is pressed."""
+    """Records audio until the learner stops, trims silence and splits it into upload-ready segments."""
+    # ⚡ Recorder (pydub) and the numpy audio helpers load on the first recording, not on every page
+    from audiorecorder import audiorecorder
+    from audio_utils import TARGET_RATE, encode_for_upload, encode_wav, to_mono_16k
+    from vad import split_for_transcription, trim_silence
 
-    st.write("🎙️ **녹음 시작! (15초 동안 자동으로 녹음됩니다)**")
+    st.write("🎙️ **녹음 시작! 말을 마치면 녹음 종료 버튼을 눌러주세요.**")
     
-    # 🎙️ Start recording immediately
-    audio = audiorecorder("녹음 중... ⏳ (자동 15초 후 종료)", "🎤 녹음 종료")
-
-    # ✅ Wait for 15 seconds to capture full recording
-    time.sleep(15)
+    # 🎙️ Start recording immediately (returns as soon as the learner stops)
+    audio = audiorecorder("녹음 중... ⏳", "🎤 녹음 종료")
 
     # ✅ If recorded audio is available
     if audio and len(audio) > 0:
         st.write("✅ **녹음 완료!** 텍스트 변환 중...")
-        st.audio(audio.export().read(), format="audio/wav")  # Play recorded audio
-        
-        # ✅ Save recorded audio as a temp file
+        # ✅ Keep everything in memory: 16 kHz mono, dead air trimmed, no temp files
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmpfile:
-                tmpfile_path = tmpfile.name
-                
-                # ✅ Convert recorded data to WAV format using PyDub
-                audio_segment = AudioSegment.from_file(audio.export(), format="wav")
-                audio_segment.export(tmpfile_path, format="wav")
-
-                return tmpfile_path  # ✅ Return saved file path
+            samples = to_mono_16k(audio.raw_data, audio.frame_rate, audio.channels, audio.sample_width)
+            samples = trim_silence(samples, TARGET_RATE)
+            if len(samples) == 0:
+                st.error("🚨 **음성이 감지되지 않았습니다.** 다시 녹음해 주세요.")
+                return None
+
+            fmt = os.getenv("AUDIO_UPLOAD_FORMAT", "wav")
+            audio_files = [
+                encode_for_upload(segment, fmt, name=f"speech_{i}")
+                for i, segment in enumerate(split_for_transcription(samples, TARGET_RATE))
+            ]
         except Exception as e:
-            st.error(f"🚨 **Audio Save Error:** {e}")
+            st.error(f"🚨 **Audio Conversion Error:** {e}")
             return None
+
+        st.audio(encode_wav(samples), format="audio/wav")  # Play recorded (trimmed) audio
+        return audio_files  # ✅ Return [(filename, bytes)] segments
     
     st.error("🚨 **Recording Failed!** No audio captured.")
     return None  # Return None if recording fails
@@ -281,11 +359,15 @@ if st.session_state.user_info and st.session_state.custom_prompts is None:
 
     user_info_text = "\n".join([f"{k}: {v}" for k, v in st.session_state.user_info.items()])
     
-    response = openai.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=[{"role": "system", "content": prompt_text}]
-    )
-    custom_prompts = response.choices[0].message.content.split("\n")
+    try:
+        custom_prompts = get_provider().chat(
+            [{"role": "system", "content": prompt_text}],
+            model="gpt-4-turbo",
+            endpoint="scenarios"
+        ).split("\n")
+    except UpstreamUnavailable as e:
+        st.error(f"🚦 지금 사용자가 많아요. {max(1, round(e.retry_after))}초 후에 다시 시도해 주세요.")
+        st.stop()
 
     st.session_state.custom_prompts = custom_prompts
     st.rerun()
@@ -315,51 +397,98 @@ if st.session_state.custom_prompts:
             {"role": "assistant", "content": prompts[selected_prompt]}
         ]
         st.session_state.response_count = 0
+        st.session_state.autoplayed_count = 0
         st.session_state.chat_active = True
+        st.session_state.conversation_id = uuid.uuid4().hex
+        track("scenario", topic=selected_prompt, opening_line=prompts[selected_prompt])
         st.rerun()
 
 # **Step 4: Conversation Mode **
 if st.session_state.chat_active:
     st.write("💬 **대화 기록**:")
-    for msg in st.session_state.conversation_history:
+    history = st.session_state.conversation_history
+    assistant_total = sum(1 for m in history if m["role"] == "assistant")
+    assistant_seen = 0
+    for msg in history:
         if msg["role"] == "user":
             st.markdown(f"👤 **You:** {msg['content']}")
         elif msg["role"] == "assistant":
             st.markdown(f"🤖 **Chatbot:** {msg['content']}")
-            
-            # 🔄 Autoplay the response with delay
-            tts_audio = whisper_tts(msg["content"])
-            autoplay_audio(tts_audio)
+            assistant_seen += 1
+
+            if assistant_seen == assistant_total:
+                # 🔄 Only the newest reply is synthesized/autoplayed, and only once
+                tts_start = time.perf_counter()
+                tts_audio = whisper_tts(msg["content"])
+                if st.session_state.get("autoplayed_count", 0) < assistant_total:
+                    track("tts", ms=round((time.perf_counter() - tts_start) * 1000, 1), chars=len(msg["content"]))
+                    autoplay_audio(tts_audio)
+                    st.session_state.autoplayed_count = assistant_total
+                else:
+                    st.audio(tts_audio, format="audio/mp3")
+            else:
+                # Older replies: replay from cache only, never re-synthesize
+                cached_audio = get_tts_cache().get(msg["content"], TTS_VOICE, TTS_MODEL)
+                if cached_audio:
+                    st.audio(cached_audio, format="audio/mp3")
 
     st.write(f"⏳ **진행 상황:** {st.session_state.response_count + 1} / 5 회")
 
+    # ⏱️ Per-stage timings of the last turn (STT, moderation, reply) when SHOW_TIMINGS=1
+    if os.getenv("SHOW_TIMINGS") == "1" and st.session_state.get("last_timings"):
+        st.caption("⏱️ " + ", ".join(f"{k}: {v}" for k, v in st.session_state.last_timings.items()))
+
     if st.session_state.response_count < 5:
-        if st.button("🎙️ 음성 녹음 시작 (15초)"):
-            with st.spinner("🎤 녹음 중... 15초 동안 말해주세요."):
-                recorded_audio_path = None
-                while recorded_audio_path is None:
-                    recorded_audio_path = record_audio()
+        if st.button("🎙️ 음성 녹음 시작"):
+            with st.spinner("🎤 녹음 중... 말해주세요."):
+                recorded_audio = None
+                while recorded_audio is None:
+                    recorded_audio = record_audio()
 
-                    if recorded_audio_path is None:
+                    if recorded_audio is None:
                         if st.button("🔄 다시 녹음하기"):
                             st.write("🔄 **녹음을 다시 시도합니다...**")
-                            recorded_audio_path = record_audio()  # Try recording again
+                            recorded_audio = record_audio()  # Try recording again
                         else:
                             st.stop()  # Stop execution if user doesn't want to retry
 
             st.write("📡 텍스트로 변환 중...")
-            if recorded_audio_path:
-                korean_text = transcribe_audio_whisper_api(recorded_audio_path)
+            if recorded_audio:
+                stt_start = time.perf_counter()
+                korean_text = transcribe_audio_whisper_api(recorded_audio)
+                stt_ms = round((time.perf_counter() - stt_start) * 1000, 1)
+                track("stt", ms=stt_ms, segments=len(recorded_audio))
             else:
                 st.error("🚨 **Recording Failed!** No valid audio file found.")
                 st.stop()
             
 
-            # 🚨 Check for profanity & get flagged categories and words
-            flagged, flagged_categories, flagged_words = check_profanity(korean_text)
+            # 🚨 Check for profanity while the reply is already being generated (discarded if flagged)
+            compactor = get_compactor()  # resolve on the script thread; the reply runs on a worker
+            reply_cache = get_reply_cache()
+            last_strike = st.session_state.strike_count + 1 >= 3
+            allowed = Future()  # the speculative reply is cached only if the turn is not flagged
+            try:
+                turn = run_turn_sync(
+                    korean_text,
+                    st.session_state.conversation_history,
+                    moderate=check_profanity,
+                    reply=lambda messages: chatbot_response(messages, compactor, reply_cache, allowed),
+                    rewrite=lambda text: None if last_strike else suggest_better_response(text),
+                    timings={"stt_ms": stt_ms},
+                )
+                allowed.set_result(not turn["flagged"])
+            finally:
+                allowed.cancel()  # no-op once the verdict is set
+            flagged, flagged_categories, flagged_words = turn["flagged"], turn["flagged_categories"], turn["flagged_words"]
+            st.session_state.last_timings = turn["timings"]
+            print("⏱️ Turn timings (ms):", turn["timings"])
+            track("turn", user=korean_text, reply=turn["reply"], flagged=flagged, timings=turn["timings"])
 
             if flagged:
                 st.session_state.strike_count += 1
+                track("strike", count=st.session_state.strike_count, text=korean_text,
+                      categories=flagged_categories, words=flagged_words)
 
                 # 🚨 Show warning with flagged words & categories
                 warning_message = f"⚠️ **경고!** 부적절한 표현이 감지되었습니다.\n"
@@ -388,7 +517,7 @@ if st.session_state.chat_active:
                     # ✅ Stop further execution so that the user sees the button
                     st.stop()
                 else:
-                    alternative_response = suggest_better_response(korean_text)
+                    alternative_response = turn["alternative"]
 
                     # 🔄 Change the chatbot's system prompt based on strike count
                     if st.session_state.strike_count == 1:
@@ -407,7 +536,7 @@ if st.session_state.chat_active:
                 st.write(f"👤 **You:** {korean_text}")
                 st.session_state.conversation_history.append({"role": "user", "content": korean_text})
 
-                chatbot_reply = chatbot_response(st.session_state.conversation_history)
+                chatbot_reply = turn["reply"]
                 st.session_state.conversation_history.append({"role": "assistant", "content": chatbot_reply})
                 # ✅ Force UI update to display chatbot reply
                 st.rerun()
@@ -0,0 +1,247 @@
+import argparse
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+
+from metrics import registry
+
+analytics_events = registry.counter(
+    "chatbot_analytics_events_total", "Analytics events by kind and outcome (queued, written, dropped)",
+    ("kind", "result"),
+)
+
+# Event kinds: turn, strike, stt, tts, scenario
+POLICIES = ("drop_newest", "drop_oldest", "block")
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY, ts REAL NOT NULL, kind TEXT NOT NULL,
+    learner TEXT, session TEXT, data TEXT NOT NULL)"""
+
+
+class AnalyticsWriter:
+    """Append-only event log (turns, strikes, STT/TTS durations, scenario choices) in a SQLite-WAL file.
+
+    `record` only appends to a bounded in-memory queue; a background thread
+    writes the queue in batches of up to `batch_size` rows, at least every
+    `flush_interval` seconds. When the queue is full, `policy` decides:
+    drop the new event (drop_newest, the default), drop the oldest queued
+    one (drop_oldest), or wait up to `block_timeout` seconds for room and
+    then drop it (block).
+    """
+
+    def __init__(self, path: str, max_queue: int = 10000, batch_size: int = 256,
+                 flush_interval: float = 1.0, policy: str = "drop_newest", block_timeout: float = 0.05):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown analytics queue policy {policy!r} (expected one of {POLICIES})")
+        self.path = path
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(SCHEMA)
+        self._db.execute("CREATE INDEX IF NOT EXISTS events_learner ON events(learner, ts)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS events_session ON events(session, ts)")
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._flushing = False
+        self.stats = {"queued": 0, "written": 0, "dropped": 0, "batches": 0, "max_batch": 0,
+                      "write_errors": 0, "write_seconds": 0.0}
+        self._thread = threading.Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, kind: str, learner: str = None, session: str = None, **data) -> bool:
+        """Queue one event; False when it was dropped. Never touches the database."""
+        row = (time.time(), kind, learner, session, json.dumps(data, ensure_ascii=False, default=str))
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._queue) >= self.max_queue and self.policy == "block":
+                self._cond.wait_for(lambda: len(self._queue) < self.max_queue, timeout=self.block_timeout)
+            if len(self._queue) >= self.max_queue:
+                if self.policy != "drop_oldest":
+                    self._dropped(kind)
+                    return False
+                self._dropped(self._queue.popleft()[1])
+            self._queue.append(row)
+            self.stats["queued"] += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+        analytics_events.inc(kind=kind, result="queued")
+        return True
+
+    def _dropped(self, kind: str):
+        self.stats["dropped"] += 1
+        analytics_events.inc(kind=kind, result="dropped")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._queue) >= self.batch_size or self._closed or self._flushing,
+                                    timeout=self.flush_interval)
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                self._flushing = self._flushing and bool(self._queue)
+                done = self._closed and not self._queue
+                self._cond.notify_all()  # room again for producers waiting under the "block" policy
+            if batch:
+                self._write(batch)
+            if done:
+                return
+
+    def _write(self, batch: list):
+        start = time.perf_counter()
+        try:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.executemany("INSERT INTO events (ts, kind, learner, session, data) VALUES (?, ?, ?, ?, ?)",
+                                     batch)
+        except sqlite3.Error as e:
+            print("❌ Analytics write failed:", e)
+            self.stats["write_errors"] += 1
+            for row in batch:
+                self._dropped(row[1])
+            return
+        self.stats["write_seconds"] += time.perf_counter() - start
+        self.stats["written"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        for kind, n in Counter(row[1] for row in batch).items():
+            analytics_events.inc(n, kind=kind, result="written")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is written (for tests, benchmarks and shutdown)."""
+        target = self.stats["queued"]
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+        while self.stats["written"] + self.stats["dropped"] < target and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.stats["written"] + self.stats["dropped"] >= target
+
+    def close(self, timeout: float = 5.0):
+        """Stop accepting events, write what is queued and stop the writer thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def report(self) -> dict:
+        batches = self.stats["batches"]
+        return {**self.stats, "queue": len(self._queue), "max_queue": self.max_queue, "policy": self.policy,
+                "avg_batch": self.stats["written"] / batches if batches else 0.0}
+
+
+class AnalyticsReader:
+    """Per-learner queries on the analytics file, over its own read-only connection.
+
+    WAL readers never wait for the writer thread (nor it for them), so
+    queries stay off the request path of chat turns.
+    """
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    # A learner's events, including session turns recorded without a learner id
+    # (sessions are tied to a learner by their "scenario" event)
+    _LEARNER = """(learner = ? OR session IN (
+        SELECT session FROM events WHERE learner = ? AND kind = 'scenario' AND session IS NOT NULL))"""
+
+    def history(self, learner: str = None, session: str = None, kinds: list = None,
+                since: float = None, limit: int = 200) -> list:
+        """Newest-first events of a learner and/or session."""
+        where, params = [], []
+        if learner is not None:
+            where.append(self._LEARNER)
+            params += [learner, learner]
+        if session is not None:
+            where.append("session = ?")
+            params.append(session)
+        if kinds:
+            where.append(f"kind IN ({','.join('?' * len(kinds))})")
+            params += list(kinds)
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        sql = "SELECT ts, kind, learner, session, data FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY ts DESC LIMIT ?", params + [limit]).fetchall()
+        return [{"ts": ts, "kind": kind, "learner": who, "session": sid, **json.loads(data)}
+                for ts, kind, who, sid, data in rows]
+
+    def progress(self, learner: str) -> dict:
+        """Totals for a learner: conversations, turns, strikes, average STT/TTS time, scenarios picked."""
+        with self._lock:
+            rows = self._db.execute(f"SELECT ts, kind, session, data FROM events WHERE {self._LEARNER}",
+                                    (learner, learner)).fetchall()
+        kinds = Counter(kind for _, kind, _, _ in rows)
+        durations = {"stt": [], "tts": []}
+        scenarios = []
+        for _, kind, _, data in rows:
+            if kind in durations:
+                durations[kind].append(json.loads(data).get("ms", 0))
+            elif kind == "scenario":
+                scenarios.append(json.loads(data).get("topic"))
+        turns = kinds["turn"]
+        return {
+            "learner": learner,
+            "conversations": len({sid for _, _, sid, _ in rows if sid}),
+            "turns": turns,
+            "strikes": kinds["strike"],
+            "strike_rate": kinds["strike"] / turns if turns else 0.0,
+            "avg_stt_ms": sum(durations["stt"]) / len(durations["stt"]) if durations["stt"] else None,
+            "avg_tts_ms": sum(durations["tts"]) / len(durations["tts"]) if durations["tts"] else None,
+            "scenarios": Counter(scenarios).most_common(),
+            "first_seen": min((ts for ts, _, _, _ in rows), default=None),
+            "last_seen": max((ts for ts, _, _, _ in rows), default=None),
+        }
+
+
+def create_analytics():
+    """AnalyticsWriter at ANALYTICS_DB (e.g. analytics.db), or None when analytics are off."""
+    path = os.getenv("ANALYTICS_DB")
+    if not path:
+        return None
+    return AnalyticsWriter(
+        path,
+        max_queue=int(os.getenv("ANALYTICS_MAX_QUEUE", "10000")),
+        batch_size=int(os.getenv("ANALYTICS_BATCH_SIZE", "256")),
+        flush_interval=float(os.getenv("ANALYTICS_FLUSH_SECONDS", "1.0")),
+        policy=os.getenv("ANALYTICS_QUEUE_POLICY", "drop_newest"),
+        block_timeout=float(os.getenv("ANALYTICS_BLOCK_MS", "50")) / 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Learner history / progress from the analytics file")
+    parser.add_argument("command", choices=["history", "progress"])
+    parser.add_argument("learner")
+    parser.add_argument("--db", default=os.getenv("ANALYTICS_DB", "analytics.db"))
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    reader = AnalyticsReader(args.db)
+    if args.command == "progress":
+        print(json.dumps(reader.progress(args.learner), ensure_ascii=False, indent=2))
+        return
+    for event in reversed(reader.history(args.learner, limit=args.limit)):
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(event.pop("ts")))
+        print(stamp, event.pop("kind"), json.dumps(event, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import io
+import wave
+
+import numpy as np
+
+TARGET_RATE = 16000  # Whisper works at 16 kHz mono internally
+
+
+def pcm_to_float(raw: bytes, sample_width: int = 2, channels: int = 1) -> np.ndarray:
+    """Interleaved little-endian PCM bytes -> float32 array of shape (frames, channels) in [-1, 1]."""
+    if sample_width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    elif sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    frames = len(samples) // channels
+    return samples[:frames * channels].reshape(frames, channels)
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """(frames, channels) -> mono (frames,)"""
+    if samples.ndim == 1:
+        return samples
+    # Summing column views is ~10x faster than mean(axis=1) on interleaved data
+    mono = samples[:, 0].copy()
+    for c in range(1, samples.shape[1]):
+        mono += samples[:, c]
+    return mono / samples.shape[1] if samples.shape[1] > 1 else mono
+
+
+def _lowpass_kernel(cutoff: float, taps: int = 63) -> np.ndarray:
+    """Windowed-sinc low-pass FIR; `cutoff` is a fraction of the source sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(mono: np.ndarray, src_rate: int, dst_rate: int = TARGET_RATE) -> np.ndarray:
+    """Anti-aliased resampling of a mono signal (low-pass FIR, then linear interpolation)."""
+    if src_rate == dst_rate or len(mono) == 0:
+        return mono.astype(np.float32, copy=False)
+    if dst_rate < src_rate:
+        # Keep a little below the new Nyquist frequency to avoid aliasing
+        mono = np.convolve(mono, _lowpass_kernel(0.45 * dst_rate / src_rate), mode="same")
+    duration = len(mono) / src_rate
+    positions = np.arange(int(duration * dst_rate)) * (src_rate / dst_rate)
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+
+def to_int16(samples: np.ndarray) -> np.ndarray:
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+
+
+def encode_wav(samples: np.ndarray, rate: int = TARGET_RATE) -> bytes:
+    """Mono float samples -> 16-bit PCM WAV bytes, entirely in memory."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(to_int16(samples).tobytes())
+    return buffer.getvalue()
+
+
+def encode_flac(samples: np.ndarray, rate: int = TARGET_RATE) -> bytes:
+    """Mono float samples -> FLAC bytes (lossless, roughly half the size of WAV)."""
+    import soundfile  # optional dependency (in requirements.txt)
+
+    buffer = io.BytesIO()
+    soundfile.write(buffer, to_int16(samples), rate, format="FLAC", subtype="PCM_16")
+    return buffer.getvalue()
+
+
+def to_mono_16k(raw: bytes, frame_rate: int, channels: int, sample_width: int = 2) -> np.ndarray:
+    """Raw recorder PCM -> float32 mono samples at 16 kHz."""
+    return resample(downmix(pcm_to_float(raw, sample_width, channels)), frame_rate)
+
+
+def encode_for_upload(samples: np.ndarray, fmt: str = "wav", name: str = "speech") -> tuple:
+    """16 kHz mono samples -> (filename, bytes) for the transcription API.
+
+    `fmt="flac"` compresses further when soundfile is installed and falls
+    back to WAV otherwise.
+    """
+    if fmt == "flac":
+        try:
+            return f"{name}.flac", encode_flac(samples)
+        except Exception as e:
+            print("⚠️ FLAC encoding unavailable, sending WAV:", e)
+    return f"{name}.wav", encode_wav(samples)
+
+
+def prepare_for_upload(raw: bytes, frame_rate: int, channels: int, sample_width: int = 2,
+                       fmt: str = "wav") -> tuple:
+    """Raw recorder PCM -> (filename, bytes), downmixed and resampled without touching the disk."""
+    return encode_for_upload(to_mono_16k(raw, frame_rate, channels, sample_width), fmt)
@@ -0,0 +1,156 @@
+"""Analytics persistence: cost on the request path and behaviour under bursts.
+
+Simulates ``--learners`` learners each doing a conversation (scenario
+choice, then per turn STT, turn and TTS events, some strikes) from
+``--threads`` request threads (paced to ``--rate`` events/s, or as a
+burst with ``--rate 0``), while another thread queries learner
+progress. Compares:
+
+- ``sync``: one INSERT + COMMIT per event on the request thread (WAL,
+  synchronous=FULL), what writing each turn directly would cost.
+- ``queued``: ``AnalyticsWriter.record`` (bounded queue, background
+  batched writer), for each queue policy.
+
+Reports per-event latency seen by the request thread, events written /
+dropped, and progress query latency during the run.
+
+Usage (from ``backend/``):
+    python bench/analytics_writer.py --learners 2000 --threads 8 --rate 5000
+    python bench/analytics_writer.py --learners 2000 --threads 8 --rate 0 --max-queue 2000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import SCHEMA, AnalyticsReader, AnalyticsWriter  # noqa: E402
+
+
+class SyncWriter:
+    """Baseline: write and commit every event on the calling thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(SCHEMA)
+        self._db.execute("CREATE INDEX IF NOT EXISTS events_learner ON events(learner, ts)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS events_session ON events(session, ts)")
+        self._lock = threading.Lock()
+        self.stats = {"written": 0, "dropped": 0}
+
+    def record(self, kind, learner=None, session=None, **data):
+        with self._lock:
+            self._db.execute("INSERT INTO events (ts, kind, learner, session, data) VALUES (?, ?, ?, ?, ?)",
+                             (time.time(), kind, learner, session, json.dumps(data, ensure_ascii=False)))
+            self.stats["written"] += 1
+        return True
+
+    def flush(self):
+        return True
+
+    def close(self):
+        pass
+
+
+def conversation(rng: random.Random, n: int) -> list:
+    learner, session = f"learner-{n % 500}", f"s-{n}"
+    events = [("scenario", learner, session, {"topic": rng.choice(["🛒 옷 고르고 사기", "🗺️ 방향 묻기"])})]
+    for turn in range(5):
+        events.append(("stt", learner, session, {"ms": rng.uniform(300, 1500), "segments": 1}))
+        flagged = rng.random() < 0.05
+        if flagged:
+            events.append(("strike", learner, session, {"count": 1, "words": ["바보"]}))
+        events.append(("turn", learner, session, {"user": "바지 사고 싶어요 " * 3, "reply": "좋아요! " * 10,
+                                                  "flagged": flagged, "timings": {"total_ms": 900.0}}))
+        events.append(("tts", learner, session, {"ms": rng.uniform(200, 800), "chars": 60}))
+    return events
+
+
+def pct(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1e6 if values else float("nan")
+
+
+def run(writer, args) -> dict:
+    plans = [conversation(random.Random(args.seed + n), n) for n in range(args.learners)]
+    latencies = [[] for _ in range(args.threads)]
+    query_latencies = []
+    stop = threading.Event()
+
+    def request_thread(i):
+        interval = args.threads / args.rate if args.rate else 0.0
+        due = time.perf_counter()
+        for events in plans[i::args.threads]:
+            for kind, learner, session, data in events:
+                due += interval
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                start = time.perf_counter()
+                writer.record(kind, learner, session, **data)
+                latencies[i].append(time.perf_counter() - start)
+
+    def query_thread():
+        reader = AnalyticsReader(writer.path)
+        while not stop.is_set():
+            start = time.perf_counter()
+            reader.progress(f"learner-{random.randrange(500)}")
+            query_latencies.append(time.perf_counter() - start)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=request_thread, args=(i,)) for i in range(args.threads)]
+    querier = threading.Thread(target=query_thread)
+    start = time.perf_counter()
+    querier.start()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    offered = time.perf_counter() - start
+    writer.flush()
+    drained = time.perf_counter() - start
+    stop.set()
+    querier.join()
+    writer.close()
+    every = [x for per_thread in latencies for x in per_thread]
+    return {"events": len(every), "p50": pct(every, 50), "p99": pct(every, 99), "max": max(every) * 1e6,
+            "offered_s": offered, "drained_s": drained, "written": writer.stats["written"],
+            "dropped": writer.stats["dropped"], "query_p50": pct(query_latencies, 50) / 1000,
+            "query_p99": pct(query_latencies, 99) / 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics writer benchmark")
+    parser.add_argument("--learners", type=int, default=2000, help="conversations (5 turns each)")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--rate", type=float, default=0, help="offered events per second (0: as fast as possible)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<20} {'events':>7} {'p50 us':>8} {'p99 us':>8} {'max us':>9} {'offer s':>8} "
+          f"{'drain s':>8} {'written':>8} {'dropped':>8} {'query p50 ms':>13} {'query p99 ms':>13}")
+    modes = [("sync", None)] + [(f"queued/{p}", p) for p in ("drop_newest", "drop_oldest", "block")]
+    for name, policy in modes:
+        path = os.path.join(tempfile.mkdtemp(prefix="analytics_"), "analytics.db")
+        writer = SyncWriter(path) if policy is None else AnalyticsWriter(
+            path, max_queue=args.max_queue, batch_size=args.batch_size, policy=policy)
+        r = run(writer, args)
+        print(f"{name:<20} {r['events']:>7} {r['p50']:>8.1f} {r['p99']:>8.1f} {r['max']:>9.0f} "
+              f"{r['offered_s']:>8.2f} {r['drained_s']:>8.2f} {r['written']:>8} {r['dropped']:>8} "
+              f"{r['query_p50']:>13.2f} {r['query_p99']:>13.2f}")
+    print("\nlatency = time spent in record() on the request thread")
+
+
+if __name__ == "__main__":
+    main()
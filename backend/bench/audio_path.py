@@ -0,0 +1,108 @@
+"""Recorder -> transcription upload: old temp-file path vs in-memory 16 kHz mono path.
+
+The old path (what app.py used to do) exports the recorder's segment to WAV,
+decodes it again with pydub and exports the 44.1 kHz stereo result to a
+temporary WAV file, then re-opens it for upload. Without pydub the
+decode/export step is left out and the output says so. The new path downmixes
+and resamples in memory with NumPy. Prints bytes uploaded, local wall
+time, and the estimated end-to-end time including the upload at a given
+uplink speed (the upload dominates on typical learner connections).
+
+Usage (from ``backend/``):
+    python bench/audio_path.py --seconds 15 --repeat 5
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_utils import prepare_for_upload  # noqa: E402
+
+
+def synthetic_recording(seconds: float, rate: int = 44100, channels: int = 2) -> bytes:
+    """Speech-like test signal: harmonic tones with a syllable-rate envelope plus noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    voice = sum(np.sin(2 * np.pi * f * t) / k for k, f in enumerate((180, 360, 720, 1440), 1))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    mono = 0.3 * voice * envelope + 0.01 * rng.standard_normal(len(t))
+    stereo = np.repeat(mono[:, None], channels, axis=1)
+    return (np.clip(stereo, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def old_path(raw: bytes, rate: int = 44100, channels: int = 2, pydub: bool = True) -> int:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmpfile:
+        path = tmpfile.name
+    try:
+        if pydub:
+            from pydub import AudioSegment
+            # audiorecorder hands back an AudioSegment; app.py called audio.export(),
+            # decoded that with AudioSegment.from_file and exported it to the temp file
+            recorded = AudioSegment.from_raw(io.BytesIO(raw), sample_width=2, frame_rate=rate, channels=channels)
+            AudioSegment.from_file(recorded.export(format="wav"), format="wav").export(path, format="wav")
+        else:
+            with wave.open(path, "wb") as wav:
+                wav.setnchannels(channels)
+                wav.setsampwidth(2)
+                wav.setframerate(rate)
+                wav.writeframes(raw)
+        # Upload step: re-open the file from disk and read it
+        with open(path, "rb") as f:
+            return len(f.read())
+    finally:
+        os.remove(path)
+
+
+def new_path(raw: bytes, fmt: str, rate: int = 44100, channels: int = 2) -> int:
+    _, data = prepare_for_upload(raw, rate, channels, 2, fmt=fmt)
+    # Upload step: the bytes go straight into the multipart body
+    return len(io.BytesIO(data).getvalue())
+
+
+def measure(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = fn()
+        best = min(best, time.perf_counter() - start)
+    return size, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audio upload path micro-benchmark")
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--uplink-mbps", type=float, default=10, help="for the upload time estimate")
+    args = parser.parse_args()
+
+    raw = synthetic_recording(args.seconds)
+    try:
+        import pydub  # noqa: F401
+        rows = [("old: pydub -> 44.1k temp WAV", measure(lambda: old_path(raw), args.repeat))]
+    except ImportError:
+        print("(pydub not installed; old path excludes the pydub decode/export step, so its time is understated)")
+        rows = [("old: 44.1k temp WAV, no pydub", measure(lambda: old_path(raw, pydub=False), args.repeat))]
+    rows.append(("new: 16k mono WAV in memory", measure(lambda: new_path(raw, "wav"), args.repeat)))
+    try:
+        import soundfile  # noqa: F401
+        rows.append(("new: 16k mono FLAC in memory", measure(lambda: new_path(raw, "flac"), args.repeat)))
+    except ImportError:
+        print("(soundfile not installed; skipping FLAC)")
+
+    base = rows[0][1][0]
+    print(f"{args.seconds:.0f} s recording, best of {args.repeat}")
+    print(f"{'path':<30} {'bytes':>10} {'ratio':>7} {'local(ms)':>10} {'+upload(ms)':>12}")
+    for name, (size, seconds) in rows:
+        upload = size * 8 / (args.uplink_mbps * 1e6)
+        print(f"{name:<30} {size:>10} {base / size:>6.1f}x {seconds * 1000:>10.1f} {(seconds + upload) * 1000:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Cold start and rerun cost of app.py and the backend, with a per-module import-time breakdown.
+
+- ``backend``: ``import main`` in a fresh interpreter (``-X importtime``),
+  i.e. what every uvicorn worker pays before serving, broken down by the
+  modules main imports.
+- ``app``: the module-level imports of ``app.py`` (read with ``ast``, so
+  imports inside functions are not counted), in a fresh interpreter.
+  Modules that are not installed are reported and skipped.
+- ``app rerun`` (only when streamlit is installed): first run and reruns
+  of app.py with ``streamlit.testing.v1.AppTest`` and the stub provider.
+  Streamlit re-executes the whole script on every interaction.
+
+Each measurement is the median of ``--repeat`` fresh processes. Results can
+be saved as a JSON baseline and a later run compared against it (exit 1
+when a total regresses by more than ``--tolerance`` and ``--min-ms``).
+
+Usage (from ``backend/``):
+    python bench/cold_start.py --save bench/cold_start.json
+    python bench/cold_start.py --compare bench/cold_start.json
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(os.path.dirname(BACKEND), "app.py")
+
+
+def app_imports() -> list:
+    """Module-level import statements of app.py, as source lines."""
+    with open(APP, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def import_probe(statements: list) -> str:
+    """Script running each import statement, skipping (and reporting) modules that are not installed."""
+    lines = ["import sys", f"sys.path.insert(0, {BACKEND!r})", "missing = []"]
+    for stmt in statements:
+        lines += ["try:", f"    {stmt}", "except ImportError as e:", "    missing.append(e.name)"]
+    lines.append("print('MISSING ' + ','.join(m for m in missing if m))")
+    return "\n".join(lines)
+
+
+def importtime(code: str, env: dict, depth: int = 0, skip: frozenset = frozenset()) -> tuple:
+    """(total ms, {module: cumulative ms} at `depth`, missing modules, wall ms) of one fresh interpreter.
+
+    Top-level modules in `skip` (loaded by interpreter startup) count towards neither.
+    """
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND, env=env,
+                          capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    modules, total, counted = {}, 0.0, False
+    # Lines come out as imports finish (children before their parent), so walk them parent-first
+    for line in reversed(proc.stderr.splitlines()):
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        name, us = name.strip(), int(cumulative)
+        if level == 0:
+            counted = name not in skip
+            if counted:
+                total += us
+        if level == depth and counted:
+            modules[name] = modules.get(name, 0) + us / 1000
+    missing = [m for line in proc.stdout.splitlines() if line.startswith("MISSING ")
+               for m in line[8:].split(",") if m]
+    return total / 1000, modules, missing, wall
+
+
+def measure_imports(code: str, env: dict, repeat: int, depth: int = 0) -> dict:
+    startup = frozenset(importtime("pass", env)[1])
+    runs = [importtime(code, env, depth, startup) for _ in range(repeat)]
+    names = set().union(*(r[1] for r in runs))
+    modules = {n: statistics.median(r[1].get(n, 0.0) for r in runs) for n in names}
+    return {"import_ms": statistics.median(r[0] for r in runs), "process_ms": statistics.median(r[3] for r in runs),
+            "modules": dict(sorted(modules.items(), key=lambda kv: -kv[1])), "missing": runs[0][2]}
+
+
+def measure_reruns(env: dict, repeat: int, reruns: int) -> dict:
+    """First run / rerun time of app.py under streamlit's AppTest (None when streamlit is missing)."""
+    code = f"""
+import json, os, time
+os.chdir({os.path.dirname(APP)!r})
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file({APP!r}, default_timeout=60).run()
+first = time.perf_counter() - start
+times = []
+for _ in range({reruns}):
+    start = time.perf_counter()
+    at.run()
+    times.append(time.perf_counter() - start)
+print("RESULT " + json.dumps({{"first_ms": first * 1000, "rerun_ms": sorted(times)[len(times) // 2] * 1000}}))
+"""
+    results = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env, capture_output=True, text=True)
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("RESULT ")]
+        if not lines:
+            return None if "No module named 'streamlit'" in proc.stderr else {"error": proc.stderr[-500:]}
+        results.append(json.loads(lines[-1][7:]))
+    return {k: statistics.median(r[k] for r in results) for k in ("first_ms", "rerun_ms")}
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_ms: float) -> list:
+    """Human-readable regressions of the totals against a saved baseline (empty when none)."""
+    regressions = []
+    for target, result in results.items():
+        old = baseline.get(target)
+        if not old or not result:
+            continue
+        for key in ("import_ms", "first_ms", "rerun_ms"):
+            if key in result and key in old and result[key] > old[key] * (1 + tolerance) + min_ms:
+                regressions.append(f"{target} {key}: {old[key]:.0f} -> {result[key]:.0f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start / rerun benchmark with import-time breakdown")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per measurement (median)")
+    parser.add_argument("--reruns", type=int, default=10, help="app.py reruns per process (AppTest)")
+    parser.add_argument("--top", type=int, default=12, help="modules listed per target")
+    parser.add_argument("--save", help="write results to this JSON baseline")
+    parser.add_argument("--compare", help="compare against this JSON baseline (exit 1 on regression)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--min-ms", type=float, default=20, help="ignore regressions smaller than this")
+    args = parser.parse_args()
+
+    env = {**os.environ, "LLM_PROVIDER": "stub", "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "fake")}
+    for name in ("SHARED_CACHE_DB", "ANALYTICS_DB", "SCENARIO_POOL_DIR", "METRICS_PORT"):
+        env.pop(name, None)
+
+    results = {
+        "backend": measure_imports("import main", env, args.repeat, depth=1),  # what main imports
+        "app": measure_imports(import_probe(app_imports()), env, args.repeat),
+        "app_rerun": measure_reruns(env, args.repeat, args.reruns),
+    }
+    for target in ("backend", "app"):
+        r = results[target]
+        print(f"\n{target}: imports {r['import_ms']:.0f} ms (process {r['process_ms']:.0f} ms)"
+              + (f", not installed here: {', '.join(r['missing'])}" if r["missing"] else ""))
+        for name, ms in list(r["modules"].items())[:args.top]:
+            print(f"  {ms:>8.1f} ms  {name}")
+    rerun = results["app_rerun"]
+    if rerun is None:
+        print("\napp rerun: skipped (streamlit is not installed)")
+    elif "error" in rerun:
+        print("\napp rerun: failed\n" + rerun["error"])
+    else:
+        print(f"\napp rerun: first run {rerun['first_ms']:.0f} ms, rerun {rerun['rerun_ms']:.0f} ms (median)")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_ms)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"✅ no regression beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
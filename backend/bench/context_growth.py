@@ -0,0 +1,69 @@
+"""Prompt-size growth with and without context compaction.
+
+Replays a synthetic N-turn conversation and prints the prompt tokens that
+would be sent on each turn, the cumulative total, and how many summary
+calls the compactor needed. Runs offline: the summarizer is a local stub
+that returns a fixed-size summary.
+
+Usage (from ``backend/``):
+    python bench/context_growth.py --turns 60 --max-tokens 1500
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_window import ContextCompactor, count_message_tokens  # noqa: E402
+
+USER_LINES = [
+    "네, 바지 사고 싶어요. 조금 넉넉한 사이즈가 있을까요?",
+    "주말에 친구들이랑 한강에서 자전거를 탔어요.",
+    "회사에서 새로운 프로젝트를 시작해서 조금 바빠요.",
+    "한국 음식 중에서 김치찌개를 제일 좋아해요.",
+]
+BOT_LINES = [
+    "좋아요! 어떤 색을 원하세요? 요즘은 베이지색이 인기가 많아요.",
+    "와, 재미있었겠어요! 날씨는 어땠어요? 사람이 많았나요?",
+    "그렇군요. 어떤 프로젝트인지 조금 더 이야기해 줄 수 있어요?",
+    "저도 김치찌개 좋아해요. 집에서 직접 만들어 본 적 있어요?",
+]
+
+
+def stub_summarize(previous_summary: str, turns: list) -> str:
+    # A real summary is roughly constant in size; model that with ~80 tokens
+    return (previous_summary + " " + turns[-1]["content"])[-160:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Context compaction prompt-size benchmark")
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--max-tokens", type=int, default=1500)
+    parser.add_argument("--keep-recent", type=int, default=6)
+    parser.add_argument("--every", type=int, default=10, help="print every N turns")
+    args = parser.parse_args()
+
+    compactor = ContextCompactor(max_tokens=args.max_tokens, keep_recent=args.keep_recent)
+    history = [
+        {"role": "system", "content": "당신은 친절한 한국어 대화 파트너입니다. 답변은 2~3문장으로 짧고 명확하게 하세요."},
+        {"role": "assistant", "content": "안녕하세요 손님! 무슨 옷을 사고 싶으신가요?"},
+    ]
+
+    total_full = total_compact = 0
+    print(f"{'turn':>5} {'full':>8} {'compacted':>10} {'cum full':>10} {'cum compacted':>14}")
+    for turn in range(1, args.turns + 1):
+        history.append({"role": "user", "content": USER_LINES[turn % len(USER_LINES)]})
+        full = count_message_tokens(history)
+        compacted = count_message_tokens(compactor.compact(history, stub_summarize))
+        total_full += full
+        total_compact += compacted
+        if turn % args.every == 0 or turn == args.turns:
+            print(f"{turn:>5} {full:>8} {compacted:>10} {total_full:>10} {total_compact:>14}")
+        history.append({"role": "assistant", "content": BOT_LINES[turn % len(BOT_LINES)]})
+
+    print(f"\nprompt tokens saved: {1 - total_compact / total_full:.0%}")
+    print(f"compactor stats: {compactor.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""End-to-end latency benchmark with simulated learners.
+
+Every learner follows the real app flow against the FastAPI backend:
+submit a profile (``POST /scenarios``), pick one of the returned
+scenarios, then hold a 5-turn conversation (``POST /chat`` with the
+growing history, like the Streamlit ``response_count < 5`` loop, or the
+server-side session routes with ``--sessions``). Upstream is the local fake
+model server (or the in-process stub provider with ``--upstream stub``).
+
+For each concurrency level it reports p50/p95/p99 latency per endpoint,
+throughput and process memory. Results can be saved as a JSON baseline,
+and a later run compared against it; the comparison exits non-zero when
+latency or throughput regresses by more than ``--tolerance``.
+
+Usage (from ``backend/``):
+    python bench/e2e_load.py --learners 1 10 50 --save bench/baseline.json
+    python bench/e2e_load.py --learners 1 10 50 --compare bench/baseline.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_openai  # noqa: E402
+
+TURNS = 5
+LEARNER_LINES = [
+    "안녕하세요. 바지를 사고 싶어요.",
+    "조금 더 큰 사이즈가 있어요?",
+    "이거 얼마예요?",
+    "카드로 계산할 수 있어요?",
+    "감사합니다. 안녕히 계세요.",
+]
+INTERESTS = ["여행", "역사", "음식", "음악", "영화", "스포츠", "게임", "패션"]
+
+
+def profile(n: int) -> dict:
+    return {
+        "Name": f"Learner {n}",
+        "Nationality": "Indonesia",
+        "NativeLanguage": "Indonesian",
+        "Living_in_Korea": "네",
+        "Duration_of_Stay": f"{1 + n % 5}년",
+        "Visa_Type": "D2",
+        "Industry": "IT",
+        "Work_Experience": f"{n % 10}년",
+        "Korean_Test_Score": "",
+        "Duration_of_Korean_Study": "2년",
+        "Interests": INTERESTS[n % len(INTERESTS)],
+        "Hobbies": f"hobby-{n}",
+    }
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile (q in 0..100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: list) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 1),
+        "p95_ms": round(percentile(samples, 95) * 1000, 1),
+        "p99_ms": round(percentile(samples, 99) * 1000, 1),
+    }
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process (the backend under test)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def learner(http, n: int, latencies: dict, use_sessions: bool):
+    async def timed(endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        res = await http.request(method, url, **kwargs)
+        res.raise_for_status()
+        latencies[endpoint].append(time.perf_counter() - start)
+        return res.json()
+
+    scenarios = (await timed("scenarios", "POST", "/scenarios", json=profile(n)))["scenarios"]
+    opening = scenarios[n % len(scenarios)]["content"] if scenarios else "안녕하세요!"
+
+    if use_sessions:
+        session = await timed("session", "POST", "/sessions", json={"opening_line": opening})
+        for turn in range(TURNS):
+            await timed("chat", "POST", f"/sessions/{session['session_id']}/turns",
+                        json={"content": LEARNER_LINES[turn % len(LEARNER_LINES)]})
+        return
+
+    history = [
+        {"role": "system", "content": "당신은 친절한 한국어 대화 파트너입니다."},
+        {"role": "assistant", "content": opening},
+    ]
+    for turn in range(TURNS):
+        history.append({"role": "user", "content": LEARNER_LINES[turn % len(LEARNER_LINES)]})
+        reply = (await timed("chat", "POST", "/chat", json={"messages": history}))["reply"]
+        history.append({"role": "assistant", "content": reply})
+
+
+async def run_level(http, learners: int, offset: int, use_sessions: bool) -> dict:
+    latencies = {"scenarios": [], "session": [], "chat": []}
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(learner(http, offset + i, latencies, use_sessions) for i in range(learners)),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+    requests = sum(len(v) for v in latencies.values())
+    return {
+        "learners": learners,
+        "elapsed_s": round(elapsed, 3),
+        "errors": sum(1 for r in results if isinstance(r, Exception)),
+        "throughput_rps": round(requests / elapsed, 2),
+        "learners_per_s": round(learners / elapsed, 3),
+        "rss_mb": round(rss_mb(), 1),
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        "endpoints": {name: summarize(samples) for name, samples in latencies.items() if samples},
+    }
+
+
+async def run(app, levels: list, use_sessions: bool, verbose: bool) -> list:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=None) as http:
+        offset = 0
+        for learners in levels:
+            # Keep the report readable (LOG_PAYLOADS=1, error prints) unless asked
+            quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            with quiet:
+                result = await run_level(http, learners, offset, use_sessions)
+            offset += learners  # fresh profiles per level, so every level hits the upstream
+            print_level(result)
+            results.append(result)
+    return results
+
+
+def print_level(result: dict):
+    print(f"learners={result['learners']:<4} elapsed={result['elapsed_s']:.2f}s "
+          f"throughput={result['throughput_rps']:.1f} req/s rss={result['rss_mb']:.0f} MB "
+          f"errors={result['errors']}")
+    for name, stats in result["endpoints"].items():
+        print(f"    {name:<10} n={stats['count']:<5} p50={stats['p50_ms']:>8.1f} ms "
+              f"p95={stats['p95_ms']:>8.1f} ms p99={stats['p99_ms']:>8.1f} ms")
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Human-readable regressions of `results` against a saved baseline (empty when none)."""
+    previous = {str(level["learners"]): level for level in baseline["levels"]}
+    regressions = []
+    for level in results:
+        old = previous.get(str(level["learners"]))
+        if old is None:
+            continue
+        label = f"learners={level['learners']}"
+        if level["errors"] > old["errors"]:
+            regressions.append(f"{label}: errors {old['errors']} -> {level['errors']}")
+        if level["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {old['throughput_rps']} -> {level['throughput_rps']} req/s")
+        for name, stats in level["endpoints"].items():
+            old_stats = old["endpoints"].get(name)
+            if not old_stats:
+                continue
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if stats[key] > old_stats[key] * (1 + tolerance):
+                    regressions.append(f"{label} {name}: {key} {old_stats[key]} -> {stats[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end simulated learner benchmark")
+    parser.add_argument("--learners", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--latency", type=float, default=0.5, help="fake upstream latency (s)")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--upstream", choices=["http", "stub"], default="http")
+    parser.add_argument("--sessions", action="store_true", help="use /sessions turns instead of /chat")
+    parser.add_argument("--save", help="write results to this JSON baseline")
+    parser.add_argument("--compare", help="compare against this JSON baseline (exit 1 on regression)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    args = parser.parse_args()
+
+    upstream = None
+    if args.upstream == "stub":
+        os.environ["LLM_PROVIDER"] = "stub"
+        os.environ.setdefault("STUB_LATENCY_CHAT", f"fixed:{args.latency}")
+        os.environ.setdefault("STUB_LATENCY_MODERATE", f"fixed:{args.latency / 4}")
+    else:
+        upstream = fake_openai.spawn(args.port, args.latency)
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ.pop("SCENARIO_CACHE_DIR", None)  # no warm disk cache from earlier runs
+
+    from main import app
+
+    config = {"latency": args.latency, "upstream": args.upstream, "sessions": args.sessions, "turns": TURNS}
+    print(f"upstream={args.upstream} latency={args.latency:.2f}s turns={TURNS} "
+          f"flow={'sessions' if args.sessions else 'chat'}")
+    try:
+        results = asyncio.run(run(app, args.learners, args.sessions, args.verbose))
+    finally:
+        if upstream:
+            upstream.terminate()
+
+    report = {
+        "config": config,
+        "machine": {"python": platform.python_version(), "cpus": os.cpu_count()},
+        "levels": results,
+    }
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 baseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"❌ baseline was recorded with {baseline.get('config')}, this run used {config}")
+            sys.exit(2)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print("   ", line)
+            sys.exit(1)
+        print(f"✅ no regression beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
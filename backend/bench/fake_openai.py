@@ -0,0 +1,188 @@
+"""Local fake OpenAI-compatible server for load tests and benchmarks.
+
+Serves ``/v1/chat/completions`` (plain and ``stream=True``) and
+``/v1/moderations`` with a fixed, configurable latency so the backend can
+be exercised without network access or API spend. Streamed replies spread the latency evenly across
+the chunks, so time-to-first-token is a fraction of the full latency.
+
+Fault injection (for the upstream scheduler): ``--error-rate`` (500s),
+``--rate-limit-rate`` (429s), ``--stall-rate``/``--stall-seconds`` (hung
+requests), ``--capacity`` (latency grows with in-flight requests beyond
+it) and ``--outage START:SECONDS`` (503 for a window after startup).
+
+Run standalone:
+    python bench/fake_openai.py --port 9100 --latency 0.5
+then point the backend at it:
+    OPENAI_BASE_URL=http://127.0.0.1:9100/v1 OPENAI_API_KEY=fake uvicorn main:app
+"""
+import argparse
+import asyncio
+import random
+import socket
+import subprocess
+import sys
+import time
+import json
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+SCENARIO_TEXT = "\n".join(
+    f"{i}. Title: 연습 시나리오 {chr(64 + i)}\n   Line: 안녕하세요! 오늘은 무엇을 도와드릴까요?"
+    for i in range(1, 6)
+)
+SCENARIO_JSON = json.dumps({"scenarios": [
+    {"title": f"연습 시나리오 {chr(64 + i)}", "content": "안녕하세요! 오늘은 무엇을 도와드릴까요?"}
+    for i in range(1, 6)
+]}, ensure_ascii=False)
+CHAT_TEXT = "좋아요! 조금 더 자세히 말해 줄 수 있어요?"
+
+
+def create_app(latency: float = 0.5, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+               stall_rate: float = 0.0, stall_seconds: float = 30.0, capacity: int = 0,
+               outage: tuple = None, seed: int = 0) -> FastAPI:
+    app = FastAPI()
+    app.state.latency = latency
+    rng = random.Random(seed)
+    started = time.monotonic()
+    in_flight = 0
+    app.state.requests = {"scenarios": 0, "chat": 0, "moderations": 0, "moderation_inputs": 0}
+
+    @app.get("/stats")
+    async def stats():
+        """Requests received so far (lets benchmarks count upstream calls across worker processes)."""
+        return app.state.requests
+
+    def fault():
+        """An error response to send instead of a completion, or None."""
+        if outage and outage[0] <= time.monotonic() - started < outage[0] + outage[1]:
+            return JSONResponse({"error": {"message": "outage", "type": "server_error"}}, status_code=503)
+        roll = rng.random()
+        if roll < error_rate:
+            return JSONResponse({"error": {"message": "injected", "type": "server_error"}}, status_code=500)
+        if roll < error_rate + rate_limit_rate:
+            return JSONResponse({"error": {"message": "slow down", "type": "rate_limit"}}, status_code=429)
+        return None
+
+    def slowdown() -> float:
+        """Latency multiplier: overloaded beyond `capacity`, or an occasional stall."""
+        if rng.random() < stall_rate:
+            return stall_seconds / max(app.state.latency, 1e-3)
+        return max(1.0, in_flight / capacity) if capacity else 1.0
+
+    @app.middleware("http")
+    async def count_in_flight(request: Request, call_next):
+        nonlocal in_flight
+        in_flight += 1
+        try:
+            return await call_next(request)
+        finally:
+            in_flight -= 1
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = fault()
+        if error is not None:
+            await asyncio.sleep(app.state.latency / 10)
+            return error
+        scale = slowdown()
+
+        prompt = body["messages"][-1]["content"]
+        app.state.requests["scenarios" if "roleplay scenarios" in prompt else "chat"] += 1
+        if "roleplay scenarios" in prompt:
+            text = SCENARIO_JSON if body.get("response_format") else SCENARIO_TEXT
+        else:
+            text = CHAT_TEXT
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(body, text, scale), media_type="text/event-stream")
+
+        await asyncio.sleep(app.state.latency * scale)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4-turbo"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.post("/v1/moderations")
+    async def moderations(request: Request):
+        body = await request.json()
+        error = fault()
+        if error is not None:
+            return error
+        await asyncio.sleep(app.state.latency / 4 * slowdown())
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        app.state.requests["moderations"] += 1
+        app.state.requests["moderation_inputs"] += len(inputs)
+        return {
+            "id": f"modr-{uuid.uuid4().hex}",
+            "model": body.get("model", "text-moderation-latest"),
+            "results": [{"flagged": False, "categories": {}, "category_scores": {}} for _ in inputs],
+        }
+
+    async def stream_chunks(body: dict, text: str, scale: float = 1.0):
+        pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+        delay = app.state.latency * scale / len(pieces)
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex}"
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            chunk = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "gpt-4-turbo"),
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return app
+
+
+def spawn(port: int, latency: float = 0.5, faults: list = ()) -> subprocess.Popen:
+    """Start the fake server in a child process and wait until it accepts connections.
+
+    A separate process keeps the fake upstream from competing with the
+    backend under test for the GIL. `faults` are extra command-line flags,
+    e.g. ``["--error-rate", "0.2"]``.
+    """
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--port", str(port), "--latency", str(latency), *faults],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"fake upstream did not start on port {port}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per completion")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="share of requests that hang")
+    parser.add_argument("--stall-seconds", type=float, default=30.0)
+    parser.add_argument("--capacity", type=int, default=0, help="in-flight requests before latency degrades (0 = unlimited)")
+    parser.add_argument("--outage", help="START:SECONDS of 503s, counted from startup")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    outage = tuple(float(x) for x in args.outage.split(":")) if args.outage else None
+    app = create_app(args.latency, args.error_rate, args.rate_limit_rate, args.stall_rate,
+                     args.stall_seconds, args.capacity, outage, args.seed)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", backlog=2048)
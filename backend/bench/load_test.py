@@ -0,0 +1,85 @@
+"""Concurrency load test for the FastAPI backend against the fake upstream.
+
+Each simulated user sends ``--turns`` sequential ``POST /chat`` requests.
+With a non-blocking upstream client, throughput should grow roughly
+linearly with the number of concurrent users until the pool/concurrency
+limits (or the CPU) are reached.
+
+Usage (from ``backend/``):
+    python bench/load_test.py --users 1 10 50 100 200 --latency 0.5
+
+``--upstream stub`` skips the HTTP fake and uses the in-process
+``StubProvider`` instead (no sockets at all); set ``LLM_CASSETTE`` /
+``LLM_CASSETTE_MODE`` to record or replay the requests.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_openai  # noqa: E402
+
+PAYLOAD = {"messages": [
+    {"role": "system", "content": "You are a Korean conversation partner."},
+    {"role": "assistant", "content": "안녕하세요 손님! 무슨 옷을 사고 싶으신가요?"},
+    {"role": "user", "content": "바지 사고 싶어요."},
+]}
+
+
+async def run_level(http, users: int, turns: int) -> tuple:
+    async def user():
+        for _ in range(turns):
+            res = await http.post("/chat", json=PAYLOAD)
+            res.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(users)))
+    elapsed = time.perf_counter() - start
+    return elapsed, users * turns / elapsed
+
+
+async def run(app, levels: list, turns: int, latency: float):
+    import httpx
+
+    print(f"upstream latency {latency:.2f}s, {turns} turns per user")
+    print(f"{'users':>6} {'elapsed(s)':>11} {'req/s':>8} {'ideal req/s':>12}")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://backend", timeout=None) as http:
+        for users in levels:
+            elapsed, rps = await run_level(http, users, turns)
+            print(f"{users:>6} {elapsed:>11.2f} {rps:>8.1f} {users / latency:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend /chat concurrency load test")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake upstream latency (s)")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--upstream", choices=["http", "stub"], default="http",
+                        help="fake HTTP server (exercises the real client) or in-process stub provider")
+    args = parser.parse_args()
+
+    upstream = None
+    if args.upstream == "stub":
+        os.environ["LLM_PROVIDER"] = "stub"
+        os.environ.setdefault("STUB_LATENCY_CHAT", f"fixed:{args.latency}")
+    else:
+        upstream = fake_openai.spawn(args.port, args.latency)
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+    from main import app
+
+    try:
+        asyncio.run(run(app, args.users, args.turns, args.latency))
+    finally:
+        if upstream:
+            upstream.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Moderation micro-batching: upstream requests and latency, with and without the batcher.
+
+Simulates ``--users`` learners who each send ``--turns`` utterances with
+a little think time in between, moderated either one request per
+utterance or through ``ModerationBatcher``. Runs offline against the stub
+provider, whose moderation latency is per request (not per input), like
+the real endpoint.
+
+Usage (from ``backend/``):
+    python bench/moderation_batching.py --users 200 --window-ms 10 --repeat-share 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moderation_batcher import ModerationBatcher  # noqa: E402
+from providers import StubProvider  # noqa: E402
+
+COMMON = ["네", "감사합니다", "안녕하세요", "잘 모르겠어요", "다시 말해 주세요"]
+
+
+def utterances(users: int, turns: int, repeat_share: float, rng: random.Random) -> list:
+    return [[rng.choice(COMMON) if rng.random() < repeat_share else f"학습자 {u}의 {t}번째 문장이에요."
+             for t in range(turns)] for u in range(users)]
+
+
+async def simulate(moderate, script: list, think: float, rng: random.Random) -> list:
+    latencies = []
+
+    async def learner(lines):
+        await asyncio.sleep(rng.uniform(0, think))
+        for line in lines:
+            start = time.perf_counter()
+            await moderate(line)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(rng.uniform(0, think))
+
+    await asyncio.gather(*(learner(lines) for lines in script))
+    return sorted(latencies)
+
+
+def pct(values: list, q: float) -> float:
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000
+
+
+async def main_async(args):
+    rng = random.Random(args.seed)
+    script = utterances(args.users, args.turns, args.repeat_share, rng)
+
+    direct = StubProvider({"moderate": f"fixed:{args.latency}"}, seed=args.seed)
+    lat = await simulate(direct.moderate, script, args.think, random.Random(args.seed))
+    print(f"{'mode':<10} {'upstream req':>12} {'p50 ms':>8} {'p95 ms':>8}")
+    print(f"{'direct':<10} {direct.calls['moderate']:>12} {pct(lat, 50):>8.1f} {pct(lat, 95):>8.1f}")
+
+    batched = StubProvider({"moderate": f"fixed:{args.latency}"}, seed=args.seed)
+    batcher = ModerationBatcher(batched.moderate_batch, window_ms=args.window_ms,
+                                max_batch=args.max_batch, cache_size=args.cache_size)
+    lat = await simulate(batcher.moderate, script, args.think, random.Random(args.seed))
+    print(f"{'batched':<10} {batched.calls['moderate']:>12} {pct(lat, 50):>8.1f} {pct(lat, 95):>8.1f}")
+
+    report = batcher.report()
+    print(f"\ncache hits {report['cache_hits']} / {report['requests']}, "
+          f"mean batch size {report['mean_batch_size']:.1f}, "
+          f"requests saved {report['calls_saved_ratio']:.0%}")
+    print("batch size distribution:", report["batch_size_distribution"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Moderation micro-batching benchmark")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--think", type=float, default=1.0, help="max seconds between utterances")
+    parser.add_argument("--latency", type=float, default=0.15, help="stub moderation latency (s)")
+    parser.add_argument("--window-ms", type=float, default=10)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--repeat-share", type=float, default=0.3, help="share of common repeated phrases")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
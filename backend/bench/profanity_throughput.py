@@ -0,0 +1,84 @@
+"""Profanity check throughput: naive `word in text` scan vs the jamo Aho-Corasick automaton.
+
+Builds a synthetic N-term list (default 10k) and a corpus of learner-like
+utterances, then reports utterances/second for both matchers. With
+``--measure-avoided`` it also runs the tiered moderation policy over the
+corpus and reports how often the remote moderation call is avoided.
+
+Usage (from ``backend/``):
+    python bench/profanity_throughput.py --terms 10000 --measure-avoided
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profanity import ModerationPolicy, ProfanityFilter  # noqa: E402
+
+REAL_TERMS = ["씨발", "개새끼", "병신", "지랄", "좆같", "미친놈", "꺼져"]
+CLEAN = [
+    "네, 바지 사고 싶어요.", "지하철역이 어디에 있어요?", "어제 친구랑 영화를 봤어요.",
+    "이 옷 다른 색깔도 있나요?", "회사에서 일이 많아서 좀 피곤해요.", "김치찌개를 제일 좋아해요.",
+    "주말에 부산에 놀러 갈 거예요.", "한국어 공부한 지 2년 됐어요.", "조금 더 싼 거 있어요?",
+]
+EVASIVE = ["시 발 진짜", "tlqkf 뭐야", "개.새.끼", "ㅅㅂ 짜증나", "병  신 같네", "죽고 싶어요 너무 힘들어서"]
+
+
+def synthetic_terms(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    terms = list(REAL_TERMS)
+    while len(terms) < n:
+        terms.append("".join(chr(0xAC00 + rng.randrange(11172)) for _ in range(rng.randint(2, 4))))
+    return terms
+
+
+def corpus(size: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [rng.choice(EVASIVE) if rng.random() < 0.1 else rng.choice(CLEAN) for _ in range(size)]
+
+
+def rate(fn, utterances: list) -> float:
+    start = time.perf_counter()
+    for text in utterances:
+        fn(text)
+    return len(utterances) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profanity matcher throughput benchmark")
+    parser.add_argument("--terms", type=int, default=10000)
+    parser.add_argument("--utterances", type=int, default=2000)
+    parser.add_argument("--measure-avoided", action="store_true",
+                        help="report how often the tiered policy avoids the remote moderation call")
+    args = parser.parse_args()
+
+    terms = synthetic_terms(args.terms)
+    utterances = corpus(args.utterances)
+
+    start = time.perf_counter()
+    matcher = ProfanityFilter(terms)
+    build = time.perf_counter() - start
+
+    naive = rate(lambda text: [w for w in terms if w in text], utterances)
+    compiled = rate(matcher.scan, utterances)
+    missed = sum(1 for t in EVASIVE[:3] if not [w for w in terms if w in t])
+    print(f"{args.terms} terms, {args.utterances} utterances (automaton build {build * 1000:.0f} ms, once)")
+    print(f"naive scan : {naive:>10.0f} utt/s")
+    print(f"automaton  : {compiled:>10.0f} utt/s  ({compiled / naive:.0f}x)")
+    print(f"evasions caught: naive {3 - missed}/3, automaton "
+          f"{sum(1 for t in EVASIVE[:3] if any(matcher.scan(t)))}/3 (spacing, keyboard, punctuation; spacing as a suspect)")
+
+    if args.measure_avoided:
+        policy = ModerationPolicy(matcher, remote=lambda text: (False, []), mode="tiered")
+        for text in utterances:
+            policy.check(text)
+        report = policy.report()
+        print(f"\ntiered policy: {report['remote_calls']} remote calls for {report['checks']} utterances "
+              f"(remote avoided {report['remote_avoided_ratio']:.0%}, local hits {report['local_hits']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Early-turn reply cache: hit rate, wrong-intent hits and latency saved.
+
+Simulates ``--learners`` learners who each pick one of the predefined
+topics from app.py and answer its fixed opening line, then say one more
+thing. Learners paraphrase a small set of intents ("네, 바지 사고
+싶어요" / "바지를 사고 싶어요"), plus a share of one-off answers. Replies
+come from the stub provider's latency model and are sampled at random
+from its reply list (like temperature 0.7), tagged with the intent that
+produced them so hits served for a different intent can be counted.
+Up to ``--concurrency`` learners are in a conversation at once.
+
+Usage (from ``backend/``):
+    python bench/reply_cache_hits.py --learners 500 --concurrency 50 --threshold 0.9 --variety 3
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from providers import STUB_REPLIES, StubProvider  # noqa: E402
+from reply_cache import ReplyCache  # noqa: E402
+
+SYSTEM = ("당신은 친절한 한국어 대화 파트너입니다. 실제 생활에서 자연스럽게 대화를 나누듯이 응답하세요. "
+          "너무 형식적인 문어체가 아닌 구어체로 대답하세요. 사용자가 대화에 참여하도록 격려하세요. "
+          "답변은 2~3문장으로 짧고 명확하게 하세요.")
+
+# Opening line -> {intent: paraphrases}
+TOPICS = {
+    "안녕하세요 손님! 무슨 옷을 사고 싶으신가요?": {
+        item: [f"네, {item} 사고 싶어요", f"{item} 사고 싶어요", f"{item} 사고 싶어요.", f"네 {item} 사고 싶어요!",
+               f"{item}를 사고 싶어요", f"{item} 사려고 왔어요"]
+        for item in ["바지", "치마", "셔츠", "코트", "운동화", "원피스"]
+    },
+    "안녕하세요. 어디 가고 싶으신 곳 있나요?": {
+        place: [f"{place}에 가고 싶어요", f"네, {place}에 가고 싶어요", f"{place} 가고 싶어요", f"{place}에 가고 싶어요.",
+                f"{place}에 어떻게 가요?", f"{place} 가는 길 알려 주세요"]
+        for place in ["명동", "서울역", "병원", "은행", "지하철역", "시장"]
+    },
+    "어제 무슨 재미있는 일이 있었나요?": {
+        "friend": ["친구를 만났어요", "어제 친구를 만났어요", "친구 만났어요", "어제 친구랑 만났어요"],
+        "movie": ["영화를 봤어요", "어제 영화 봤어요", "영화 봤어요", "어제 영화를 봤어요"],
+        "nothing": ["없었어요", "아무 일도 없었어요", "별일 없었어요", "특별한 일 없었어요"],
+        "birthday": ["생일 파티에 갔어요", "친구 생일 파티에 갔어요", "생일 파티 갔어요"],
+    },
+}
+FOLLOW_UPS = ["네", "네, 좋아요", "감사합니다", "얼마예요?", "잘 모르겠어요", "다시 말해 주세요"]
+
+
+def script(learners: int, unique_share: float, rng: random.Random) -> list:
+    """[(opening, intent, first utterance, follow-up)] per learner."""
+    plan = []
+    for n in range(learners):
+        opening = rng.choice(list(TOPICS))
+        if rng.random() < unique_share:
+            intent, first = f"unique-{n}", f"학습자 {n}번은 조금 특별한 대답을 했어요 {rng.random():.6f}"
+        else:
+            intent = rng.choice(list(TOPICS[opening]))
+            first = rng.choice(TOPICS[opening][intent])
+        plan.append((opening, intent, first, rng.choice(FOLLOW_UPS)))
+    return plan
+
+
+async def run(plan: list, cache, args) -> dict:
+    stub = StubProvider({"chat": args.latency}, seed=args.seed)
+    rng = random.Random(args.seed)
+    out = {"latencies": [], "wrong_intent": 0, "calls": 0, "turn_hits": [0, 0]}
+
+    async def reply(messages, intent, turn):
+        start = time.perf_counter()
+        cached = cache.get(messages) if cache else None
+        if cached is not None:
+            out["turn_hits"][turn] += 1
+            if not cached.startswith(f"[{intent}]"):
+                out["wrong_intent"] += 1
+            text = cached
+        else:
+            await stub.chat(messages)
+            out["calls"] += 1
+            text = f"[{intent}] {rng.choice(STUB_REPLIES)}"  # sampled, like temperature 0.7
+            if cache:
+                cache.put(messages, text, time.perf_counter() - start)
+        out["latencies"].append(time.perf_counter() - start)
+        return text
+
+    gate = asyncio.Semaphore(args.concurrency)
+
+    async def learner(opening, intent, first, follow_up):
+        async with gate:  # learners arrive in plan order, up to --concurrency at once
+            messages = [{"role": "system", "content": SYSTEM}, {"role": "assistant", "content": opening},
+                        {"role": "user", "content": first}]
+            messages.append({"role": "assistant", "content": await reply(messages, intent, 0)})
+            messages.append({"role": "user", "content": follow_up})
+            await reply(messages, f"{intent}/{follow_up}", 1)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(learner(*turns) for turns in plan))
+    out["wall"] = time.perf_counter() - start
+    return out
+
+
+def pct(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000
+
+
+async def main_async(args):
+    plan = script(args.learners, args.unique_share, random.Random(args.seed))
+    cache = ReplyCache(threshold=args.threshold, max_turns=args.max_turns, variety=args.variety,
+                       per_scope=args.per_scope, max_scopes=args.max_scopes)
+    print(f"{'mode':<8} {'upstream':>9} {'p50 ms':>8} {'p95 ms':>8} {'total s':>8} {'wall s':>7}")
+    for name, c in (("direct", None), ("cached", cache)):
+        out = await run(plan, c, args)
+        print(f"{name:<8} {out['calls']:>9} {pct(out['latencies'], 50):>8.1f} "
+              f"{pct(out['latencies'], 95):>8.1f} {sum(out['latencies']):>8.1f} {out['wall']:>7.1f}")
+
+    report = cache.report()
+    print(f"\nhit rate {report['hit_rate']:.0%} ({report['hits']}/{report['lookups']} lookups; "
+          f"turn 1: {out['turn_hits'][0]}, turn 2: {out['turn_hits'][1]}), "
+          f"still filling variety {report['filling']}")
+    print(f"hits for a different intent: {out['wrong_intent']}")
+    print(f"estimated upstream seconds saved: {report['estimated_seconds_saved']:.1f} "
+          f"(avg miss {report['avg_miss_seconds'] * 1000:.0f} ms), scopes {report['scopes']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Early-turn reply cache benchmark")
+    parser.add_argument("--learners", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50, help="learners in a conversation at once")
+    parser.add_argument("--unique-share", type=float, default=0.2, help="share of one-off first answers")
+    parser.add_argument("--latency", default="lognormal:0.9:0.3", help="stub chat latency spec")
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--max-turns", type=int, default=2)
+    parser.add_argument("--variety", type=int, default=3)
+    parser.add_argument("--per-scope", type=int, default=64)
+    parser.add_argument("--max-scopes", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Scenario pool: coverage / accuracy / latency trade-off per similarity threshold.
+
+Builds a pool over the representative grid (placeholder scenarios, no
+upstream calls), then looks up randomly drawn learner profiles, some of
+which fall outside the grid. For each threshold it reports the share of
+requests answered from the pool and how well the matched representative
+fits the learner (same visa, same industry, TOPIK level within one,
+shared interest), next to the lookup latency and the generation latency
+that a pool hit avoids.
+
+Usage (from ``backend/``):
+    python bench/scenario_pool_eval.py --pool-size 240 --queries 2000 --generation-latency 8
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scenario_pool import GRID, ScenarioPool, canonical, grid_profiles, parse_level  # noqa: E402
+
+# What the frontend form sends, plus Korean free-text answers for some learners
+EXTRA = {
+    "Visa_Type": ["E9", "D2", "F6", "E7", "H2", "D10", "G1"],
+    "Industry": ["Manufacturing", "IT", "Education", "Healthcare", "Hospitality", "Finance", "Other", "제조", "교육"],
+    "Korean_Test_Score": ["", "1급", "2급", "3급", "4급", "5급", "TOPIK 6"],
+    "Interests": ["Travel", "Food", "History", "Music", "Sports", "Movies", "Games", "Fashion", "여행", "음식"],
+}
+DURATIONS = ["Less than 6 months", "6 months – 1 year", "1–2 years", "2–5 years", "5+ years"]
+
+
+def random_profile(rng: random.Random) -> dict:
+    profile = {field: rng.choice(values) for field, values in EXTRA.items()}
+    if rng.random() < 0.4:
+        profile["Interests"] += ", " + rng.choice(EXTRA["Interests"])
+    profile.update({
+        "Living_in_Korea": rng.choice(["Yes", "Yes", "No"]),
+        "Duration_of_Korean_Study": rng.choice(DURATIONS),
+        "Duration_of_Stay": rng.choice(DURATIONS),
+        "Work_Experience": rng.randint(0, 10),  # the form's slider sends a number
+        "Hobbies": rng.choice(["Soccer", "Reading", "Games", "Cooking", ""]),
+        "Nationality": rng.choice(["Indonesia", "Vietnam", "Nepal", "Philippines"]),
+    })
+    return profile
+
+
+def fit(query: dict, match: dict) -> dict:
+    interests = {canonical(t) for t in query["Interests"].split(",")}
+    return {
+        "visa": query["Visa_Type"] == match["Visa_Type"],
+        "industry": canonical(query["Industry"]) == canonical(match["Industry"]),
+        "level": abs(parse_level(query["Korean_Test_Score"]) - parse_level(match["Korean_Test_Score"])) <= 1,
+        "interest": bool(interests & {canonical(t) for t in match["Interests"].split(",")}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scenario pool accuracy/latency trade-off")
+    parser.add_argument("--pool-size", type=int, default=240)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--generation-latency", type=float, default=8.0,
+                        help="seconds a full scenario generation takes (what a hit saves)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    profiles = grid_profiles(args.pool_size, args.seed)
+    path = tempfile.mkdtemp(prefix="scenario_pool_")
+    ScenarioPool.save(path, [{"profile": p, "scenarios": [{"title": "t", "content": "c"}]} for p in profiles])
+    pool = ScenarioPool(path)
+    print(f"pool: {len(pool)} profiles (grid of {np.prod([len(v) for v in GRID.values()])}), "
+          f"{pool.vectors.nbytes / 1024:.0f} KiB vectors, memory-mapped")
+
+    rng = random.Random(args.seed)
+    queries = [random_profile(rng) for _ in range(args.queries)]
+    lookups, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        similarity, entry = pool.nearest(query)[0]
+        lookups.append(time.perf_counter() - start)
+        results.append((similarity, fit(query, entry["profile"])))
+    lookups.sort()
+    print(f"lookup latency: p50 {lookups[len(lookups) // 2] * 1e6:.0f} µs, "
+          f"p99 {lookups[int(len(lookups) * 0.99)] * 1e6:.0f} µs "
+          f"(generation: {args.generation_latency:.1f} s)\n")
+
+    print(f"{'threshold':>9} {'pool hits':>9} {'visa':>6} {'industry':>8} {'level±1':>8} {'interest':>8} "
+          f"{'mean latency':>13}")
+    for threshold in (0.0, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95):
+        hits = [f for s, f in results if s >= threshold]
+        share = len(hits) / len(results)
+        mean_latency = share * lookups[len(lookups) // 2] + (1 - share) * args.generation_latency
+
+        def rate(key):
+            return f"{sum(h[key] for h in hits) / len(hits):.0%}" if hits else "-"
+
+        print(f"{threshold:>9.2f} {share:>9.0%} {rate('visa'):>6} {rate('industry'):>8} {rate('level'):>8} "
+              f"{rate('interest'):>8} {mean_latency:>12.2f}s")
+
+
+if __name__ == "__main__":
+    main()
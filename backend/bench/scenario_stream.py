@@ -0,0 +1,98 @@
+"""Time to first scenario: buffered ``POST /scenarios`` vs ``POST /scenarios?stream=true``.
+
+Starts the fake upstream and a real uvicorn backend (streamed responses
+must go over a socket to be measured honestly), then requests scenarios
+for fresh profiles both ways and reports time to the first scenario,
+time to all of them, and how many scenarios were parsed.
+
+Usage (from ``backend/``):
+    python bench/scenario_stream.py --latency 2.0 --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_openai  # noqa: E402
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def spawn_backend(port: int, upstream_port: int) -> subprocess.Popen:
+    env = {**os.environ, "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1",
+           "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "fake"), "LLM_PROVIDER": "openai"}
+    env.pop("SCENARIO_CACHE_DIR", None)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/scenarios/cache", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("backend did not start")
+
+
+def profile(n: int) -> dict:
+    return {"Name": "Bench", "Interests": f"topic-{n}-{time.time()}", "Hobbies": "독서"}
+
+
+def buffered(http: httpx.Client, n: int) -> tuple:
+    start = time.perf_counter()
+    scenarios = http.post("/scenarios", json=profile(n)).json()["scenarios"]
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, len(scenarios)
+
+
+def streamed(http: httpx.Client, n: int) -> tuple:
+    start = time.perf_counter()
+    first, count = None, 0
+    with http.stream("POST", "/scenarios", params={"stream": "true"}, json=profile(n)) as res:
+        event = None
+        for line in res.iter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event == "scenario":
+                if first is None:
+                    first = time.perf_counter() - start
+                count += 1
+            elif line.startswith("data: ") and event == "done":
+                count = len(json.loads(line[6:])["scenarios"])
+    return first or 0.0, time.perf_counter() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scenario streaming benchmark")
+    parser.add_argument("--latency", type=float, default=2.0, help="fake upstream latency for a full reply (s)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=9110)
+    parser.add_argument("--upstream-port", type=int, default=9111)
+    args = parser.parse_args()
+
+    upstream = fake_openai.spawn(args.upstream_port, args.latency)
+    backend = spawn_backend(args.port, args.upstream_port)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=60) as http:
+            print(f"{'mode':<9} {'first (s)':>10} {'all (s)':>8} {'scenarios':>10}")
+            for name, fn in (("buffered", buffered), ("streamed", streamed)):
+                runs = [fn(http, i + (1000 if name == "streamed" else 0)) for i in range(args.runs)]
+                print(f"{name:<9} {statistics.median(r[0] for r in runs):>10.2f} "
+                      f"{statistics.median(r[1] for r in runs):>8.2f} {min(r[2] for r in runs):>10}")
+    finally:
+        backend.terminate()
+        upstream.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Multi-worker cache effectiveness: per-process caches vs. the shared SQLite tier.
+
+For each worker count, starts the fake upstream and ``uvicorn main:app
+--workers N`` (with and without SHARED_CACHE_DB), then sends a mix of
+``POST /scenarios`` for a skewed set of learner profiles and moderated
+``POST /chat`` turns with common phrases, over fresh connections so the
+kernel spreads them across workers. Upstream calls are counted by the
+fake server, which gives the hit rate across all workers.
+
+Usage (from ``backend/``):
+    python bench/shared_cache_workers.py --workers 1 4 8 --requests 400
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_openai  # noqa: E402
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHRASES = ["네", "감사합니다", "안녕하세요", "잘 모르겠어요", "다시 말해 주세요", "좋아요", "얼마예요?",
+           "바지 사고 싶어요", "명동에 가고 싶어요", "어제 친구를 만났어요"]
+
+
+def spawn_backend(port: int, upstream_port: int, workers: int, shared_db: str, boot_seconds: float):
+    env = {**os.environ, "OPENAI_BASE_URL": f"http://127.0.0.1:{upstream_port}/v1",
+           "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "fake"), "LLM_PROVIDER": "openai",
+           "CHAT_MODERATION": "1", "PROFANITY_REMOTE_POLICY": "always"}
+    for name in ("SCENARIO_CACHE_DIR", "SCENARIO_POOL_DIR", "SHARED_CACHE_DB", "REPLY_CACHE"):
+        env.pop(name, None)
+    if shared_db:
+        env["SHARED_CACHE_DB"] = shared_db
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60 + 10 * workers
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/scenarios/cache", timeout=1)
+            time.sleep(boot_seconds * workers)  # let the remaining workers finish importing
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("backend did not start")
+
+
+def zipf_choice(rng: random.Random, n: int, s: float = 1.1) -> int:
+    weights = [1 / (i + 1) ** s for i in range(n)]
+    return rng.choices(range(n), weights)[0]
+
+
+async def offer(base_url: str, args) -> dict:
+    rng = random.Random(args.seed)
+    plan = [("scenarios", zipf_choice(rng, args.profiles)) if rng.random() < 0.5
+            else ("chat", zipf_choice(rng, len(PHRASES))) for _ in range(args.requests)]
+    latencies = {"scenarios": [], "chat": []}
+    slots = asyncio.Semaphore(args.concurrency)
+    # No keep-alive: every request is a new connection, like behind a load balancer
+    limits = httpx.Limits(max_keepalive_connections=0)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as http:
+        async def one(kind, n):
+            async with slots:
+                start = time.perf_counter()
+                if kind == "scenarios":
+                    res = await http.post("/scenarios", json={"Name": f"learner-{rng.random()}", "Visa_Type": "E9",
+                                                               "Interests": f"topic-{n}"})
+                else:
+                    res = await http.post("/chat", json={"messages": [
+                        {"role": "assistant", "content": "안녕하세요!"}, {"role": "user", "content": PHRASES[n]}]})
+                res.raise_for_status()
+                latencies[kind].append(time.perf_counter() - start)
+
+        await asyncio.gather(*(one(kind, n) for kind, n in plan))
+    return latencies
+
+
+def ms(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared cache tier benchmark across uvicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--profiles", type=int, default=40, help="distinct learner profiles (Zipf-distributed)")
+    parser.add_argument("--latency", type=float, default=1.0, help="fake upstream seconds per completion")
+    parser.add_argument("--boot-seconds", type=float, default=1.5, help="extra wait per worker after startup")
+    parser.add_argument("--port", type=int, default=9120)
+    parser.add_argument("--upstream-port", type=int, default=9121)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'cache':<7} {'scen. hit':>9} {'scen. p50':>9} {'scen. p95':>9} "
+          f"{'mod. hit':>8} {'chat p50':>8} {'chat p95':>8} {'upstream':>8}")
+    for workers in args.workers:
+        for mode in ("local", "shared"):
+            shared_db = os.path.join(tempfile.mkdtemp(prefix="shared_cache_"), "cache.db") if mode == "shared" else ""
+            upstream = fake_openai.spawn(args.upstream_port, args.latency)
+            backend = None
+            try:
+                backend = spawn_backend(args.port, args.upstream_port, workers, shared_db, args.boot_seconds)
+                latencies = asyncio.run(offer(f"http://127.0.0.1:{args.port}", args))
+                calls = httpx.get(f"http://127.0.0.1:{args.upstream_port}/stats").json()
+            finally:
+                if backend is not None:
+                    backend.terminate()
+                    backend.wait()
+                upstream.terminate()
+                upstream.wait()
+            scen, chat = latencies["scenarios"], latencies["chat"]
+            scen_hit = 1 - calls["scenarios"] / max(1, len(scen))
+            mod_hit = 1 - calls["moderation_inputs"] / max(1, len(chat))
+            upstream_total = calls["scenarios"] + calls["chat"] + calls["moderations"]
+            print(f"{workers:>7} {mode:<7} {scen_hit:>9.0%} {ms(scen, 50):>9.0f} {ms(scen, 95):>9.0f} "
+                  f"{mod_hit:>8.0%} {ms(chat, 50):>8.0f} {ms(chat, 95):>8.0f} {upstream_total:>8}")
+    print("\nlatencies in ms; hit = share of requests answered without an upstream call")
+
+
+if __name__ == "__main__":
+    main()
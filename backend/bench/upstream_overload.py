@@ -0,0 +1,144 @@
+"""Tail latency under upstream overload and faults: plain semaphore vs. the upstream scheduler.
+
+Offers an open-loop (Poisson) mix of live chat turns and scenario
+generations to ``gpt_utils`` for ``--duration`` seconds, against the fake
+OpenAI server with injected faults (slowdown beyond ``--capacity``,
+errors, stalls, an outage window). Each mode gets a fresh upstream, so
+outage windows line up.
+
+- ``baseline``: what the backend did before, one semaphore of 100, no
+  deadlines, retries or breaker.
+- ``scheduler``: ``create_scheduler()`` with the UPSTREAM_* settings, with
+  the overall cap set to what the upstream can take (``--max-in-flight``,
+  default ``--capacity``) and a short queue (``--max-queue``).
+
+Usage (from ``backend/``):
+    python bench/upstream_overload.py --rate 60 --duration 30 --capacity 20 --error-rate 0.05 --outage 10:5
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_openai  # noqa: E402
+
+PROFILE = {"Visa_Type": "E9", "Industry": "제조", "Korean_Test_Score": "2급", "Interests": "여행"}
+HISTORY = [
+    {"role": "system", "content": "당신은 친절한 한국어 대화 파트너입니다."},
+    {"role": "assistant", "content": "안녕하세요 손님! 무슨 옷을 사고 싶으신가요?"},
+]
+
+
+def pct(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000
+
+
+async def offer_load(gpt_utils, args) -> dict:
+    from scheduler import UpstreamUnavailable
+
+    rng = random.Random(args.seed)
+    results = {"chat": [], "scenarios": []}
+
+    async def chat_turn(n):
+        start = time.perf_counter()
+        reply = await gpt_utils.generate_chat_response(HISTORY + [{"role": "user", "content": f"바지 {n}벌 사고 싶어요"}])
+        outcome = {gpt_utils.CHAT_BUSY_REPLY: "busy", gpt_utils.CHAT_ERROR_REPLY: "error"}.get(reply, "ok")
+        results["chat"].append((outcome, time.perf_counter() - start))
+
+    async def scenario_set(n):
+        start = time.perf_counter()
+        try:
+            outcome = "ok" if await gpt_utils.generate_scenarios({**PROFILE, "Name": str(n)}) else "error"
+        except UpstreamUnavailable:
+            outcome = "busy"
+        except Exception:
+            outcome = "error"
+        results["scenarios"].append((outcome, time.perf_counter() - start))
+
+    tasks = []
+    end = time.perf_counter() + args.duration
+    n = 0
+    while time.perf_counter() < end:
+        n += 1
+        make = scenario_set if rng.random() < args.scenario_share else chat_turn
+        tasks.append(asyncio.ensure_future(make(n)))
+        await asyncio.sleep(rng.expovariate(args.rate))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def summarize(name: str, results: dict):
+    for kind, rows in results.items():
+        ok = [t for outcome, t in rows if outcome == "ok"]
+        every = [t for _, t in rows]
+        share = {o: sum(1 for x, _ in rows if x == o) / max(1, len(rows)) for o in ("ok", "busy", "error")}
+        print(f"{name:<10} {kind:<10} {len(rows):>5} {share['ok']:>6.0%} {share['busy']:>6.0%} {share['error']:>6.0%} "
+              f"{pct(every, 50):>8.0f} {pct(every, 95):>8.0f} {pct(every, 99):>8.0f} {pct(ok, 99):>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upstream overload / fault benchmark")
+    parser.add_argument("--rate", type=float, default=60, help="offered requests per second")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--scenario-share", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake upstream seconds per completion")
+    parser.add_argument("--capacity", type=int, default=20, help="upstream in-flight requests before it slows down")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-seconds", type=float, default=30)
+    parser.add_argument("--outage", default="10:5", help="START:SECONDS of upstream 503s ('' for none)")
+    parser.add_argument("--max-in-flight", type=int, help="scheduler cap (default: --capacity)")
+    parser.add_argument("--max-queue", type=int, default=50, help="scheduler queue bound")
+    parser.add_argument("--port", type=int, default=9111)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", nargs="+", default=["baseline", "scheduler"])
+    args = parser.parse_args()
+
+    os.environ.update({"LLM_PROVIDER": "openai", "OPENAI_API_KEY": "fake",
+                       "OPENAI_BASE_URL": f"http://127.0.0.1:{args.port}/v1"})
+    asyncio.run(run_modes(args))
+
+
+async def run_modes(args):
+    import gpt_utils
+    from scheduler import UpstreamScheduler, create_scheduler
+
+    faults = ["--capacity", str(args.capacity), "--error-rate", str(args.error_rate),
+              "--stall-rate", str(args.stall_rate), "--stall-seconds", str(args.stall_seconds),
+              "--seed", str(args.seed)]
+    if args.outage:
+        faults += ["--outage", args.outage]
+
+    print(f"{'mode':<10} {'kind':<10} {'n':>5} {'ok':>6} {'busy':>6} {'error':>6} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ok p99':>9}")
+    for mode in args.modes:
+        if mode == "baseline":
+            gpt_utils.scheduler = UpstreamScheduler(max_in_flight=100, max_queue=10 ** 9, default_deadline=3600,
+                                                    retries=0, breaker_failures=0)
+        else:
+            gpt_utils.scheduler = create_scheduler()
+            gpt_utils.scheduler.max_in_flight = args.max_in_flight or args.capacity
+            gpt_utils.scheduler.max_queue = args.max_queue
+        # A fresh upstream per mode so the outage window starts with the load
+        upstream = fake_openai.spawn(args.port, args.latency, faults)
+        try:
+            results = await offer_load(gpt_utils, args)
+        finally:
+            upstream.terminate()
+            upstream.wait()
+        await gpt_utils.close_client()  # drop connections to the old upstream (reopened on next use)
+        summarize(mode, results)
+        if mode != "baseline":
+            for name, stats in gpt_utils.scheduler.report()["endpoints"].items():
+                print(f"{'':<10} {name:<10} {dict((k, v) for k, v in stats.items() if v)}")
+
+
+if __name__ == "__main__":
+    main()
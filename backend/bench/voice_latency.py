@@ -0,0 +1,173 @@
+"""End of speech → first audio byte: serial voice turn vs. the /voice WebSocket pipeline.
+
+- ``serial``: what the Streamlit app does after the learner stops
+  recording — transcribe, moderate, generate the whole reply, synthesize
+  the whole reply (in-process, same stub provider and latencies).
+- ``socket``: ``uvicorn main:app`` with the stub provider; each learner
+  streams synthetic speech in real time (20 ms PCM frames) followed by
+  silence over ``/voice``, and measures from its last speech frame to the
+  first audio frame received (so the endpoint detector's trailing silence
+  is included).
+
+Needs the ``websockets`` package (also what uvicorn uses to serve the socket).
+
+Usage (from ``backend/``):
+    python bench/voice_latency.py --learners 1 10 --turns 3 --trailing-silence-ms 600
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RATE = 16000
+FRAME_SECONDS = 0.02
+
+
+def utterance(seconds: float, seed: int) -> np.ndarray:
+    """Voiced-speech stand-in: harmonics of a wobbling pitch plus breath noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(RATE * seconds)) / RATE
+    pitch = 140 + 20 * np.sin(2 * np.pi * 3 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2  # syllables
+    return (0.2 * voiced * envelope + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def pcm16(samples: np.ndarray) -> bytes:
+    return (np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def pct(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))] if values else float("nan")
+
+
+def stub_env(args) -> dict:
+    return {"LLM_PROVIDER": "stub", "STUB_LATENCY_CHAT": args.chat_latency,
+            "STUB_LATENCY_TRANSCRIBE": args.stt_latency, "STUB_LATENCY_SPEECH": args.tts_latency,
+            "STUB_LATENCY_MODERATE": "fixed:0.1", "CHAT_MODERATION": "1", "PROFANITY_REMOTE_POLICY": "always",
+            "TTS_CACHE_DIR": tempfile.mkdtemp(prefix="voice_tts_"), "OPENAI_API_KEY": "fake"}
+
+
+async def serial_turns(args) -> list:
+    os.environ.update(stub_env(args))
+    for name in ("SHARED_CACHE_DB", "REPLY_CACHE"):
+        os.environ.pop(name, None)
+    import gpt_utils
+    from audio_utils import encode_for_upload
+
+    async def turn(n):
+        speech = encode_for_upload(utterance(args.speech_seconds, n), "wav")
+        start = time.perf_counter()  # the learner pressed "녹음 종료"
+        text = await gpt_utils.transcribe_audio([speech])
+        await gpt_utils.moderate_text(text)
+        history = [{"role": "assistant", "content": "안녕하세요!"}, {"role": "user", "content": f"{text} {n}"}]
+        reply = await gpt_utils.generate_chat_response(history)
+        await gpt_utils.synthesize_speech(reply)
+        return (time.perf_counter() - start) * 1000
+
+    results = []
+    for learners in args.learners:
+        latencies = await asyncio.gather(*(turn(learners * 1000 + i) for i in range(learners * args.turns)))
+        results.append((learners, list(latencies), {}))
+    return results
+
+
+async def learner(url: str, n: int, args) -> tuple:
+    latencies, server = [], []
+    silence = np.zeros(int(RATE * FRAME_SECONDS), dtype=np.float32) + 0.0005
+    async with websockets.connect(url, max_size=None) as ws:
+        for turn in range(args.turns):
+            speech = utterance(args.speech_seconds, n * 100 + turn)
+            frame = int(RATE * FRAME_SECONDS)
+            t0 = time.perf_counter()
+            for i in range(0, len(speech), frame):  # real-time pacing, like a microphone
+                await ws.send(pcm16(speech[i:i + frame]))
+                await asyncio.sleep(max(0.0, t0 + (i + frame) / RATE - time.perf_counter()))
+            speech_end = time.perf_counter()
+
+            async def keep_listening():
+                while True:  # the microphone stays open while the bot answers
+                    await ws.send(pcm16(silence))
+                    await asyncio.sleep(FRAME_SECONDS)
+
+            mic = asyncio.ensure_future(keep_listening())
+            first_audio = None
+            try:
+                async for message in ws:
+                    if isinstance(message, bytes):
+                        first_audio = first_audio or time.perf_counter()
+                        continue
+                    event = json.loads(message)
+                    if event["type"] in ("done", "error", "flagged"):
+                        server.append(event.get("timings", {}))
+                        break
+            finally:
+                mic.cancel()
+            if first_audio:
+                latencies.append((first_audio - speech_end) * 1000)
+    return latencies, server
+
+
+def socket_turns(args) -> list:
+    env = {**os.environ, **stub_env(args)}
+    for name in ("SHARED_CACHE_DB", "REPLY_CACHE", "ANALYTICS_DB"):
+        env.pop(name, None)
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), env=env,
+    )
+    try:
+        time.sleep(args.boot_seconds)
+        url = f"ws://127.0.0.1:{args.port}/voice?trailing_silence_ms={args.trailing_silence_ms}&barge_in=false"
+        results = []
+        for learners in args.learners:
+            async def run():
+                return await asyncio.gather(*(learner(url, learners * 1000 + i, args) for i in range(learners)))
+            per_learner = asyncio.run(run())
+            latencies = [x for lat, _ in per_learner for x in lat]
+            server = [t for _, timings in per_learner for t in timings]
+            results.append((learners, latencies, server))
+        return results
+    finally:
+        backend.terminate()
+        backend.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Voice turn latency: serial vs /voice WebSocket")
+    parser.add_argument("--learners", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--speech-seconds", type=float, default=2.0)
+    parser.add_argument("--trailing-silence-ms", type=int, default=600)
+    parser.add_argument("--chat-latency", default="lognormal:2.0:0.3", help="stub: time to generate a whole reply")
+    parser.add_argument("--stt-latency", default="lognormal:0.5:0.3")
+    parser.add_argument("--tts-latency", default="lognormal:0.4:0.3")
+    parser.add_argument("--port", type=int, default=9130)
+    parser.add_argument("--boot-seconds", type=float, default=4.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'learners':>8} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8}   server-side p50 (ms)")
+    for name, results in (("serial", asyncio.run(serial_turns(args))), ("socket", socket_turns(args))):
+        for learners, latencies, server in results:
+            parts = ""
+            if server:
+                keys = ("endpoint_ms", "stt_ms", "ttft_ms", "first_audio_ms", "total_ms")
+                parts = ", ".join(f"{k[:-3]} {pct([t[k] for t in server if k in t], 50):.0f}" for k in keys)
+            print(f"{name:<8} {learners:>8} {len(latencies):>6} {pct(latencies, 50):>8.0f} "
+                  f"{pct(latencies, 95):>8.0f}   {parts}")
+    print("\nfrom end of speech to the first audio byte; the socket includes the endpoint detector's trailing silence")
+
+
+if __name__ == "__main__":
+    main()
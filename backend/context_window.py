@@ -0,0 +1,163 @@
+import hashlib
+import math
+import os
+import re
+from collections import OrderedDict
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional; fall back to an offline estimate
+    _encoding = None
+
+_HANGUL = re.compile(r"[가-힣ㄱ-ㆎ]")
+
+SUMMARY_PREFIX = "지금까지의 대화 요약: "
+
+
+def count_tokens(text: str) -> int:
+    """Count (or, without tiktoken, estimate) the tokens in `text`.
+
+    The estimate counts each Hangul character as one token and every other
+    four characters as one, which tracks cl100k_base closely for this app's
+    mixed Korean/English chat.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    hangul = len(_HANGUL.findall(text))
+    return hangul + math.ceil((len(text) - hangul) / 4)
+
+
+def count_message_tokens(messages: list) -> int:
+    # ~4 tokens of chat-format overhead per message, plus reply priming
+    return sum(count_tokens(m["content"]) + 4 for m in messages) + 3
+
+
+def as_dicts(messages: list) -> list:
+    """Accept both plain dicts and pydantic Message objects."""
+    return [m if isinstance(m, dict) else m.model_dump() for m in messages]
+
+
+class ContextCompactor:
+    """Keeps prompts within a token budget over long conversations.
+
+    System messages and the last `keep_recent` turns are sent verbatim.
+    Older turns are folded into a rolling summary. Summaries are cached by
+    the hash of the turns they cover, so each new fold only summarizes the
+    turns added since the previous one (previous summary + new turns).
+    The fold point moves in steps of `fold_step` turns so the summary is
+    not recomputed on every request. If summarizing fails, the last good
+    summary is used and the turns after it are sent verbatim (over budget
+    rather than losing them).
+    """
+
+    def __init__(self, max_tokens: int = 1500, keep_recent: int = 6, fold_step: int = 4,
+                 cache_size: int = 1024):
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.fold_step = fold_step
+        self.cache_size = cache_size
+        self._summaries = OrderedDict()  # prefix hash -> summary
+        self.stats = {"compacted": 0, "summary_calls": 0, "summary_cache_hits": 0, "fallbacks": 0}
+
+    def _plan(self, messages: list):
+        """Return (system, turns, fold_count, prefix hashes) or None when no compaction is needed."""
+        messages = as_dicts(messages)
+        if count_message_tokens(messages) <= self.max_tokens:
+            return None
+        system = [m for m in messages if m["role"] == "system"]
+        turns = [m for m in messages if m["role"] != "system"]
+        foldable = len(turns) - self.keep_recent
+        fold_count = (foldable // self.fold_step) * self.fold_step
+        if fold_count <= 0:
+            return None
+
+        # Rolling hash of every prefix, so any earlier summary can be found
+        hashes = [hashlib.sha256()]
+        for m in turns[:fold_count]:
+            h = hashes[-1].copy()
+            h.update(f"{m['role']}\x00{m['content']}\x01".encode("utf-8"))
+            hashes.append(h)
+        return system, turns, fold_count, [h.hexdigest() for h in hashes]
+
+    def _resume_point(self, hashes: list):
+        """Longest already-summarized prefix: (turn count, summary)."""
+        for k in range(len(hashes) - 1, 0, -1):
+            summary = self._summaries.get(hashes[k])
+            if summary is not None:
+                self._summaries.move_to_end(hashes[k])
+                return k, summary
+        return 0, ""
+
+    def _remember(self, key: str, summary: str):
+        self._summaries[key] = summary
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+
+    def _assemble(self, system: list, turns: list, fold_count: int, summary: str) -> list:
+        self.stats["compacted"] += 1
+        folded = [{"role": "system", "content": SUMMARY_PREFIX + summary}] if summary else []
+        return system + folded + turns[fold_count:]
+
+    def compact(self, messages: list, summarize) -> list:
+        """Compact `messages` using a blocking `summarize(previous_summary, turns) -> str`."""
+        plan = self._plan(messages)
+        if plan is None:
+            return as_dicts(messages)
+        system, turns, fold_count, hashes = plan
+
+        start, summary = self._resume_point(hashes)
+        if start == fold_count:
+            self.stats["summary_cache_hits"] += 1
+        else:
+            try:
+                self.stats["summary_calls"] += 1
+                summary = summarize(summary, turns[start:fold_count])
+                self._remember(hashes[fold_count], summary)
+            except Exception as e:
+                print("❌ Context summary error:", e)
+                self.stats["fallbacks"] += 1
+                fold_count = start  # keep the turns the summary doesn't cover yet, verbatim
+        return self._assemble(system, turns, fold_count, summary)
+
+    async def acompact(self, messages: list, summarize) -> list:
+        """Async variant of `compact` for an awaitable `summarize`."""
+        plan = self._plan(messages)
+        if plan is None:
+            return as_dicts(messages)
+        system, turns, fold_count, hashes = plan
+
+        start, summary = self._resume_point(hashes)
+        if start == fold_count:
+            self.stats["summary_cache_hits"] += 1
+        else:
+            try:
+                self.stats["summary_calls"] += 1
+                summary = await summarize(summary, turns[start:fold_count])
+                self._remember(hashes[fold_count], summary)
+            except Exception as e:
+                print("❌ Context summary error:", e)
+                self.stats["fallbacks"] += 1
+                fold_count = start
+        return self._assemble(system, turns, fold_count, summary)
+
+
+def summary_prompt(previous_summary: str, turns: list) -> list:
+    """Chat messages asking the model to extend `previous_summary` with `turns`."""
+    transcript = "\n".join(
+        f"{'학습자' if m['role'] == 'user' else '챗봇'}: {m['content']}" for m in turns
+    )
+    return [
+        {"role": "system", "content": "당신은 한국어 회화 수업의 대화를 간결하게 요약하는 도우미입니다. "
+                                      "중요한 사실, 학습자의 관심사, 진행 중인 주제만 3~5문장으로 요약하세요."},
+        {"role": "user", "content": f"이전 요약:\n{previous_summary or '(없음)'}\n\n새 대화:\n{transcript}\n\n"
+                                    "이전 요약과 새 대화를 합쳐 하나의 요약으로 다시 작성하세요."},
+    ]
+
+
+def create_compactor() -> ContextCompactor:
+    return ContextCompactor(
+        max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "1500")),
+        keep_recent=int(os.getenv("CONTEXT_KEEP_RECENT", "6")),
+        fold_step=int(os.getenv("CONTEXT_FOLD_STEP", "4")),
+    )
@@ -1,73 +1,238 @@
-import openai
+import asyncio
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
-import re
-import logging
+from context_window import create_compactor, summary_prompt
+from profanity import ModerationPolicy, ProfanityFilter, load_profanity_terms
+from metrics import failed_fast, log_payload, record, registry, span
+from scenario_stream import SCENARIO_SCHEMA, ScenarioStreamParser, parse_legacy
+from moderation_batcher import create_moderation_batcher
+from reply_cache import create_reply_cache
+from scheduler import UpstreamUnavailable, create_scheduler
+from tts_cache import create_tts_cache
 
 load_dotenv()
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))  # 🔄 new client
+from providers import create_provider  # reads LLM_PROVIDER / UPSTREAM_* after .env is loaded
+from shared_cache import shared_cache  # SHARED_CACHE_DB: cache tier shared by all workers on the node
+from scenario_cache import shared_profile  # SCENARIO_CACHE_IGNORE_FIELDS
 
-def generate_scenarios(user_info: dict) -> list:
+# 🔌 Chat / moderation / speech vendor: real OpenAI, offline stub or a replayed cassette
+# Created on first use (main warms it up right after startup), so importing this module stays cheap
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = create_provider()
+    return _provider
+
+
+CHAT_ERROR_REPLY = "⚠️ 챗봇 응답 중 오류가 발생했습니다."
+CHAT_BUSY_REPLY = "⚠️ 지금 사용자가 많아요. 잠시 후 다시 말해 주세요."
+
+# 🚦 Per-endpoint caps, priority queue, deadlines, retries and circuit breakers (per worker)
+scheduler = create_scheduler()
+
+# ✂️ Keeps long conversations within a prompt-token budget
+compactor = create_compactor()
+SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gpt-4-turbo")
+SCENARIO_MODEL = os.getenv("SCENARIO_MODEL", "gpt-4-turbo")
+
+# 🔁 Similarity-keyed replies for the first turns of a conversation (REPLY_CACHE=1)
+reply_cache = create_reply_cache()
+
+# 🔊 Speech for the voice socket (same models / voice as the Streamlit app); audio cached per sentence
+STT_MODEL = os.getenv("STT_MODEL", "whisper-1")
+TTS_MODEL = os.getenv("TTS_MODEL", "tts-1")
+TTS_VOICE = os.getenv("TTS_VOICE", "alloy")
+tts_cache = create_tts_cache(shared=shared_cache)
+
+scenarios_parsed = registry.counter(
+    "chatbot_scenarios_parsed_total", "Generated scenarios by parse result (json | invalid | legacy)",
+    ("result",),
+)
+
+
+async def close_client():
+    """Close the pooled upstream connections (called on app shutdown); the next call opens a new provider."""
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
+
+
+def scenario_messages(user_info: dict) -> list:
     prompt = f"""
 You are a Korean language teacher helping a learner named Baiq Nurul Haqiqi practice Korean conversation.
 
 Please generate 5 personalized roleplay scenarios **based on the user's profile below**.
 
 For each scenario, include:
-1. A short, clear **title** with no Markdown or extra formatting
-2. A **single opening line** that would be said by a Korean conversation partner (teacher, local, etc.) to start the conversation. This line should be natural and appropriate to the situation.
+1. "title": a short, clear title with no Markdown or extra formatting
+2. "content": a **single opening line** that would be said by a Korean conversation partner (teacher, local, etc.) to start the conversation. This line should be natural and appropriate to the situation.
 
-Format the output **exactly** like this:
-
-1. Title: [scenario title]
-   Line: [Korean first line spoken by the AI]
+Reply with a JSON object only, matching this JSON schema:
+{json.dumps(SCENARIO_SCHEMA, ensure_ascii=False)}
 
 User Profile:
-{user_info}
+{shared_profile(user_info)}
 """
-
-    response = client.chat.completions.create(
-        model="gpt-4-turbo",
-        messages=[
-            {"role": "system", "content": "You are a Korean tutor who creates personalized conversation scenarios for learners."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.7
-    )
-
-    text = response.choices[0].message.content
-    print("🔮 GPT raw response:\n", text)
-
-    # Example format: 1. Title\nContent\n2. Title\nContent...
-    scenario_blocks = re.split(r"\n?\d+\.\s*", text)
-    structured = []
-
-    for block in scenario_blocks:
-        if not block.strip():
-            continue
-
-        title_match = re.search(r"Title:\s*(.*)", block)
-        line_match = re.search(r"Line:\s*(.*)", block)
-
-        if title_match and line_match:
-            structured.append({
-                "title": title_match.group(1).strip(),
-                "content": line_match.group(1).strip()
-            })
-    print("✅ Parsed structured scenarios:", structured)
+    return [
+        {"role": "system", "content": "You are a Korean tutor who creates personalized conversation scenarios for learners."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+async def stream_scenarios(user_info: dict, priority: int = None):
+    """Yield each scenario ({"title", "content"}) as soon as it has fully streamed in."""
+    parser = ScenarioStreamParser()
+    raw = []
+    parse_seconds = 0.0
+    stream = scheduler.stream("scenarios", lambda: get_provider().stream_chat(
+        scenario_messages(user_info),
+        model=SCENARIO_MODEL,
+        temperature=0.7,
+        response_format={"type": "json_object"}
+    ), priority=priority)
+    try:
+        async for piece in stream:
+            raw.append(piece)
+            t = time.perf_counter()
+            completed = parser.feed(piece)
+            parse_seconds += time.perf_counter() - t
+            for scenario in completed:
+                yield scenario
+    finally:
+        await stream.aclose()
+
+    text = "".join(raw)
+    log_payload("🔮 GPT raw response:", text)
+    record("parse", parse_seconds, "scenarios")
+    scenarios_parsed.inc(parser.parsed, result="json")
+    scenarios_parsed.inc(parser.invalid, result="invalid")
+    if not parser.parsed:
+        # Model ignored the JSON contract: fall back to the old numbered text format
+        fallback = parse_legacy(text)
+        scenarios_parsed.inc(len(fallback), result="legacy")
+        for scenario in fallback:
+            yield scenario
+
+
+async def generate_scenarios(user_info: dict, priority: int = None) -> list:
+    structured = [scenario async for scenario in stream_scenarios(user_info, priority)]
+    log_payload("✅ Parsed structured scenarios:", structured)
     return structured  # ✅ must be a list!
 
-def generate_chat_response(messages: list) -> str:
+async def summarize_turns(previous_summary: str, turns: list) -> str:
+    """Fold `turns` into the rolling conversation summary."""
+    summary = await scheduler.call("summary", lambda: get_provider().chat(
+        summary_prompt(previous_summary, turns), model=SUMMARY_MODEL, temperature=0))
+    return summary.strip()
+
+
+async def generate_chat_response(messages: list, allowed=None) -> str:
+    """Reply to `messages`; with `allowed` (future of the moderation verdict) it is only cached once allowed."""
+    cached = reply_cache.get(messages) if reply_cache else None
+    if cached is not None:
+        return cached
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=messages,
-            temperature=0.7
-        )
-        return response.choices[0].message.content.strip()
+        start = time.perf_counter()
+        compacted = await compactor.acompact(messages, summarize_turns)
+        reply = await scheduler.call("chat", lambda: get_provider().chat(compacted, model="gpt-4-turbo", temperature=0.7))
+        reply = reply.strip()
+        if reply_cache:
+            reply_cache.put_when(allowed, messages, reply, time.perf_counter() - start)
+        return reply
+    except UpstreamUnavailable as e:
+        failed_fast("chat", e)
+        return CHAT_BUSY_REPLY
     except Exception as e:
         print("❌ GPT Chat error:", e)
-        return "⚠️ 챗봇 응답 중 오류가 발생했습니다."
+        return CHAT_ERROR_REPLY
+
+
+async def stream_chat_response(messages: list, allowed=None):
+    """Yield reply text chunks as the model produces them.
+
+    The upstream stream is closed as soon as the consumer stops iterating
+    (e.g. the client disconnected), so no tokens are generated for nobody.
+    With `allowed` the complete reply is only cached once it resolves to True.
+    """
+    cached = reply_cache.get(messages) if reply_cache else None
+    if cached is not None:
+        yield cached
+        return
+    start = time.perf_counter()
+    pieces = []
+    compacted = await compactor.acompact(messages, summarize_turns)
+    stream = scheduler.stream("chat", lambda: get_provider().stream_chat(compacted, model="gpt-4-turbo", temperature=0.7))
+    try:
+        async for piece in stream:
+            pieces.append(piece)
+            yield piece
+    finally:
+        await stream.aclose()
+    # Only complete replies are remembered (not ones cut short by a disconnect)
+    if reply_cache:
+        reply_cache.put_when(allowed, messages, "".join(pieces).strip(), time.perf_counter() - start)
+
+
+async def _moderate_batch(texts: list) -> list:
+    return await scheduler.call("moderation", lambda: get_provider().moderate_batch(texts))
+
+
+# 📦 Concurrent learners' utterances share one moderation request (plus a result cache)
+moderation_batcher = create_moderation_batcher(_moderate_batch, shared=shared_cache)
+
+
+async def moderate_remote(text: str) -> tuple:
+    """Remote moderation API: (flagged, flagged_categories)."""
+    return await moderation_batcher.moderate(text)
+
+
+# 🚨 Local profanity automaton first, remote moderation only when it can matter
+moderation = ModerationPolicy(
+    ProfanityFilter(load_profanity_terms()),
+    moderate_remote,
+    mode=os.getenv("PROFANITY_REMOTE_POLICY", "tiered"),
+)
+
+
+async def moderate_text(text: str) -> tuple:
+    """(flagged, flagged_categories, flagged_words) for a learner utterance."""
+    with span("moderation", moderation.mode):
+        return await moderation.acheck(text)
+
+
+async def suggest_better_response(user_input: str) -> str:
+    """Polite rewrite of a flagged utterance (same prompt as the Streamlit app)."""
+    prompt = f"사용자가 부적절한 내용을 입력했습니다: '{user_input}'. 이를 정중하게 바꾸고, 대화에 적절한 방식으로 다시 표현해주세요."
+    reply = await scheduler.call("suggest", lambda: get_provider().chat([{"role": "system", "content": prompt}], model="gpt-4-turbo"))
+    return reply.strip()
+
+
+def flagged_reply(result: dict) -> str:
+    return f"⚠️ 부적절한 표현이 감지되었습니다. 🔹 추천 표현: {result['alternative']}"
+
+
+async def transcribe_audio(audio_files: list) -> str:
+    """Transcribe upload-ready segments ([(filename, bytes)]) concurrently, joined in order."""
+    texts = await asyncio.gather(*(
+        scheduler.call("stt", lambda f=f: get_provider().transcribe(f, model=STT_MODEL)) for f in audio_files))
+    return " ".join(t.strip() for t in texts if t and t.strip())
+
+
+async def synthesize_speech(text: str) -> bytes:
+    """Audio for `text`, synthesized once per (text, voice, model) and then served from the TTS cache."""
+    async def synthesize(text):
+        return await scheduler.call("tts", lambda: get_provider().speech(text, voice=TTS_VOICE, model=TTS_MODEL))
 
+    path = await tts_cache.aget_or_create(text, TTS_VOICE, TTS_MODEL, synthesize)
+    with open(path, "rb") as f:
+        return f.read()
@@ -1,12 +1,45 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import os
+import time
+from contextlib import aclosing
+from fastapi import FastAPI, HTTPException, Path, Query, WebSocket
 from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from models import ChatRequest, ScenarioRequest
-from gpt_utils import generate_scenarios, generate_chat_response
-from fastapi.middleware.cors import CORSMiddleware
+from models import LEARNER_ID_PATTERN, ChatRequest, SessionCreateRequest, TurnRequest
+from gpt_utils import generate_scenarios, stream_scenarios, generate_chat_response, stream_chat_response, close_client, get_provider, CHAT_ERROR_REPLY, CHAT_BUSY_REPLY
+from gpt_utils import moderate_text, suggest_better_response, flagged_reply, moderation, moderation_batcher, reply_cache, scheduler
+from context_window import as_dicts
+from turn_pipeline import run_turn
+from scenario_cache import profile_key, scenario_cache
+from scenario_pool import load_pool
+from scheduler import BACKGROUND, UpstreamUnavailable
+from sessions import session_store
+from shared_cache import shared_cache
+from analytics import AnalyticsReader, create_analytics
+from audio_utils import TARGET_RATE
+from voice import VoiceSession
+from vad import TRAILING_SILENCE_MS
+from metrics import failed_fast, log_payload, record, registry, request_seconds, span
 
 app = FastAPI()
 
+DEFAULT_SYSTEM_PROMPT = "You are a Korean conversation partner helping the user practice Korean."
+
+# 🗂️ Precomputed scenarios for representative profiles (SCENARIO_POOL_DIR, built offline)
+scenario_pool = load_pool()
+SCENARIO_POOL_MIN_SIMILARITY = float(os.getenv("SCENARIO_POOL_MIN_SIMILARITY", "0.85"))
+SCENARIO_POOL_REFRESH = os.getenv("SCENARIO_POOL_REFRESH", "0") == "1"
+_refreshes = set()
+
+# 🚨 Moderate each learner turn (concurrently with a speculative reply)
+CHAT_MODERATION = os.getenv("CHAT_MODERATION", "0") == "1"
+
+# 📒 Turns / strikes / scenario choices, written in the background for progress tracking (ANALYTICS_DB)
+analytics = create_analytics()
+analytics_reader = AnalyticsReader(analytics.path) if analytics else None
+
 # Allow frontend connection
 app.add_middleware(
     CORSMiddleware,
@@ -17,17 +50,390 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Request duration per route template (for streams: time until the response starts)."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    request_seconds.observe(time.perf_counter() - start, method=request.method,
+                            route=route.path if route else "unmatched", status=response.status_code)
+    return response
+
+
+@app.exception_handler(UpstreamUnavailable)
+async def upstream_unavailable(request: Request, exc: UpstreamUnavailable):
+    """Shed / circuit open / deadline passed: tell the client when to try again."""
+    return JSONResponse(status_code=503, content={"detail": str(exc), "reason": exc.reason},
+                        headers={"Retry-After": str(max(1, round(exc.retry_after)))})
+
+
+@app.get("/upstream/stats")
+async def upstream_stats():
+    """In-flight / queued calls, retries, rejections and circuit breaker state per upstream endpoint."""
+    return scheduler.report()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: stage histograms, request durations, token counters."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.on_event("startup")
+async def warm_up():
+    """Create the upstream provider (imports the OpenAI SDK) in the background; the server is up meanwhile."""
+    asyncio.get_running_loop().run_in_executor(None, get_provider)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_client()  # 🔌 release pooled upstream connections
+    if analytics:
+        analytics.close()  # 📒 write what is still queued
+
 
 @app.post("/scenarios")
-async def get_scenarios(request: Request):
-    body = await request.json()
-    print("🔍 Incoming JSON Payload:", body)
+async def get_scenarios(request: Request, stream: bool = False):
+    with span("parse", "scenarios_request"):
+        body = await request.json()
+    log_payload("🔍 Incoming JSON Payload:", body)
+
+    pooled = await pooled_scenarios(body)
+    if pooled is not None and not stream:
+        return {"scenarios": pooled}
 
-    scenarios = generate_scenarios(body)  # ✅ this is a list of dicts
+    if stream:
+        # 🌊 ?stream=true: one SSE `scenario` frame per scenario as soon as it is complete
+        return StreamingResponse(scenario_events(body, pooled), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    # ♻️ Same (normalized) profile → cached scenarios / shared in-flight call
+    try:
+        scenarios = await scenario_cache.get_or_create(body, generate_scenarios)  # ✅ this is a list of dicts
+    except UpstreamUnavailable:
+        raise  # → 503 with Retry-After
+    except Exception as e:
+        print("❌ Scenario generation error:", e)
+        raise HTTPException(status_code=502, detail="Scenario generation failed")
 
     # Just return it directly — FastAPI will serialize to JSON
     return {"scenarios": scenarios}
 
+
+async def pooled_scenarios(profile: dict):
+    """Nearest precomputed scenario set, unless a personalized one is already cached."""
+    if scenario_pool is None or await scenario_cache.aget(profile_key(profile)) is not None:
+        return None
+    try:
+        with span("pool_lookup", "scenarios"):
+            scenarios = scenario_pool.match(profile, SCENARIO_POOL_MIN_SIMILARITY)
+    except Exception as e:
+        print("❌ Scenario pool lookup error:", e)  # generate as if there were no pool
+        return None
+    if scenarios is not None and SCENARIO_POOL_REFRESH:
+        # 🔄 Opt-in: personalize in the background; the next request gets the generated set
+        task = asyncio.ensure_future(scenario_cache.get_or_create(
+            profile, lambda p: generate_scenarios(p, priority=BACKGROUND)))
+        _refreshes.add(task)
+        task.add_done_callback(_refresh_done)
+    return scenarios
+
+
+def _refresh_done(task: asyncio.Task):
+    _refreshes.discard(task)
+    if not task.cancelled() and task.exception():
+        print("❌ Scenario refresh error:", task.exception())
+
+
+async def scenario_events(profile: dict, pooled: list = None):
+    start = time.perf_counter()
+    timings = {}
+    scenarios = []
+
+    async def replay(items):
+        for item in items:
+            yield item
+
+    source = replay(pooled) if pooled is not None else scenario_cache.stream(profile, stream_scenarios)
+    try:
+        async with aclosing(source) as stream:
+            async for scenario in stream:
+                if not scenarios:
+                    timings["first_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                    record("ttft", timings["first_ms"] / 1000, "scenarios")
+                scenarios.append(scenario)
+                yield sse({"index": len(scenarios) - 1, "scenario": scenario}, "scenario")
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        yield sse({"scenarios": scenarios, "timings": timings}, "done")
+    except Exception as e:
+        print("❌ Scenario stream error:", e)
+        retry = {"retry_after": e.retry_after} if isinstance(e, UpstreamUnavailable) else {}
+        yield sse({"scenarios": scenarios, **retry}, "error")
+
+
+@app.get("/scenarios/cache")
+async def scenario_cache_stats():
+    """Hit/miss counters and estimated upstream time saved by the scenario cache (and pool)."""
+    report = scenario_cache.report()
+    if scenario_pool is not None:
+        report["pool"] = scenario_pool.report()
+    return report
+
+
+@app.get("/moderation/stats")
+async def moderation_stats():
+    """Remote calls avoided by the local filter, and batch sizes / cache hits of the remote calls made."""
+    return {"policy": moderation.report(), "batcher": moderation_batcher.report()}
+
+@app.get("/cache/shared")
+async def shared_cache_stats():
+    """Hits / computes / waits of this worker on the node-wide cache tier, and its size per namespace."""
+    return shared_cache.report() if shared_cache else {"enabled": False}
+
+@app.get("/chat/cache")
+async def reply_cache_stats():
+    """Hit rate and estimated upstream seconds saved by the early-turn reply cache."""
+    return reply_cache.report() if reply_cache else {"enabled": False}
+
+def track_turn(text: str, result: dict, learner: str = None, session: str = None):
+    """Queue the turn (and a strike when flagged) for the analytics writer; never blocks the reply."""
+    if analytics is None or text is None or result.get("reply") in (CHAT_ERROR_REPLY, CHAT_BUSY_REPLY):
+        return
+    if result.get("flagged"):
+        analytics.record("strike", learner, session, text=text, categories=result.get("flagged_categories"),
+                         words=result.get("flagged_words"))
+    analytics.record("turn", learner, session, user=text, reply=result.get("reply"),
+                     flagged=bool(result.get("flagged")), timings=result.get("timings"))
+
+
+async def moderated_turn(history: list, text: str) -> dict:
+    """Moderation and a speculative reply run concurrently; a flagged turn gets a rewrite suggestion."""
+    allowed = asyncio.get_running_loop().create_future()  # the reply is cached only for an allowed turn
+    try:
+        result = await run_turn(text, history, moderate_text, lambda m: generate_chat_response(m, allowed),
+                                suggest_better_response)
+        allowed.set_result(not result["flagged"])
+    finally:
+        allowed.cancel()  # no-op once the verdict is set
+    if result["flagged"]:
+        result["reply"] = flagged_reply(result)
+    return result
+
+
 @app.post("/chat")
 async def chat(payload: ChatRequest):
-    return {"reply": generate_chat_response(payload.messages)}
\ No newline at end of file
+    messages = as_dicts(payload.messages)
+    text = messages[-1]["content"] if messages and messages[-1]["role"] == "user" else None
+    if CHAT_MODERATION and text is not None:
+        result = await moderated_turn(messages[:-1], text)
+    else:
+        result = {"reply": await generate_chat_response(messages)}
+    track_turn(text, result, payload.learner_id)
+    return result
+
+
+def sse(data: dict, event: str = None) -> str:
+    """Format one Server-Sent Events frame."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_reply(messages: list, request: Request, on_done=None, moderate: str = None,
+                 learner: str = None, session: str = None) -> StreamingResponse:
+    """Stream a reply as SSE: `token` frames, then one `done` frame with the full text.
+
+    `await on_done(text)` runs only when the reply completed; generation stops as
+    soon as the client disconnects. With `moderate` (the learner's text),
+    generation starts immediately but tokens are held back until moderation
+    passes; a flagged input ends the stream with a `flagged` frame instead.
+    Completed and flagged turns are queued for analytics under `learner` / `session`.
+    """
+    text_in = messages[-1]["content"] if messages and messages[-1]["role"] == "user" else None
+
+    async def pump(queue: asyncio.Queue, allowed):
+        try:
+            async with aclosing(stream_chat_response(messages, allowed)) as tokens:
+                async for token in tokens:
+                    await queue.put(token)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    async def events():
+        start = time.perf_counter()
+        timings = {}
+        queue = asyncio.Queue()
+        # The speculative reply is only cached once moderation allows the turn
+        allowed = asyncio.get_running_loop().create_future() if moderate is not None else None
+        producer = asyncio.ensure_future(pump(queue, allowed))  # 🏃 speculative: starts before moderation finishes
+        try:
+            if moderate is not None:
+                result = await moderate_text(moderate)
+                timings["moderation_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                allowed.set_result(not result[0])
+                if result[0]:
+                    producer.cancel()
+                    alternative = await suggest_better_response(moderate)
+                    payload = {"flagged": True, "flagged_categories": result[1], "flagged_words": result[2],
+                               "alternative": alternative}
+                    payload["reply"] = flagged_reply(payload)
+                    track_turn(text_in, payload, learner, session)
+                    yield sse(payload, "flagged")
+                    return
+
+            reply = []
+            while (token := await queue.get()) is not None:
+                if isinstance(token, Exception):
+                    raise token
+                if await request.is_disconnected():
+                    return  # 🔌 learner left — cancelling the producer closes the upstream stream
+                if not reply:
+                    timings["ttft_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                    record("ttft", timings["ttft_ms"] / 1000, "sse")
+                reply.append(token)
+                yield sse({"token": token}, "token")
+            text = "".join(reply).strip()
+            if on_done:
+                await on_done(text)
+            timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            track_turn(text_in, {"reply": text, "timings": timings}, learner, session)
+            yield sse({"reply": text, "timings": timings}, "done")
+        except UpstreamUnavailable as e:
+            failed_fast("sse", e)
+            yield sse({"reply": CHAT_BUSY_REPLY, "retry_after": e.retry_after}, "error")
+        except Exception as e:
+            print("❌ GPT Chat stream error:", e)
+            yield sse({"reply": CHAT_ERROR_REPLY}, "error")
+        finally:
+            producer.cancel()
+            if allowed is not None:
+                allowed.cancel()  # no-op once the verdict is set
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/chat/stream")
+async def chat_stream(payload: ChatRequest, request: Request):
+    messages = as_dicts(payload.messages)
+    text = messages[-1]["content"] if CHAT_MODERATION and messages and messages[-1]["role"] == "user" else None
+    return stream_reply(messages, request, moderate=text, learner=payload.learner_id)
+
+
+@app.websocket("/voice")
+async def voice(websocket: WebSocket, session_id: str = None, opening_line: str = None,
+                learner_id: str = Query(None, pattern=LEARNER_ID_PATTERN),
+                rate: int = TARGET_RATE, trailing_silence_ms: int = TRAILING_SILENCE_MS, barge_in: bool = True):
+    """🎙️ Full-duplex voice turns: stream PCM16 mono in, get transcript, reply tokens and per-sentence audio back.
+
+    Continues a server-side session (?session_id=...) or starts from ?opening_line=...; see voice.VoiceSession.
+    """
+    await websocket.accept()
+    history = await session_store.aget(session_id) if session_id else [
+        {"role": "system", "content": DEFAULT_SYSTEM_PROMPT},
+        {"role": "assistant", "content": opening_line or "안녕하세요!"},
+    ]
+    if history is None:
+        await websocket.close(code=4404, reason="Session not found or expired")
+        return
+
+    async def on_turn(text: str, result: dict):
+        if session_id and not result.get("flagged"):
+            await session_store.aappend(session_id, {"role": "user", "content": text},
+                                 {"role": "assistant", "content": result["reply"]})
+        track_turn(text, result, learner_id, session_id)
+
+    await VoiceSession(websocket, history, on_turn, moderate=CHAT_MODERATION, rate=rate,
+                       trailing_silence_ms=trailing_silence_ms, barge_in=barge_in).run()
+
+
+# 💾 Server-side sessions: the client sends only the new turn, not the whole history
+
+async def load_session(session_id: str) -> list:
+    history = await session_store.aget(session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return history
+
+
+@app.post("/sessions")
+async def create_session(payload: SessionCreateRequest):
+    messages = [
+        {"role": "system", "content": payload.system_prompt or DEFAULT_SYSTEM_PROMPT},
+        {"role": "assistant", "content": payload.opening_line},
+    ]
+    session_id = await session_store.acreate(messages)
+    if analytics:
+        analytics.record("scenario", payload.learner_id, session_id,
+                         topic=payload.topic or payload.opening_line, opening_line=payload.opening_line)
+    return {"session_id": session_id}
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    return {"messages": await load_session(session_id)}
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    await session_store.adelete(session_id)
+    return {"deleted": session_id}
+
+
+@app.post("/sessions/{session_id}/turns")
+async def session_turn(session_id: str, payload: TurnRequest):
+    history = await load_session(session_id)
+    user_turn = {"role": "user", "content": payload.content}
+    if CHAT_MODERATION:
+        result = await moderated_turn(history, payload.content)
+    else:
+        result = {"reply": await generate_chat_response(history + [user_turn])}
+    # Only completed, unflagged turns are stored, so a failed call can simply be retried
+    if result["reply"] not in (CHAT_ERROR_REPLY, CHAT_BUSY_REPLY) and not result.get("flagged"):
+        await session_store.aappend(session_id, user_turn, {"role": "assistant", "content": result["reply"]})
+    track_turn(payload.content, result, session=session_id)
+    return result
+
+
+@app.post("/sessions/{session_id}/turns/stream")
+async def session_turn_stream(session_id: str, payload: TurnRequest, request: Request):
+    """Streaming variant of a session turn (same SSE frames as /chat/stream)."""
+    user_turn = {"role": "user", "content": payload.content}
+
+    async def on_done(text: str):
+        await session_store.aappend(session_id, user_turn, {"role": "assistant", "content": text})
+
+    return stream_reply(
+        await load_session(session_id) + [user_turn], request,
+        on_done=on_done,
+        moderate=payload.content if CHAT_MODERATION else None,
+        session=session_id,
+    )
+
+
+# 📒 Learner history / progress (sync routes: they run in the threadpool on their own read connection)
+# Learner ids are opaque (LEARNER_ID_PATTERN), so a learner's transcripts cannot be looked up by name
+
+def require_analytics() -> AnalyticsReader:
+    if analytics_reader is None:
+        raise HTTPException(status_code=404, detail="Analytics are off (set ANALYTICS_DB)")
+    return analytics_reader
+
+
+@app.get("/learners/{learner_id}/history")
+def learner_history(learner_id: str = Path(pattern=LEARNER_ID_PATTERN), kind: str = None, since: float = None,
+                    limit: int = 200):
+    kinds = kind.split(",") if kind else None
+    return {"events": require_analytics().history(learner_id, kinds=kinds, since=since, limit=min(limit, 1000))}
+
+
+@app.get("/learners/{learner_id}/progress")
+def learner_progress(learner_id: str = Path(pattern=LEARNER_ID_PATTERN)):
+    return require_analytics().progress(learner_id)
+
+
+@app.get("/analytics/stats")
+async def analytics_stats():
+    """Queue depth, batches written and events dropped by the background writer."""
+    return analytics.report() if analytics else {"enabled": False}
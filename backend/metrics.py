@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# ⚙️ Observability settings (override via .env)
+SPAN_SAMPLE_RATE = float(os.getenv("METRICS_SPAN_SAMPLE_RATE", "0.01"))  # share of spans logged as JSON
+LOG_PAYLOADS = os.getenv("LOG_PAYLOADS", "0") == "1"
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", "200"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+span_log = logging.getLogger("koreachatbot.spans")
+if SPAN_SAMPLE_RATE > 0 and not span_log.handlers:
+    # Nothing configures logging in the app or under uvicorn: sampled spans go to stderr as bare JSON lines
+    _span_handler = logging.StreamHandler()
+    _span_handler.setFormatter(logging.Formatter("%(message)s"))
+    span_log.addHandler(_span_handler)
+    span_log.setLevel(logging.INFO)
+    span_log.propagate = False
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                names = self.labelnames + ("le",)
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(names, key + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {round(series[-2], 6)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "chatbot_stage_seconds", "Duration of one pipeline stage",
+    ("stage", "op"),
+)
+request_seconds = registry.histogram(
+    "chatbot_request_seconds", "HTTP request duration by route",
+    ("method", "route", "status"),
+)
+tokens_total = registry.counter(
+    "chatbot_tokens_total", "Prompt/completion tokens sent to and received from the model (estimated)",
+    ("kind", "model"),
+)
+errors_total = registry.counter(
+    "chatbot_stage_errors_total", "Stages that raised",
+    ("stage", "op"),
+)
+busy_replies = registry.counter(
+    "chatbot_busy_replies_total", "Turns answered with the busy reply because an upstream call failed fast",
+    ("path", "reason"),
+)
+
+
+def failed_fast(path: str, error: Exception):
+    """Count a turn that failed fast (counted, not printed: under overload there are hundreds)."""
+    busy_replies.inc(path=path, reason=getattr(error, "reason", "unavailable"))
+
+
+def record(stage: str, seconds: float, op: str = "", **fields):
+    """Record a finished span: histogram always, sampled JSON log line."""
+    stage_seconds.observe(seconds, stage=stage, op=op)
+    if SPAN_SAMPLE_RATE > 0 and random.random() < SPAN_SAMPLE_RATE:
+        span_log.info(json.dumps({"span": stage, "op": op, "ms": round(seconds * 1000, 2), **fields},
+                                 ensure_ascii=False))
+
+
+@contextmanager
+def span(stage: str, op: str = "", **fields):
+    """Time a block as one pipeline stage (works in sync and async code)."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        errors_total.inc(stage=stage, op=op)
+        raise
+    finally:
+        record(stage, time.perf_counter() - start, op, **fields)
+
+
+def count_tokens(kind: str, model: str, count: int):
+    tokens_total.inc(count, kind=kind, model=model)
+
+
+def log_payload(label: str, payload):
+    """Print a request/response payload only when LOG_PAYLOADS=1, truncated to LOG_PAYLOAD_CHARS."""
+    if not LOG_PAYLOADS:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False, default=str)
+    if len(text) > LOG_PAYLOAD_CHARS:
+        text = f"{text[:LOG_PAYLOAD_CHARS]}… (+{len(text) - LOG_PAYLOAD_CHARS} chars)"
+    print(label, text)
+
+
+def serve_metrics(port: int):
+    """Expose the registry on http://0.0.0.0:<port>/metrics from a background thread.
+
+    For processes without a web server of their own (the Streamlit app).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Dict
+from pydantic import BaseModel, Field
+from typing import List, Dict, Optional
 
 class ScenarioRequest(BaseModel):
     Name: str
@@ -19,5 +19,18 @@ class Message(BaseModel):
     role: str
     content: str
 
+# Opaque learner id (uuid4().hex), never a name: anyone who knows it can read the learner's history
+LEARNER_ID_PATTERN = r"^[0-9a-f]{32}$"
+
 class ChatRequest(BaseModel):
     messages: List[Message]
+    learner_id: Optional[str] = Field(None, pattern=LEARNER_ID_PATTERN)
+
+class SessionCreateRequest(BaseModel):
+    opening_line: str
+    system_prompt: Optional[str] = None
+    learner_id: Optional[str] = Field(None, pattern=LEARNER_ID_PATTERN)
+    topic: Optional[str] = None
+
+class TurnRequest(BaseModel):
+    content: str
@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import json
+import os
+from collections import Counter, OrderedDict
+
+from metrics import registry
+
+batch_sizes = registry.histogram(
+    "chatbot_moderation_batch_size", "Distinct inputs per remote moderation request",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+
+class ModerationBatcher:
+    """Async micro-batcher in front of the remote moderation API.
+
+    Concurrent `moderate(text)` calls that arrive within `window_ms` of the
+    first one (or until `max_batch` inputs are waiting) are sent as one
+    list-input request and the results are fanned back to each caller.
+    Identical inputs in a batch are sent once, and results are kept in a
+    bounded LRU cache so repeated phrases ("네", "감사합니다") skip the
+    network entirely. With a `shared` cache (SharedCache) verdicts are
+    also looked up in / written to the "moderation" namespace, so every
+    worker process benefits from the others' calls.
+
+    `send_batch(texts) -> [(flagged, categories), ...]` is an awaitable in
+    the same order as `texts`. Must be used from a single event loop.
+    """
+
+    def __init__(self, send_batch, window_ms: float = 10, max_batch: int = 32, cache_size: int = 1024,
+                 shared=None):
+        self.send_batch = send_batch
+        self.shared = shared
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pending = []  # [(text, future)]
+        self._timer = None
+        self._tasks = set()
+        self.stats = {"requests": 0, "cache_hits": 0, "shared_hits": 0, "batches": 0, "upstream_inputs": 0,
+                      "errors": 0}
+        self.batch_size_counts = Counter()
+
+    async def moderate(self, text: str) -> tuple:
+        """(flagged, flagged_categories) for one input."""
+        self.stats["requests"] += 1
+        key = text.strip()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return cached
+        if self.shared is not None:
+            blob = await self.shared.aget("moderation", self._shared_key(key))
+            if blob is not None:
+                self.stats["shared_hits"] += 1
+                result = tuple(json.loads(blob))
+                self._remember(key, result)
+                return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((key, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)  # keep a reference until the batch is done
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list):
+        texts = list(dict.fromkeys(text for text, _ in batch))  # dedupe, keep order
+        self.stats["batches"] += 1
+        self.stats["upstream_inputs"] += len(texts)
+        self.batch_size_counts[len(texts)] += 1
+        batch_sizes.observe(len(texts))
+        try:
+            results = list(await self.send_batch(texts))
+            if len(results) != len(texts):
+                raise ValueError(f"moderation returned {len(results)} results for {len(texts)} inputs")
+            results = dict(zip(texts, (tuple(r) for r in results)))
+            for text, result in results.items():
+                self._remember(text, result)
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(results[text])
+        except Exception as e:
+            self.stats["errors"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:  # never leave a caller waiting (e.g. the task was cancelled)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("moderation batch ended without a result"))
+        if self.shared is not None:  # after the callers have their verdicts
+            try:
+                for text, result in results.items():
+                    await self.shared.aset("moderation", self._shared_key(text),
+                                           json.dumps(list(result)).encode("utf-8"))
+            except Exception as e:
+                print("❌ Shared moderation cache write failed:", e)
+
+    @staticmethod
+    def _shared_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _remember(self, text: str, result: tuple):
+        self._cache[text] = result
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def report(self) -> dict:
+        batches = self.stats["batches"]
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "cache_entries": len(self._cache),
+            "mean_batch_size": self.stats["upstream_inputs"] / batches if batches else 0.0,
+            "calls_saved_ratio": 1 - batches / requests if requests else 0.0,
+            "batch_size_distribution": dict(sorted(self.batch_size_counts.items())),
+        }
+
+
+def create_moderation_batcher(send_batch, shared=None) -> ModerationBatcher:
+    return ModerationBatcher(
+        send_batch,
+        window_ms=float(os.getenv("MODERATION_BATCH_WINDOW_MS", "10")),
+        max_batch=int(os.getenv("MODERATION_BATCH_MAX", "32")),
+        cache_size=int(os.getenv("MODERATION_CACHE_SIZE", "1024")),
+        shared=shared,
+    )
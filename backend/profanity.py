@@ -0,0 +1,312 @@
+import asyncio
+import os
+import re
+import unicodedata
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Hangul syllable -> compatibility jamo tables (Unicode order)
+_CHO = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_JUNG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+_JONG = ["", "ㄱ", "ㄲ", "ㄱㅅ", "ㄴ", "ㄴㅈ", "ㄴㅎ", "ㄷ", "ㄹ", "ㄹㄱ", "ㄹㅁ", "ㄹㅂ", "ㄹㅅ",
+         "ㄹㅌ", "ㄹㅍ", "ㄹㅎ", "ㅁ", "ㅂ", "ㅂㅅ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+
+# Evasion folding: tense -> plain consonants, merged vowels, look-alike symbols
+_SUBSTITUTIONS = str.maketrans({
+    "ㄲ": "ㄱ", "ㄸ": "ㄷ", "ㅃ": "ㅂ", "ㅆ": "ㅅ", "ㅉ": "ㅈ",
+    "ㅐ": "ㅔ", "ㅒ": "ㅖ", "ㅢ": "ㅣ",
+    "1": "ㅣ", "l": "ㅣ", "|": "ㅣ", "!": "ㅣ", "0": "ㅇ",
+})
+
+# Latin keys typed on a Korean (2-beolsik) keyboard, e.g. "tlqkf" -> 시발
+_KEYBOARD = str.maketrans({
+    "r": "ㄱ", "R": "ㄲ", "s": "ㄴ", "e": "ㄷ", "E": "ㄸ", "f": "ㄹ", "a": "ㅁ", "q": "ㅂ", "Q": "ㅃ",
+    "t": "ㅅ", "T": "ㅆ", "d": "ㅇ", "w": "ㅈ", "W": "ㅉ", "c": "ㅊ", "z": "ㅋ", "x": "ㅌ", "v": "ㅍ",
+    "g": "ㅎ", "k": "ㅏ", "o": "ㅐ", "i": "ㅑ", "O": "ㅒ", "j": "ㅓ", "p": "ㅔ", "u": "ㅕ", "P": "ㅖ",
+    "h": "ㅗ", "y": "ㅛ", "n": "ㅜ", "b": "ㅠ", "m": "ㅡ", "l": "ㅣ",
+})
+
+# Punctuation and zero-width characters used to split a word apart ("개.새.끼")
+_SEPARATORS = re.compile(r"[^\w\s!|]|_|[\u200b-\u200f\u2060\ufeff]")  # ! and | are folded to ㅣ
+_LATIN = re.compile(r"[A-Za-z]")
+# NFKC would turn typed jamo (ㅂㅏㄹ) into conjoining jamo, partly recomposed, so it skips them
+_NOT_JAMO = re.compile(r"[^\u3131-\u318e]+")
+
+
+def to_jamo(text: str) -> str:
+    """Decompose Hangul syllables into compatibility jamo (씨발 -> ㅆㅣㅂㅏㄹ)."""
+    return decompose(text)[0]
+
+
+def decompose(text: str) -> tuple:
+    """(jamo text, starts): starts[i] is True where a match may begin or end.
+
+    That is the first jamo of a syllable, any character outside a syllable
+    (typed jamo, Latin, digits) and the end of the text, so "조직" never
+    contains 좆 and "시바라고" never contains 시발.
+    """
+    out, starts = [], []
+    for ch in text:
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            jamo = _CHO[code // 588] + _JUNG[(code % 588) // 28] + _JONG[code % 28]
+            out.append(jamo)
+            starts += [True] + [False] * (len(jamo) - 1)
+        else:
+            out.append(ch)
+            starts.append(True)
+    starts.append(True)
+    return "".join(out), starts
+
+
+def join_spelled_out(text: str, runs: bool = True) -> str:
+    """Drop in-word punctuation and join runs of one-syllable words ("시 발 진짜" -> "시발 진짜").
+
+    Other spaces are kept, so a match never spans two real words ("시 발전소").
+    With runs=False only the punctuation is dropped.
+    """
+    words = [w for w in (_SEPARATORS.sub("", w) for w in text.split()) if w]
+    if not runs:
+        return " ".join(words)
+    out, run = [], ""
+    for word in words:
+        if len(word) == 1:
+            run += word
+            continue
+        if run:
+            out.append(run)
+            run = ""
+        out.append(word)
+    if run:
+        out.append(run)
+    return " ".join(out)
+
+
+def prepare(text: str, keyboard: bool = False, runs: bool = True) -> tuple:
+    """Matching form of an utterance: NFKC, spelled-out words joined, jamo, folded look-alikes."""
+    text = _NOT_JAMO.sub(lambda m: unicodedata.normalize("NFKC", m.group()), text)
+    if keyboard:
+        text = text.translate(_KEYBOARD)
+    jamo, starts = decompose(join_spelled_out(text, runs))
+    return jamo.lower().translate(_SUBSTITUTIONS), starts
+
+
+def normalize(text: str, keyboard: bool = False) -> str:
+    """Canonical form of a list term: NFKC, jamo, folded look-alikes, no separators."""
+    return "".join(prepare(text, keyboard)[0].split())
+
+
+class AhoCorasick:
+    """Multi-pattern automaton: one pass over the text finds every pattern."""
+
+    def __init__(self, patterns: list):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.lengths = [len(p) for p in patterns]
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = nxt
+            self.output[node].append(index)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0) if node else 0
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def spans(self, text: str, starts: list = None):
+        """(pattern index, start, end) for every occurrence (only between positions where `starts` is True)."""
+        goto, fail, output, lengths = self.goto, self.fail, self.output, self.lengths
+        node = 0
+        for end, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node] and (starts is None or starts[end]):
+                for i in output[node]:
+                    if starts is None or starts[end - lengths[i]]:
+                        yield i, end - lengths[i], end
+
+    def search(self, text: str, starts: list = None) -> set:
+        """Indices of all patterns occurring in `text` (only between positions where `starts` is True)."""
+        return {i for i, _, _ in self.spans(text, starts)}
+
+
+# Ordinary words that contain a list term; a hit inside one of these is dropped
+ALLOWED_COMPOUNDS = "시발점,시발역,시발택시"
+
+
+class ProfanityFilter:
+    """Compiled, jamo-aware matcher for a custom profanity list (build once, reuse).
+
+    `allowed` compounds (default ALLOWED_COMPOUNDS) are matched in the same
+    pass, and list hits that fall inside one of them are dropped.
+    """
+
+    def __init__(self, terms: list, allowed: list = None):
+        self.terms = []
+        patterns = []
+        for term in terms:
+            pattern = normalize(term.strip())
+            if pattern:
+                self.terms.append(term.strip())
+                patterns.append(pattern)
+        allowed = ALLOWED_COMPOUNDS.split(",") if allowed is None else allowed
+        patterns += [p for p in (normalize(a.strip()) for a in allowed) if p]
+        self._automaton = AhoCorasick(patterns)
+
+    def _hits(self, text: str, runs: bool) -> set:
+        hits = set()
+        for keyboard in (False, True) if _LATIN.search(text) else (False,):
+            found, allowed = [], []
+            for i, start, end in self._automaton.spans(*prepare(text, keyboard, runs)):
+                (found if i < len(self.terms) else allowed).append((i, start, end))
+            hits.update(i for i, start, end in found if not any(a <= start and end <= b for _, a, b in allowed))
+        return hits
+
+    def scan(self, text: str) -> tuple:
+        """(words, suspects): list terms found in `text` as whole syllables, including
+        substituted/punctuated/keyboard-typed variants, and terms that only appear once
+        runs of one-syllable words are joined ("시 발 진짜", but also "열 시 발 기차").
+        """
+        hits = self._hits(text, runs=False)
+        suspects = set()
+        if join_spelled_out(text) != join_spelled_out(text, runs=False):
+            suspects = self._hits(text, runs=True) - hits
+        return [self.terms[i] for i in sorted(hits)], [self.terms[i] for i in sorted(suspects)]
+
+    def find(self, text: str) -> list:
+        """Terms from the list found in `text` (suspects excluded)."""
+        return self.scan(text)[0]
+
+
+# Words that warrant a remote check even when the local list has no hit
+DEFAULT_RISK_TERMS = "죽,자살,살인,폭탄,마약,섹스,야동,병신,새끼,꺼져,혐오,kill,die,sex,drug,hate"
+
+
+class ModerationPolicy:
+    """Tiered moderation: local automaton first, remote API only when it can matter.
+
+    mode="always"   every utterance goes to the remote API (previous behaviour)
+    mode="tiered"   local hits are flagged without a remote call; low-risk
+                    utterances skip the remote call entirely. Suspect hits
+                    (only found in a joined spelled-out run) always get
+                    the remote check and are reported only if it flags
+    mode="deferred" like tiered, but low-risk utterances are still checked
+                    remotely in the background (audit only, never blocks)
+
+    `remote(text) -> (flagged, categories)` wraps the moderation API; use
+    `check` with a blocking `remote` and `acheck` with an async one.
+    """
+
+    def __init__(self, profanity: ProfanityFilter, remote, mode: str = "tiered",
+                 risk_terms: list = None, max_low_risk_chars: int = 80):
+        self.profanity = profanity
+        self.remote = remote
+        self.mode = mode
+        self.risk = ProfanityFilter(risk_terms if risk_terms is not None else DEFAULT_RISK_TERMS.split(","))
+        self.max_low_risk_chars = max_low_risk_chars
+        self._background = ThreadPoolExecutor(max_workers=2) if mode == "deferred" else None
+        self._audits = set()  # deferred audit tasks, kept referenced until done
+        self.stats = {"checks": 0, "local_hits": 0, "remote_calls": 0, "remote_skipped": 0,
+                      "remote_deferred": 0, "deferred_flags": 0, "suspect_hits": 0}
+
+    def is_low_risk(self, text: str) -> bool:
+        """Short utterance, no risk keywords, no jamo fragments or mixed-script evasion."""
+        if len(text) > self.max_low_risk_chars:
+            return False
+        if re.search(r"[ㄱ-ㅣ]", text) or (_LATIN.search(text) and re.search(r"[가-힣]", text)):
+            return False
+        return not any(self.risk.scan(text))
+
+    def needs_remote(self, text: str, local_hits: list, suspects: list = ()) -> bool:
+        if self.mode == "always":
+            return True
+        return not local_hits and (bool(suspects) or not self.is_low_risk(text))
+
+    def _local(self, text: str) -> tuple:
+        self.stats["checks"] += 1
+        words, suspects = self.profanity.scan(text)
+        if words:
+            self.stats["local_hits"] += 1
+        elif suspects:
+            self.stats["suspect_hits"] += 1
+        return words, suspects
+
+    def _skip(self, words: list) -> bool:
+        """Count a skipped remote call; True when it should still be audited in the background."""
+        self.stats["remote_skipped"] += 1
+        if self.mode == "deferred" and not words:
+            self.stats["remote_deferred"] += 1
+            return True
+        return False
+
+    @staticmethod
+    def _result(words: list, suspects: list, flagged: bool, categories: list) -> tuple:
+        if flagged:
+            return True, categories, words + suspects
+        if words:
+            return True, categories, words
+        return False, [], []
+
+    def check(self, text: str) -> tuple:
+        """(flagged, flagged_categories, flagged_words), same shape as app.check_profanity."""
+        words, suspects = self._local(text)
+        flagged, categories = False, []
+        if self.needs_remote(text, words, suspects):
+            self.stats["remote_calls"] += 1
+            flagged, categories = self.remote(text)
+        elif self._skip(words):
+            self._background.submit(self._audit, text)
+        return self._result(words, suspects, flagged, categories)
+
+    async def acheck(self, text: str) -> tuple:
+        """Async `check` for an awaitable `remote` (used by the FastAPI backend)."""
+        words, suspects = self._local(text)
+        flagged, categories = False, []
+        if self.needs_remote(text, words, suspects):
+            self.stats["remote_calls"] += 1
+            flagged, categories = await self.remote(text)
+        elif self._skip(words):
+            task = asyncio.ensure_future(self._aaudit(text))
+            self._audits.add(task)
+            task.add_done_callback(self._audits.discard)
+        return self._result(words, suspects, flagged, categories)
+
+    def _audit(self, text: str):
+        try:
+            if self.remote(text)[0]:
+                self.stats["deferred_flags"] += 1
+                print("⚠️ Deferred moderation flagged a low-risk utterance:", text[:50])
+        except Exception as e:
+            print("❌ Deferred moderation error:", e)
+
+    async def _aaudit(self, text: str):
+        try:
+            if (await self.remote(text))[0]:
+                self.stats["deferred_flags"] += 1
+                print("⚠️ Deferred moderation flagged a low-risk utterance:", text[:50])
+        except Exception as e:
+            print("❌ Deferred moderation error:", e)
+
+    def report(self) -> dict:
+        checks = self.stats["checks"]
+        return {**self.stats, "remote_avoided_ratio": self.stats["remote_skipped"] / checks if checks else 0.0}
+
+
+def load_profanity_terms() -> list:
+    return [t for t in os.getenv("KOREAN_PROFANITY", "").split(",") if t.strip()]
@@ -0,0 +1,482 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from context_window import count_message_tokens, count_tokens
+from metrics import count_tokens as record_tokens, record, span
+
+# ⚙️ Upstream pool / timeout settings (override via .env)
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "200"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "50"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "60"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+
+
+class Provider(ABC):
+    """Everything the chatbot asks of a model vendor: chat, moderation, STT and TTS.
+
+    All methods are coroutines; `BlockingProvider` adapts them for the
+    synchronous Streamlit app. A subclass missing one of the abstract
+    methods fails when it is constructed.
+    """
+
+    @abstractmethod
+    async def chat(self, messages: list, model: str = "gpt-4-turbo", temperature: float = None,
+                   response_format: dict = None) -> str:
+        ...
+
+    @abstractmethod
+    def stream_chat(self, messages: list, model: str = "gpt-4-turbo", temperature: float = None,
+                    response_format: dict = None):
+        """Async iterator of reply text chunks (implement as an async generator)."""
+
+    @abstractmethod
+    async def moderate(self, text: str) -> tuple:
+        """(flagged, flagged_categories)"""
+
+    async def moderate_batch(self, texts: list) -> list:
+        """[(flagged, flagged_categories)] for several inputs, in order."""
+        return list(await asyncio.gather(*(self.moderate(text) for text in texts)))
+
+    @abstractmethod
+    async def transcribe(self, audio_file: tuple, model: str = "whisper-1") -> str:
+        """`audio_file` is (filename, bytes)."""
+
+    @abstractmethod
+    async def speech(self, text: str, voice: str = "alloy", model: str = "tts-1") -> bytes:
+        ...
+
+    async def close(self):
+        pass
+
+
+class OpenAIProvider(Provider):
+    """The real OpenAI API over a shared, pooled httpx connection pool."""
+
+    def __init__(self, client=None):
+        # Imported here: the SDK takes ~0.5 s to import and the stub / cassette providers don't need it
+        import httpx
+        import openai
+
+        self.client = client or openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=httpx.Timeout(UPSTREAM_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+            max_retries=0,  # retried by the scheduler, within each call's deadline
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=UPSTREAM_MAX_CONNECTIONS,
+                    max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+                ),
+                timeout=httpx.Timeout(UPSTREAM_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT),
+            ),
+        )
+
+    async def chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None):
+        extra = {k: v for k, v in (("temperature", temperature), ("response_format", response_format)) if v is not None}
+        response = await self.client.chat.completions.create(model=model, messages=messages, **extra)
+        return response.choices[0].message.content
+
+    async def stream_chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None):
+        extra = {k: v for k, v in (("temperature", temperature), ("response_format", response_format)) if v is not None}
+        stream = await self.client.chat.completions.create(model=model, messages=messages, stream=True, **extra)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+    async def moderate(self, text):
+        return (await self.moderate_batch([text]))[0]
+
+    async def moderate_batch(self, texts):
+        # The moderation endpoint takes a list of inputs: one round trip for the whole batch
+        response = await self.client.moderations.create(input=texts, model="text-moderation-latest")
+        results = []
+        for result in response.results:
+            categories = result.categories.model_dump()
+            results.append((result.flagged, [c for c, v in categories.items() if v is not None and v > 0.5]))
+        return results
+
+    async def transcribe(self, audio_file, model="whisper-1"):
+        response = await self.client.audio.transcriptions.create(model=model, file=audio_file)
+        return response.text.strip()
+
+    async def speech(self, text, voice="alloy", model="tts-1"):
+        response = await self.client.audio.speech.create(model=model, voice=voice, input=text)
+        return response.content
+
+    async def close(self):
+        await self.client.close()
+
+
+class Latency:
+    """Latency distribution parsed from a spec string (seconds).
+
+    fixed:0.5 | uniform:0.2:0.8 | normal:0.5:0.1 | lognormal:0.5:0.4 (median, sigma)
+    """
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self.rng = rng
+        if kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = self.rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = self.rng.gauss(p[0], p[1])
+        else:
+            value = p[0] * self.rng.lognormvariate(0.0, p[1])
+        return max(0.0, value)
+
+
+STUB_REPLIES = [
+    "좋아요! 조금 더 자세히 말해 줄 수 있어요?",
+    "아, 그렇군요. 그다음에는 무엇을 했어요?",
+    "정말 재미있네요! 왜 그렇게 생각했어요?",
+    "네, 알겠어요. 다른 것도 필요하세요?",
+]
+STUB_TRANSCRIPTS = [
+    "안녕하세요. 저는 한국어를 공부하고 있어요.",
+    "이 옷은 얼마예요?",
+    "지하철역은 어디에 있어요?",
+    "어제 친구하고 영화를 봤어요.",
+]
+
+
+def _digest(*parts) -> int:
+    data = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(data).digest()[:8], "big")
+
+
+class StubProvider(Provider):
+    """Deterministic offline provider for benchmarks and load tests.
+
+    Outputs depend only on the request (same input -> same output) and
+    latencies are drawn from per-operation distributions with a seeded RNG,
+    so runs are reproducible without network access. Scenario prompts
+    (asking for "Title:" / "Line:") get a well-formed five-scenario answer;
+    moderation flags any of `flagged_terms`.
+    """
+
+    def __init__(self, latency: dict = None, seed: int = 0, flagged_terms: list = None, chunk_chars: int = 4):
+        self.rng = random.Random(seed)
+        latency = latency or {}
+        self.latency = {op: Latency(latency.get(op, default), self.rng) for op, default in (
+            ("chat", "fixed:0.5"), ("moderate", "fixed:0.1"),
+            ("transcribe", "fixed:0.3"), ("speech", "fixed:0.2"),
+        )}
+        self.flagged_terms = flagged_terms if flagged_terms is not None else ["kill", "시발"]
+        self.chunk_chars = chunk_chars
+        self.calls = {op: 0 for op in self.latency}
+
+    async def _wait(self, op: str):
+        self.calls[op] += 1
+        await asyncio.sleep(self.latency[op].sample())
+
+    @staticmethod
+    def reply_for(messages: list, response_format: dict = None) -> str:
+        prompt = messages[-1]["content"] if messages else ""
+        if response_format and '"scenarios"' in prompt:
+            return json.dumps({"scenarios": [
+                {"title": f"연습 시나리오 {chr(64 + i)}", "content": STUB_REPLIES[i % len(STUB_REPLIES)]}
+                for i in range(1, 6)
+            ]}, ensure_ascii=False)
+        if "Title:" in prompt and "Line:" in prompt:
+            return "\n".join(
+                f"{i}. Title: 연습 시나리오 {chr(64 + i)}\n   Line: {STUB_REPLIES[i % len(STUB_REPLIES)]}"
+                for i in range(1, 6)
+            )
+        return STUB_REPLIES[_digest(messages) % len(STUB_REPLIES)]
+
+    async def chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None):
+        await self._wait("chat")
+        return self.reply_for(messages, response_format)
+
+    async def stream_chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None):
+        self.calls["chat"] += 1
+        text = self.reply_for(messages, response_format)
+        pieces = [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)]
+        delay = self.latency["chat"].sample() / len(pieces)
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            yield piece
+
+    async def moderate(self, text):
+        return (await self.moderate_batch([text]))[0]
+
+    async def moderate_batch(self, texts):
+        await self._wait("moderate")  # one request, whatever the batch size
+        results = []
+        for text in texts:
+            hits = [t for t in self.flagged_terms if t and t in text.lower()]
+            results.append((bool(hits), ["harassment"] if hits else []))
+        return results
+
+    async def transcribe(self, audio_file, model="whisper-1"):
+        await self._wait("transcribe")
+        return STUB_TRANSCRIPTS[_digest(hashlib.sha256(audio_file[1]).hexdigest()) % len(STUB_TRANSCRIPTS)]
+
+    async def speech(self, text, voice="alloy", model="tts-1"):
+        await self._wait("speech")
+        # Silence roughly as long as the sentence would take to say (~8 chars/s)
+        import numpy as np
+        from audio_utils import encode_wav
+
+        return encode_wav(np.zeros(int(16000 * min(10.0, 0.3 + len(text) / 8)), dtype=np.float32))
+
+
+class CassetteMiss(KeyError):
+    """Replay mode met a request that was never recorded."""
+
+
+class CassetteProvider(Provider):
+    """Record/replay wrapper: real request shapes, offline and reproducible.
+
+    mode="record" forwards every call to `inner` and appends the request
+    key, response and measured latency to a JSONL cassette.
+    mode="replay" answers from the cassette only (raising `CassetteMiss`
+    for unknown requests) and, with `replay_latency`, sleeps for the
+    recorded duration so benchmarks still see realistic timings.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", inner: Provider = None, replay_latency: bool = True):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("record mode needs an inner provider")
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        self.replay_latency = replay_latency
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    @staticmethod
+    def key(op: str, request: dict) -> str:
+        data = json.dumps([op, request], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _append(self, entry: dict):
+        with self._lock:
+            self.entries[entry["key"]] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.stats["recorded"] += 1
+
+    async def _replay(self, op: str, request: dict):
+        entry = self.entries.get(self.key(op, request))
+        if entry is None:
+            self.stats["misses"] += 1
+            raise CassetteMiss(f"{op} request not in cassette {self.path}")
+        self.stats["replayed"] += 1
+        if self.replay_latency:
+            await asyncio.sleep(entry["seconds"])
+        return entry["response"]
+
+    async def _call(self, op: str, request: dict, call, encode=lambda r: r, decode=lambda r: r):
+        if self.mode == "replay":
+            return decode(await self._replay(op, request))
+        start = time.perf_counter()
+        response = await call()
+        self._append({"key": self.key(op, request), "op": op,
+                      "seconds": round(time.perf_counter() - start, 4), "response": encode(response)})
+        return response
+
+    async def chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None):
+        request = {"messages": messages, "model": model, "temperature": temperature}
+        if response_format is not None:
+            request["response_format"] = response_format
+        return await self._call("chat", request,
+                                lambda: self.inner.chat(messages, model, temperature, response_format))
+
+    async def stream_chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None):
+        request = {"messages": messages, "model": model, "temperature": temperature}
+        if response_format is not None:
+            request["response_format"] = response_format
+        if self.mode == "replay":
+            entry = self.entries.get(self.key("stream_chat", request))
+            if entry is None:
+                self.stats["misses"] += 1
+                raise CassetteMiss(f"stream_chat request not in cassette {self.path}")
+            self.stats["replayed"] += 1
+            delay = entry["seconds"] / max(1, len(entry["response"])) if self.replay_latency else 0
+            for piece in entry["response"]:
+                await asyncio.sleep(delay)
+                yield piece
+            return
+        start = time.perf_counter()
+        pieces = []
+        async for piece in self.inner.stream_chat(messages, model, temperature, response_format):
+            pieces.append(piece)
+            yield piece
+        self._append({"key": self.key("stream_chat", request), "op": "stream_chat",
+                      "seconds": round(time.perf_counter() - start, 4), "response": pieces})
+
+    async def moderate(self, text):
+        return (await self.moderate_batch([text]))[0]
+
+    async def moderate_batch(self, texts):
+        # Recorded per input: batch composition depends on timing, so replay must not
+        if self.mode == "replay":
+            entries = [self.entries.get(self.key("moderate", {"text": text})) for text in texts]
+            if None in entries:
+                self.stats["misses"] += 1
+                raise CassetteMiss(f"moderate request not in cassette {self.path}")
+            self.stats["replayed"] += len(entries)
+            if self.replay_latency:
+                await asyncio.sleep(max(entry["seconds"] for entry in entries))
+            return [tuple(entry["response"]) for entry in entries]
+        start = time.perf_counter()
+        results = await self.inner.moderate_batch(texts)
+        seconds = round(time.perf_counter() - start, 4)
+        for text, result in zip(texts, results):
+            self._append({"key": self.key("moderate", {"text": text}), "op": "moderate",
+                          "seconds": seconds, "response": list(result)})
+        return results
+
+    async def transcribe(self, audio_file, model="whisper-1"):
+        request = {"audio": hashlib.sha256(audio_file[1]).hexdigest(), "model": model}
+        return await self._call("transcribe", request, lambda: self.inner.transcribe(audio_file, model))
+
+    async def speech(self, text, voice="alloy", model="tts-1"):
+        request = {"text": text, "voice": voice, "model": model}
+        return await self._call("speech", request, lambda: self.inner.speech(text, voice, model),
+                                encode=lambda b: base64.b64encode(b).decode("ascii"), decode=base64.b64decode)
+
+    async def close(self):
+        if self.inner is not None:
+            await self.inner.close()
+
+
+class InstrumentedProvider(Provider):
+    """Times every call into the /metrics histograms and counts (estimated) tokens.
+
+    Stages: upstream (chat, moderate), ttft (streamed chat), stt, tts.
+    """
+
+    def __init__(self, inner: Provider):
+        self.inner = inner
+
+    async def chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None):
+        record_tokens("prompt", model, count_message_tokens(messages))
+        with span("upstream", "chat", model=model):
+            reply = await self.inner.chat(messages, model, temperature, response_format)
+        record_tokens("completion", model, count_tokens(reply or ""))
+        return reply
+
+    async def stream_chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None):
+        record_tokens("prompt", model, count_message_tokens(messages))
+        start = time.perf_counter()
+        first, pieces = True, []
+        stream = self.inner.stream_chat(messages, model, temperature, response_format)
+        try:
+            async for piece in stream:
+                if first:
+                    record("ttft", time.perf_counter() - start, "chat", model=model)
+                    first = False
+                pieces.append(piece)
+                yield piece
+        finally:
+            await stream.aclose()
+            record("upstream", time.perf_counter() - start, "stream_chat", model=model)
+            record_tokens("completion", model, count_tokens("".join(pieces)))
+
+    async def moderate(self, text):
+        with span("upstream", "moderate"):
+            return await self.inner.moderate(text)
+
+    async def moderate_batch(self, texts):
+        with span("upstream", "moderate_batch", inputs=len(texts)):
+            return await self.inner.moderate_batch(texts)
+
+    async def transcribe(self, audio_file, model="whisper-1"):
+        with span("stt", model, bytes=len(audio_file[1])):
+            return await self.inner.transcribe(audio_file, model)
+
+    async def speech(self, text, voice="alloy", model="tts-1"):
+        with span("tts", model, chars=len(text)):
+            return await self.inner.speech(text, voice, model)
+
+    async def close(self):
+        await self.inner.close()
+
+
+def _stub_latency_from_env() -> dict:
+    return {op: os.environ[f"STUB_LATENCY_{op.upper()}"]
+            for op in ("chat", "moderate", "transcribe", "speech")
+            if os.getenv(f"STUB_LATENCY_{op.upper()}")}
+
+
+def create_provider() -> Provider:
+    """Provider chosen by LLM_PROVIDER (openai | stub), optionally wrapped by LLM_CASSETTE, always instrumented."""
+    kind = os.getenv("LLM_PROVIDER", "openai")
+    if kind == "stub":
+        provider = StubProvider(_stub_latency_from_env(), seed=int(os.getenv("STUB_SEED", "0")))
+    elif kind == "openai":
+        provider = OpenAIProvider()
+    else:
+        raise ValueError(f"Unknown LLM_PROVIDER: {kind}")
+
+    cassette = os.getenv("LLM_CASSETTE")
+    if cassette:
+        mode = os.getenv("LLM_CASSETTE_MODE", "replay")
+        provider = CassetteProvider(cassette, mode, inner=provider if mode == "record" else None,
+                                    replay_latency=os.getenv("LLM_CASSETTE_LATENCY", "1") == "1")
+    return InstrumentedProvider(provider)
+
+
+class BlockingProvider:
+    """Synchronous facade for the Streamlit app.
+
+    Coroutines run on one long-lived background event loop, so the async
+    client's connection pool is reused across calls and threads.
+    """
+
+    def __init__(self, provider: Provider, scheduler=None):
+        self.provider = provider
+        self.scheduler = scheduler
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="provider-loop", daemon=True).start()
+
+    def run(self, coro):
+        """Run a coroutine on the provider's loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def call(self, endpoint: str, make_call):
+        """Run `make_call()` on the provider's loop, through the scheduler (caps, retries, breaker) if any."""
+        if self.scheduler is None:
+            return self.run(make_call())
+        return self.run(self.scheduler.call(endpoint, make_call))
+
+    def chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None, endpoint="chat") -> str:
+        return self.call(endpoint, lambda: self.provider.chat(messages, model, temperature, response_format))
+
+    def moderate(self, text) -> tuple:
+        return self.call("moderation", lambda: self.provider.moderate(text))
+
+    def transcribe(self, audio_file, model="whisper-1") -> str:
+        return self.call("stt", lambda: self.provider.transcribe(audio_file, model))
+
+    def speech(self, text, voice="alloy", model="tts-1") -> bytes:
+        return self.call("tts", lambda: self.provider.speech(text, voice, model))
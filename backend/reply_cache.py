@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import registry
+
+VECTOR_DIM = 512
+_NOISE = re.compile(r"[\s\W_]+")
+
+reply_cache_lookups = registry.counter(
+    "chatbot_reply_cache_lookups_total", "Early-turn reply cache lookups by result",
+    ("result",),
+)
+
+
+def ngram_vector(text: str, sizes: tuple = (2, 3), dim: int = VECTOR_DIM) -> np.ndarray:
+    """Unit-length hashed character n-gram vector ("네, 바지 사고 싶어요" ~ "바지 사고 싶어요")."""
+    text = _NOISE.sub("", unicodedata.normalize("NFKC", text).lower())
+    vec = np.zeros(dim, dtype=np.float32)
+    if len(text) < min(sizes):
+        if text:
+            vec[zlib.crc32(text.encode("utf-8")) % dim] = 1.0
+        return vec
+    for n in sizes:
+        for i in range(len(text) - n + 1):
+            vec[zlib.crc32(text[i:i + n].encode("utf-8")) % dim] += 1.0
+    return vec / np.linalg.norm(vec)
+
+
+class _Scope:
+    """Cached utterances for one (scenario, preceding history) context."""
+
+    def __init__(self):
+        self.vectors = np.zeros((0, VECTOR_DIM), dtype=np.float32)
+        self.entries = []  # [{"text", "replies", "used"}], row-aligned with vectors
+        self.clock = 0
+
+    def nearest(self, vector: np.ndarray) -> tuple:
+        if not self.entries:
+            return -1.0, None
+        scores = self.vectors @ vector
+        best = int(np.argmax(scores))
+        return float(scores[best]), best
+
+    def add(self, text: str, vector: np.ndarray, reply: str, capacity: int):
+        if len(self.entries) >= capacity:
+            # Evict the least recently used utterance
+            victim = min(range(len(self.entries)), key=lambda i: self.entries[i]["used"])
+            self.vectors = np.delete(self.vectors, victim, axis=0)
+            del self.entries[victim]
+        self.clock += 1
+        self.vectors = np.vstack([self.vectors, vector[None, :]])
+        self.entries.append({"text": text, "replies": [reply], "used": self.clock})
+
+
+class ReplyCache:
+    """Similarity-keyed cache of assistant replies for the first turns of a conversation.
+
+    Scoped by the exact preceding history (scenario system prompt, opening
+    line and earlier turns), so a cached reply is only ever reused in the
+    same conversational context. Within a scope, the learner's utterance is
+    matched by cosine similarity of character n-gram vectors against
+    `threshold`.
+
+    Variety guard: an utterance is only answered from the cache once
+    `variety` different model replies have been collected for it; until
+    then the model is called and its reply added. Hits pick one of the
+    collected replies at random, so repeated learners don't all get the
+    same canned line.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_turns: int = 2, variety: int = 3,
+                 per_scope: int = 64, max_scopes: int = 512):
+        self.threshold = threshold
+        self.max_turns = max_turns
+        self.variety = variety
+        self.per_scope = per_scope
+        self.max_scopes = max_scopes
+        self._scopes = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "filling": 0, "skipped": 0,
+                      "stored": 0, "miss_seconds": 0.0, "evicted_scopes": 0}
+
+    def _key(self, messages: list):
+        """(scope key, learner text) for an early turn ending in a user message, else None."""
+        if not messages or messages[-1]["role"] != "user":
+            return None
+        history = messages[:-1]
+        if sum(1 for m in history if m["role"] == "user") >= self.max_turns:
+            return None
+        scope = hashlib.sha256(json.dumps([[m["role"], m["content"]] for m in history],
+                                          ensure_ascii=False).encode("utf-8")).hexdigest()
+        return scope, messages[-1]["content"]
+
+    def get(self, messages: list):
+        """Cached reply for `messages`, or None (call the model, then `put`)."""
+        key = self._key(messages)
+        if key is None:
+            self.stats["skipped"] += 1
+            reply_cache_lookups.inc(result="skipped")
+            return None
+        scope_key, text = key
+        vector = ngram_vector(text)
+        with self._lock:
+            self.stats["lookups"] += 1
+            scope = self._scopes.get(scope_key)
+            if scope is not None:
+                self._scopes.move_to_end(scope_key)
+                score, index = scope.nearest(vector)
+                if index is not None and score >= self.threshold:
+                    entry = scope.entries[index]
+                    scope.clock += 1
+                    entry["used"] = scope.clock
+                    if len(entry["replies"]) >= self.variety:
+                        self.stats["hits"] += 1
+                        reply_cache_lookups.inc(result="hit")
+                        return random.choice(entry["replies"])
+                    self.stats["filling"] += 1
+            self.stats["misses"] += 1
+            reply_cache_lookups.inc(result="miss")
+            return None
+
+    def put(self, messages: list, reply: str, seconds: float = 0.0):
+        """Remember the model's `reply` to `messages` (took `seconds` upstream)."""
+        key = self._key(messages)
+        if key is None or not reply:
+            return
+        scope_key, text = key
+        vector = ngram_vector(text)
+        with self._lock:
+            self.stats["stored"] += 1
+            self.stats["miss_seconds"] += seconds
+            scope = self._scopes.get(scope_key)
+            if scope is None:
+                scope = self._scopes[scope_key] = _Scope()
+                while len(self._scopes) > self.max_scopes:
+                    self._scopes.popitem(last=False)
+                    self.stats["evicted_scopes"] += 1
+            self._scopes.move_to_end(scope_key)
+            score, index = scope.nearest(vector)
+            if index is not None and score >= self.threshold:
+                replies = scope.entries[index]["replies"]
+                if reply not in replies and len(replies) < self.variety:
+                    replies.append(reply)
+            else:
+                scope.add(text, vector, reply, self.per_scope)
+
+    def put_when(self, allowed, messages: list, reply: str, seconds: float = 0.0):
+        """`put` once `allowed` (a future, e.g. of the moderation verdict) resolves to True.
+
+        Nothing is stored when it resolves to False, fails or is cancelled,
+        so a speculative reply to a flagged utterance never reaches the
+        cache. `allowed` may be an asyncio or a concurrent.futures Future;
+        None stores right away.
+        """
+        if allowed is None:
+            self.put(messages, reply, seconds)
+            return
+
+        def done(future):
+            if not future.cancelled() and future.exception() is None and future.result():
+                self.put(messages, reply, seconds)
+
+        allowed.add_done_callback(done)
+
+    def report(self) -> dict:
+        lookups, stored = self.stats["lookups"], self.stats["stored"]
+        avg_miss = self.stats["miss_seconds"] / stored if stored else 0.0
+        return {
+            **self.stats,
+            "scopes": len(self._scopes),
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "avg_miss_seconds": avg_miss,
+            "estimated_seconds_saved": self.stats["hits"] * avg_miss,
+        }
+
+
+def create_reply_cache():
+    """ReplyCache when REPLY_CACHE=1, else None."""
+    if os.getenv("REPLY_CACHE", "0") != "1":
+        return None
+    return ReplyCache(
+        threshold=float(os.getenv("REPLY_CACHE_THRESHOLD", "0.9")),
+        max_turns=int(os.getenv("REPLY_CACHE_MAX_TURNS", "2")),
+        variety=int(os.getenv("REPLY_CACHE_VARIETY", "3")),
+        per_scope=int(os.getenv("REPLY_CACHE_PER_SCOPE", "64")),
+        max_scopes=int(os.getenv("REPLY_CACHE_MAX_SCOPES", "512")),
+    )
@@ -0,0 +1,289 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+
+from shared_cache import JSONNamespace, shared_cache
+
+# Profile fields that do not change which scenarios fit the learner.
+# The name is left out so learners sharing a cohort profile share one entry;
+# these fields are kept out of the prompt too, or one learner's name could be
+# served to another from the cache.
+IGNORED_FIELDS = {f.strip() for f in os.getenv("SCENARIO_CACHE_IGNORE_FIELDS", "Name").split(",") if f.strip()}
+
+
+def shared_profile(profile: dict) -> dict:
+    """The part of `profile` the cache key covers (what scenario generation may see)."""
+    return {k: v for k, v in profile.items() if k not in IGNORED_FIELDS}
+
+
+def profile_key(profile: dict) -> str:
+    """Stable cache key for a ScenarioRequest-shaped profile.
+
+    Field order, surrounding/duplicate whitespace and letter case do not
+    change the key, so a page refresh or a re-typed form hits the cache.
+    """
+    normalized = {k: re.sub(r"\s+", " ", str(v)).strip().casefold() for k, v in shared_profile(profile).items()}
+    blob = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class DiskStore:
+    """One JSON file per key under `path`; survives restarts."""
+
+    def __init__(self, path: str, max_entries: int = 1024):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str):
+        try:
+            with open(self._file(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry["expires_at"] < time.time():
+            self.delete(key)
+            return None
+        return entry["expires_at"], entry["value"]
+
+    def set(self, key: str, expires_at: float, value):
+        tmp = self._file(key) + f".{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+        os.replace(tmp, self._file(key))  # atomic, readers never see half a file
+        self._prune()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def _prune(self):
+        files = [os.path.join(self.path, n) for n in os.listdir(self.path) if n.endswith(".json")]
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class Flight:
+    """One generation in progress: the scenarios delivered so far and the task producing the full list."""
+
+    def __init__(self):
+        self.scenarios = []
+        self.task = None
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+
+    def add(self, scenario: dict):
+        self.scenarios.append(scenario)
+        self._notify()
+
+    def finish(self, scenarios: list, error: BaseException = None):
+        if len(scenarios) > len(self.scenarios):  # computed by another worker: arrives all at once
+            self.scenarios = list(scenarios)
+        self.error = error
+        self.done = True
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self):
+        """Replay what was delivered so far, then each new scenario as it arrives."""
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.scenarios):
+                yield self.scenarios[index]
+                index += 1
+            if self.done:
+                break
+            await changed.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class ScenarioCache:
+    """TTL + LRU cache for generated scenarios with single-flight coalescing.
+
+    Concurrent requests for the same key share one upstream call instead
+    of each starting their own, whether they stream or not. With a shared
+    `store` (JSONNamespace) that also holds across worker processes.
+    """
+
+    def __init__(self, ttl: float = 86400, max_entries: int = 256, store=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.store = store
+        self._entries = OrderedDict()  # key -> (expires_at, scenarios)
+        self._inflight = {}            # key -> Flight
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0,
+                      "errors": 0, "upstream_seconds": 0.0}
+
+    def _memory(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] >= time.time():
+                self._entries.move_to_end(key)
+                return entry[1]
+            del self._entries[key]
+        return None
+
+    def _stored(self, key: str, entry):
+        if entry is None:
+            return None
+        self._remember(key, *entry)
+        self.stats["disk_hits"] += 1
+        return entry[1]
+
+    def get(self, key: str):
+        cached = self._memory(key)
+        if cached is None and self.store is not None:
+            cached = self._stored(key, self.store.get(key))
+        return cached
+
+    async def aget(self, key: str):
+        """`get` for the event loop: the store (SQLite / files) is read in a worker thread."""
+        cached = self._memory(key)
+        if cached is None and self.store is not None:
+            cached = self._stored(key, await asyncio.to_thread(self.store.get, key))
+        return cached
+
+    async def aset(self, key: str, scenarios: list):
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, scenarios)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.set, key, expires_at, scenarios)
+
+    def _remember(self, key: str, expires_at: float, scenarios: list):
+        self._entries[key] = (expires_at, scenarios)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _start(self, key: str, compute) -> Flight:
+        """Run `await compute(flight)` once for `key`; later requests attach to the returned flight."""
+        # The upstream call runs as its own task so a leader that disconnects
+        # does not cancel the work other (coalesced) requests are waiting on.
+        flight = Flight()
+        flight.task = asyncio.ensure_future(self._create(key, flight, compute))
+        flight.task.add_done_callback(lambda t: t.cancelled() or t.exception())  # raised to the waiters instead
+        self._inflight[key] = flight
+        return flight
+
+    async def get_or_create(self, profile: dict, create) -> list:
+        """Return cached scenarios for `profile`, calling `await create(profile)` on a miss."""
+        key = profile_key(profile)
+        cached = await self.aget(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            flight = self._start(key, lambda _: create(profile))
+        return await asyncio.shield(flight.task)
+
+    async def _create(self, key: str, flight: Flight, compute) -> list:
+        start = time.perf_counter()
+        shared = getattr(self.store, "aget_or_compute", None)
+        scenarios, error = [], None
+        try:
+            if shared is not None:
+                # Another worker may be generating the same profile: wait for its result
+                scenarios = await shared(key, lambda: compute(flight), self.ttl) or []
+            else:
+                scenarios = await compute(flight)
+        except BaseException as e:
+            error = e
+            if isinstance(e, Exception):
+                self.stats["errors"] += 1
+            raise
+        finally:
+            self.stats["upstream_seconds"] += time.perf_counter() - start
+            del self._inflight[key]
+            flight.finish(scenarios or [], error)
+        if scenarios:  # never cache a failed parse
+            if shared is not None:
+                self._remember(key, time.time() + self.ttl, scenarios)
+            else:
+                await self.aset(key, scenarios)
+        return scenarios
+
+    async def stream(self, profile: dict, create_stream):
+        """Async iterator of scenarios for `profile`, delivered one by one.
+
+        Cached results are replayed at once. On a miss `create_stream(profile)`
+        is consumed as it streams and the complete list is cached at the end;
+        requests for the same profile meanwhile (streaming or not) attach to
+        that generation: they get what was delivered so far, then follow it.
+        """
+        key = profile_key(profile)
+        cached = await self.aget(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            for scenario in cached:
+                yield scenario
+            return
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+
+            async def collect(flight):
+                async for scenario in create_stream(profile):
+                    flight.add(scenario)
+                return list(flight.scenarios)
+
+            flight = self._start(key, collect)
+        async for scenario in flight.follow():
+            yield scenario
+
+    def report(self) -> dict:
+        served = self.stats["hits"] + self.stats["coalesced"]
+        lookups = served + self.stats["misses"]
+        avg_upstream = self.stats["upstream_seconds"] / self.stats["misses"] if self.stats["misses"] else 0.0
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": served / lookups if lookups else 0.0,
+            "avg_upstream_seconds": avg_upstream,
+            "estimated_seconds_saved": served * avg_upstream,
+            "upstream_calls_saved": served,
+        }
+
+
+def _scenario_store():
+    """Shared cross-worker tier (SHARED_CACHE_DB), else per-file disk store (SCENARIO_CACHE_DIR), else none."""
+    if shared_cache is not None:
+        return JSONNamespace(shared_cache, "scenarios")
+    if os.getenv("SCENARIO_CACHE_DIR"):
+        return DiskStore(os.getenv("SCENARIO_CACHE_DIR"))
+    return None
+
+
+scenario_cache = ScenarioCache(
+    ttl=float(os.getenv("SCENARIO_CACHE_TTL", "86400")),
+    max_entries=int(os.getenv("SCENARIO_CACHE_SIZE", "256")),
+    store=_scenario_store(),
+)
@@ -0,0 +1,306 @@
+"""Precomputed scenario sets for representative learner profiles.
+
+An offline job generates scenarios for a set of representative profiles
+and stores them next to a NumPy matrix of encoded profiles. At startup
+the matrix is memory-mapped, so `/scenarios` can answer from the nearest
+precomputed set in well under a millisecond.
+
+Build (from ``backend/``, uses the configured provider):
+    python scenario_pool.py build --out scenario_pool --size 200
+    python scenario_pool.py build --out scenario_pool --profiles past_profiles.jsonl --size 200
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+import re
+
+import numpy as np
+
+from metrics import registry
+
+DIM = 256  # 1 KiB per profile
+
+# Known visa types and TOPIK levels get dedicated slots (no hash collisions);
+# free-text fields are hashed into the rest of the vector.
+VISA_TYPES = ["C4", "D2", "D3", "D4", "D10", "E4", "E7", "E8", "E9", "H2", "F1", "F2", "F3", "F4", "F6", "G1"]
+LEVEL_BASE = len(VISA_TYPES)
+NUMERIC_BASE = LEVEL_BASE + 7
+HASHED_BASE = NUMERIC_BASE + 3
+
+# Relative weight of each field group in the similarity
+WEIGHTS = {
+    "visa": 3.0, "industry": 2.0, "level": 2.0, "interests": 2.0, "hobbies": 1.0,
+    "living": 1.0, "study": 1.0, "stay": 0.5, "work": 0.5, "language": 0.5, "nationality": 0.5,
+}
+
+pool_similarity = registry.histogram(
+    "chatbot_scenario_pool_similarity", "Cosine similarity of the nearest precomputed profile",
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99, 1.0),
+)
+
+
+def _slot(group: str, value: str) -> int:
+    digest = hashlib.blake2b(f"{group}\x00{value}".encode("utf-8"), digest_size=4).digest()
+    return HASHED_BASE + int.from_bytes(digest, "little") % (DIM - HASHED_BASE)
+
+
+# Korean answers (Streamlit form, free text) -> the English values the React form sends
+VOCABULARY = {
+    "네": "yes", "예": "yes", "아니요": "no", "아니오": "no", "해당 없음": "n/a",
+    "제조": "manufacturing", "제조업": "manufacturing", "교육": "education", "의료": "healthcare",
+    "보건": "healthcare", "금융": "finance", "서비스": "hospitality", "숙박": "hospitality", "관광": "hospitality",
+    "호텔": "hospitality", "농업": "agriculture", "건설": "construction", "물류": "logistics", "기타": "other",
+    "여행": "travel", "음식": "food", "역사": "history", "음악": "music", "스포츠": "sports", "영화": "movies",
+    "게임": "games", "패션": "fashion", "축구": "soccer", "독서": "reading", "요리": "cooking",
+}
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)\s*\+?\s*(년|years?|yrs?|개월|달|months?)?")
+
+
+def canonical(value) -> str:
+    text = re.sub(r"\s+", " ", str(value if value is not None else "")).strip().lower()
+    return VOCABULARY.get(text, text)
+
+
+def parse_years(value) -> float:
+    """'2년' / '1년 6개월' / '18 months' / '1–2 years' (midpoint) / 3 -> years (0 when unknown)."""
+    text = str(value or "").lower()
+    values, pending = [], []
+    for number, unit in _DURATION.findall(text):
+        pending.append(float(number))
+        if unit:  # "1–2 years": the unit applies to every number before it
+            scale = 1 / 12 if unit.startswith(("개월", "달", "month")) else 1
+            values += [n * scale for n in pending]
+            pending = []
+    values += pending  # bare numbers are years
+    if len(values) == 2 and re.search(r"[–~-]|\bto\b", text):
+        return sum(values) / 2
+    return float(sum(values))
+
+
+def parse_level(value) -> int:
+    """TOPIK level 0-6 from '3급' / 'TOPIK 4' / a raw score (0 = no test)."""
+    text = str(value or "")
+    match = re.search(r"(\d)\s*급", text)
+    if match:
+        return min(6, int(match.group(1)))
+    numbers = [int(n) for n in re.findall(r"\d+", text)]
+    if not numbers:
+        return 0
+    value = max(numbers)
+    return min(6, value) if value <= 6 else min(6, 1 + value // 50)
+
+
+def _terms(value) -> list:
+    return [canonical(t) for t in re.split(r"[,/·\s]+", str(value or "").strip()) if t]
+
+
+def encode_profile(profile: dict) -> np.ndarray:
+    """ScenarioRequest fields -> unit-length float32 vector (cosine similarity = dot product).
+
+    Values may be any JSON type; Korean and English answers share one vocabulary.
+    """
+    vec = np.zeros(DIM, dtype=np.float32)
+
+    def put(group: str, values: list):
+        if values:
+            weight = WEIGHTS[group] / np.sqrt(len(values))
+            for value in values:
+                vec[_slot(group, value)] += weight
+
+    visa = str(profile.get("Visa_Type") or "").strip().upper()
+    if visa in VISA_TYPES:
+        vec[VISA_TYPES.index(visa)] = WEIGHTS["visa"]
+    else:
+        put("visa", [visa] if visa else [])
+    put("industry", _terms(profile.get("Industry")))
+    put("interests", _terms(profile.get("Interests")))
+    put("hobbies", _terms(profile.get("Hobbies")))
+    put("living", [canonical(profile.get("Living_in_Korea"))])
+    put("language", _terms(profile.get("NativeLanguage")))
+    put("nationality", _terms(profile.get("Nationality")))
+
+    # TOPIK level as a category that spills half its weight into the neighbouring levels
+    level = parse_level(profile.get("Korean_Test_Score"))
+    vec[LEVEL_BASE + level] = WEIGHTS["level"]
+    for near in (level - 1, level + 1):
+        if 0 <= near <= 6:
+            vec[LEVEL_BASE + near] = WEIGHTS["level"] / 2
+
+    # Ordinal fields, scaled to roughly [0, 1]
+    base = NUMERIC_BASE
+    vec[base] = WEIGHTS["study"] * min(parse_years(profile.get("Duration_of_Korean_Study")), 5) / 5
+    vec[base + 1] = WEIGHTS["stay"] * min(parse_years(profile.get("Duration_of_Stay")), 10) / 10
+    vec[base + 2] = WEIGHTS["work"] * min(parse_years(profile.get("Work_Experience")), 10) / 10
+
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class ScenarioPool:
+    """Nearest-neighbour lookup over precomputed scenario sets.
+
+    `vectors.npy` is memory-mapped (read-only, shared between workers via
+    the page cache); `entries.json` holds each representative profile and
+    its scenarios in the same row order.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(path, "entries.json"), encoding="utf-8") as f:
+            self.entries = json.load(f)
+        if len(self.entries) != len(self.vectors):
+            raise ValueError(f"scenario pool {path}: {len(self.entries)} entries vs {len(self.vectors)} vectors")
+        self.stats = {"hits": 0, "misses": 0, "hit_similarity_sum": 0.0}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def nearest(self, profile: dict, k: int = 1) -> list:
+        """[(similarity, entry)] of the `k` closest representative profiles, best first."""
+        if not len(self.entries):
+            return []
+        scores = self.vectors @ encode_profile(profile)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.entries[i]) for i in top]
+
+    def match(self, profile: dict, min_similarity: float):
+        """Scenarios of the nearest profile when it is at least `min_similarity` alike, else None."""
+        matches = self.nearest(profile)
+        if not matches:
+            return None
+        similarity, entry = matches[0]
+        pool_similarity.observe(similarity)
+        if similarity < min_similarity:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.stats["hit_similarity_sum"] += similarity
+        return entry["scenarios"]
+
+    def report(self) -> dict:
+        hits, lookups = self.stats["hits"], self.stats["hits"] + self.stats["misses"]
+        return {
+            "profiles": len(self.entries),
+            "hits": hits,
+            "misses": self.stats["misses"],
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "mean_hit_similarity": self.stats["hit_similarity_sum"] / hits if hits else 0.0,
+        }
+
+    @staticmethod
+    def save(path: str, entries: list):
+        os.makedirs(path, exist_ok=True)
+        if entries:
+            vectors = np.stack([encode_profile(e["profile"]) for e in entries])
+        else:
+            vectors = np.zeros((0, DIM), np.float32)
+        np.save(os.path.join(path, "vectors.npy"), vectors.astype(np.float32))
+        with open(os.path.join(path, "entries.json"), "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+
+
+def load_pool():
+    """The pool from SCENARIO_POOL_DIR, or None when unset/missing."""
+    path = os.getenv("SCENARIO_POOL_DIR")
+    if not path:
+        return None
+    try:
+        pool = ScenarioPool(path)
+    except (OSError, ValueError) as e:
+        print("⚠️ Scenario pool not loaded:", e)
+        return None
+    print(f"✅ Scenario pool loaded: {len(pool)} profiles from {path}")
+    return pool
+
+
+# ---- offline build -------------------------------------------------------
+
+# Values as the frontend UserInfoForm sends them
+GRID = {
+    "Visa_Type": ["E9", "D2", "D4", "F6", "E7", "H2", "F4", "C4"],
+    "Industry": ["Manufacturing", "IT", "Education", "Healthcare", "Hospitality", "Finance"],
+    "Korean_Test_Score": ["", "2급", "4급"],
+    "Interests": ["Travel", "Food", "History", "Music", "Sports"],
+}
+
+
+def grid_profiles(size: int, seed: int = 0) -> list:
+    """Representative synthetic profiles: a sample of the visa x industry x level x interest grid."""
+    combos = list(itertools.product(*GRID.values()))
+    random.Random(seed).shuffle(combos)
+    profiles = []
+    for combo in combos[:size]:
+        profile = dict(zip(GRID.keys(), combo))
+        profile.update({"Living_in_Korea": "Yes", "Duration_of_Korean_Study": "6 months – 1 year", "Hobbies": ""})
+        profiles.append(profile)
+    return profiles
+
+
+def representative_profiles(profiles: list, size: int, iterations: int = 20, seed: int = 0) -> list:
+    """k-means over encoded profiles; returns the real profile closest to each centroid."""
+    if len(profiles) <= size:
+        return profiles
+    X = np.stack([encode_profile(p) for p in profiles])
+    rng = np.random.default_rng(seed)
+    centroids = X[rng.choice(len(X), size, replace=False)]
+    for _ in range(iterations):
+        assign = np.argmax(X @ centroids.T, axis=1)
+        for c in range(size):
+            members = X[assign == c]
+            if len(members):
+                mean = members.mean(axis=0)
+                centroids[c] = mean / (np.linalg.norm(mean) or 1)
+    chosen = sorted(set(np.argmax(X @ centroids.T, axis=0).tolist()))
+    return [profiles[i] for i in chosen]
+
+
+async def build(profiles: list, concurrency: int = 8) -> list:
+    from gpt_utils import generate_scenarios
+
+    slots = asyncio.Semaphore(concurrency)
+    done = 0
+
+    async def one(profile):
+        nonlocal done
+        async with slots:
+            scenarios = await generate_scenarios(profile)
+        done += 1
+        print(f"  {done}/{len(profiles)} {profile.get('Visa_Type')} {profile.get('Industry')}: {len(scenarios)} scenarios")
+        return {"profile": profile, "scenarios": scenarios}
+
+    entries = await asyncio.gather(*(one(p) for p in profiles))
+    return [e for e in entries if e["scenarios"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scenario pool tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="pre-generate scenarios for representative profiles")
+    b.add_argument("--out", default="scenario_pool")
+    b.add_argument("--size", type=int, default=200, help="number of representative profiles")
+    b.add_argument("--profiles", help="JSONL of past learner profiles to cluster (default: synthetic grid)")
+    b.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.profiles:
+        with open(args.profiles, encoding="utf-8") as f:
+            history = [json.loads(line) for line in f if line.strip()]
+        profiles = representative_profiles(history, args.size)
+    else:
+        profiles = grid_profiles(args.size)
+    print(f"🏗️ Generating scenarios for {len(profiles)} representative profiles...")
+    entries = asyncio.run(build(profiles, args.concurrency))
+    ScenarioPool.save(args.out, entries)
+    print(f"✅ Saved {len(entries)} scenario sets to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
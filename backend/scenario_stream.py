@@ -0,0 +1,107 @@
+import json
+import re
+
+# 📐 Output contract for scenario generation (JSON mode)
+SCENARIO_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "scenarios": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string", "description": "Short scenario title, plain text"},
+                    "content": {"type": "string", "description": "Korean opening line spoken by the partner"},
+                },
+                "required": ["title", "content"],
+            },
+        },
+    },
+    "required": ["scenarios"],
+}
+
+
+def validate_scenario(item) -> dict:
+    """{"title", "content"} with non-empty strings, or None when `item` breaks the contract."""
+    if not isinstance(item, dict):
+        return None
+    title, content = item.get("title"), item.get("content")
+    if not isinstance(title, str) or not isinstance(content, str) or not title.strip() or not content.strip():
+        return None
+    return {"title": title.strip(), "content": content.strip()}
+
+
+class ScenarioStreamParser:
+    """Incremental parser for ``{"scenarios": [{...}, {...}]}`` arriving in chunks.
+
+    `feed(chunk)` returns the scenarios completed by that chunk, so each one
+    can be delivered as soon as its closing brace streams in. A bare
+    top-level array of scenarios is accepted too. Brace counting skips
+    string contents (and escapes), so titles with braces or numbers are safe.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.item_depth = None  # nesting depth of scenario objects: {"scenarios": [{ = 3, bare [{ = 2
+        self.item_start = None
+        self.in_string = False
+        self.escaped = False
+        self.position = 0
+        self.text = ""
+        self.parsed = 0
+        self.invalid = 0
+
+    def feed(self, chunk: str) -> list:
+        completed = []
+        self.text += chunk
+        text = self.text
+        for i in range(self.position, len(text)):
+            ch = text[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+            if ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if self.item_depth is None:
+                    self.item_depth = 3 if ch == "{" else 2
+                self.depth += 1
+                if ch == "{" and self.depth == self.item_depth:
+                    self.item_start = i
+            elif ch in "}]":
+                if ch == "}" and self.depth == self.item_depth and self.item_start is not None:
+                    completed.extend(self._emit(text[self.item_start:i + 1]))
+                    self.item_start = None
+                self.depth -= 1
+        self.position = len(text)
+        return completed
+
+    def _emit(self, raw: str) -> list:
+        try:
+            scenario = validate_scenario(json.loads(raw))
+        except ValueError:
+            scenario = None
+        if scenario is None:
+            self.invalid += 1
+            return []
+        self.parsed += 1
+        return [scenario]
+
+
+def parse_legacy(text: str) -> list:
+    """The previous numbered "Title: / Line:" free-text format (fallback for old-style replies)."""
+    structured = []
+    for block in re.split(r"(?m)^\s*\d+\.\s*(?=Title:)", text):
+        title_match = re.search(r"Title:\s*(.*)", block)
+        line_match = re.search(r"Line:\s*(.*)", block)
+        if title_match and line_match:
+            structured.append({
+                "title": title_match.group(1).strip(),
+                "content": line_match.group(1).strip()
+            })
+    return structured
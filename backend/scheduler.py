@@ -0,0 +1,334 @@
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+from metrics import registry
+
+# Lower runs first: live chat turns (and what they wait on) before scenario generation
+PRIORITIES = {"chat": 0, "moderation": 0, "summary": 0, "suggest": 0, "stt": 0, "tts": 0, "scenarios": 1}
+BACKGROUND = 2  # e.g. scenario pool refresh
+
+queue_seconds = registry.histogram(
+    "chatbot_scheduler_queue_seconds", "Time upstream calls waited for a slot", ("endpoint",),
+)
+rejections = registry.counter(
+    "chatbot_scheduler_rejections_total", "Upstream calls failed fast (shed | circuit_open | deadline)",
+    ("endpoint", "reason"),
+)
+retries_total = registry.counter(
+    "chatbot_upstream_retries_total", "Retried upstream attempts", ("endpoint",),
+)
+
+
+class UpstreamUnavailable(Exception):
+    """The call was not (or no longer) attempted; the client should retry after `retry_after` seconds."""
+
+    reason = "unavailable"
+
+    def __init__(self, endpoint: str, retry_after: float = 1.0):
+        super().__init__(f"{endpoint}: upstream {self.reason}")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class Overloaded(UpstreamUnavailable):
+    reason = "shed"
+
+
+class CircuitOpen(UpstreamUnavailable):
+    reason = "circuit_open"
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    reason = "deadline"
+
+
+def is_retryable(e: BaseException) -> bool:
+    """Timeouts, connection errors, 408/409/429 and 5xx; other API errors won't improve on retry."""
+    if isinstance(e, asyncio.TimeoutError):
+        return True
+    # httpx / openai are only loaded by the OpenAI provider; their errors can't occur before that
+    httpx, openai = sys.modules.get("httpx"), sys.modules.get("openai")
+    if (httpx and isinstance(e, httpx.TransportError)) or (openai and isinstance(e, openai.APIConnectionError)):
+        return True
+    status = getattr(e, "status_code", None)
+    return status is not None and (status in (408, 409, 429) or status >= 500)
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failures; after `reset_seconds` one probe call is let through."""
+
+    def __init__(self, failures: int = 5, reset_seconds: float = 5.0):
+        self.threshold = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def rejects(self) -> bool:
+        """True while calls should fail fast (open, or half-open with the probe in flight)."""
+        if self.state == "open" and self.retry_after() <= 0:
+            self.state, self.probing = "half_open", False
+        return self.state == "open" or (self.state == "half_open" and self.probing)
+
+    def begin(self) -> bool:
+        """Claim the right to call upstream now (the single probe when half-open)."""
+        if self.rejects():
+            return False
+        if self.state == "half_open":
+            self.probing = True
+        return True
+
+    def success(self):
+        self.state, self.failures, self.probing = "closed", 0, False
+
+    def failure(self):
+        self.failures += 1
+        if self.threshold and (self.state == "half_open" or self.failures >= self.threshold):
+            if self.state != "open":
+                self.trips += 1
+            self.state, self.opened_at, self.probing = "open", time.monotonic(), False
+
+    def abandon(self):
+        """The call ended without an upstream verdict (cancelled); free the probe."""
+        self.probing = False
+
+
+class UpstreamScheduler:
+    """Admission control in front of every upstream call.
+
+    - Concurrency: at most `max_in_flight` calls overall and `caps[endpoint]`
+      per endpoint. Waiting calls are served by priority, then arrival.
+    - Load shedding: at most `max_queue` calls wait; beyond that the
+      lowest-priority, newest waiter is rejected with `Overloaded`.
+    - Deadlines: `deadlines[endpoint]` seconds bound queueing, all attempts
+      and backoff together (`DeadlineExceeded`).
+    - Retries: retryable errors are retried up to `retries` times with
+      full-jitter exponential backoff, only while the deadline allows.
+    - Circuit breaker per endpoint: after consecutive failures calls fail
+      fast with `CircuitOpen` until a probe call succeeds.
+
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, max_in_flight: int = 100, caps: dict = None, max_queue: int = 200,
+                 deadlines: dict = None, default_deadline: float = 30.0, retries: int = 2,
+                 backoff_base: float = 0.25, backoff_cap: float = 4.0,
+                 breaker_failures: int = 5, breaker_reset: float = 5.0, seed: int = None):
+        self.max_in_flight = max_in_flight
+        self.caps = caps or {}
+        self.max_queue = max_queue
+        self.deadlines = deadlines or {}
+        self.default_deadline = default_deadline
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._breakers = defaultdict(lambda: CircuitBreaker(breaker_failures, breaker_reset))
+        self._rng = random.Random(seed)
+        self._seq = itertools.count()
+        self._queue = []  # [(priority, seq, endpoint, future)]
+        self._in_flight = Counter()
+        self._total = 0
+        self.stats = defaultdict(Counter)
+
+    # ---- admission ----------------------------------------------------------
+
+    def _has_room(self, endpoint: str) -> bool:
+        return (self._total < self.max_in_flight
+                and self._in_flight[endpoint] < self.caps.get(endpoint, self.max_in_flight))
+
+    def _take(self, endpoint: str):
+        self._total += 1
+        self._in_flight[endpoint] += 1
+
+    def _release(self, endpoint: str):
+        self._total -= 1
+        self._in_flight[endpoint] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        for entry in sorted(self._queue, key=lambda e: e[:2]):
+            if self._total >= self.max_in_flight:
+                break
+            endpoint, future = entry[2], entry[3]
+            if self._has_room(endpoint):
+                self._queue.remove(entry)
+                self._take(endpoint)
+                future.set_result(True)
+
+    def _reject(self, endpoint: str, error: UpstreamUnavailable):
+        self.stats[endpoint][error.reason] += 1
+        rejections.inc(endpoint=endpoint, reason=error.reason)
+        return error
+
+    async def _acquire(self, endpoint: str, priority: int, deadline: float):
+        if self._breakers[endpoint].rejects():
+            raise self._reject(endpoint, CircuitOpen(endpoint, self._breakers[endpoint].retry_after()))
+        start = time.monotonic()
+        if not self._queue and self._has_room(endpoint):
+            self._take(endpoint)
+            queue_seconds.observe(0.0, endpoint=endpoint)
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), endpoint, future)
+        self._queue.append(entry)
+        self._dispatch()
+        if len(self._queue) > self.max_queue:
+            worst = max(self._queue, key=lambda e: e[:2])
+            self._queue.remove(worst)
+            worst[3].set_exception(self._reject(worst[2], Overloaded(worst[2])))
+        try:
+            await asyncio.wait({future}, timeout=max(0.0, deadline - time.monotonic()))
+        except BaseException:
+            self._abandon(entry)
+            raise
+        if not future.done():
+            self._abandon(entry)
+            raise self._reject(endpoint, DeadlineExceeded(endpoint))
+        future.result()  # raises Overloaded when shed while waiting
+        queue_seconds.observe(time.monotonic() - start, endpoint=endpoint)
+
+    def _abandon(self, entry: tuple):
+        future = entry[3]
+        if entry in self._queue:
+            self._queue.remove(entry)
+            future.cancel()
+        elif future.done() and not future.cancelled() and future.exception() is None:
+            self._release(entry[2])  # granted just as we gave up
+
+    # ---- calls ------------------------------------------------------------
+
+    def _deadline(self, endpoint: str, deadline: float = None) -> float:
+        return time.monotonic() + (deadline or self.deadlines.get(endpoint, self.default_deadline))
+
+    async def _backoff(self, endpoint: str, attempt: int, error: BaseException, deadline: float):
+        """Sleep before the next attempt, or re-raise `error` when no retry fits."""
+        delay = self._rng.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if attempt >= self.retries or not is_retryable(error) or time.monotonic() + delay >= deadline:
+            if isinstance(error, asyncio.TimeoutError):
+                raise self._reject(endpoint, DeadlineExceeded(endpoint)) from error
+            raise error
+        self.stats[endpoint]["retries"] += 1
+        retries_total.inc(endpoint=endpoint)
+        await asyncio.sleep(delay)
+
+    def _verdict(self, endpoint: str, error: BaseException = None):
+        breaker = self._breakers[endpoint]
+        if error is None or not is_retryable(error):
+            breaker.success()  # a 400 still means the upstream is up
+            self.stats[endpoint]["ok" if error is None else "failed"] += 1
+        else:
+            breaker.failure()
+            self.stats[endpoint]["failed"] += 1
+
+    async def _start(self, endpoint: str, priority: int, deadline: float):
+        await self._acquire(endpoint, priority, deadline)
+        if not self._breakers[endpoint].begin():
+            self._release(endpoint)
+            raise self._reject(endpoint, CircuitOpen(endpoint, self._breakers[endpoint].retry_after()))
+
+    async def call(self, endpoint: str, make_call, priority: int = None, deadline: float = None):
+        """`await make_call()` under the endpoint's cap, deadline, retry policy and breaker."""
+        priority = PRIORITIES.get(endpoint, 1) if priority is None else priority
+        deadline = self._deadline(endpoint, deadline)
+        self.stats[endpoint]["calls"] += 1
+        for attempt in itertools.count():
+            await self._start(endpoint, priority, deadline)
+            try:
+                result = await asyncio.wait_for(make_call(), max(0.0, deadline - time.monotonic()))
+            except asyncio.CancelledError:
+                self._breakers[endpoint].abandon()
+                self._release(endpoint)
+                raise
+            except Exception as e:
+                self._verdict(endpoint, e)
+                self._release(endpoint)
+                await self._backoff(endpoint, attempt, e, deadline)
+                continue
+            self._verdict(endpoint)
+            self._release(endpoint)
+            return result
+
+    async def stream(self, endpoint: str, make_stream, priority: int = None, deadline: float = None):
+        """Async iterator over `make_stream()`, holding one slot for the whole stream.
+
+        Opening the stream is retried like `call` until the first chunk
+        arrives (nothing has been yielded yet, so it is safe); the deadline
+        bounds time to first chunk. Errors after that are raised as-is.
+        """
+        priority = PRIORITIES.get(endpoint, 1) if priority is None else priority
+        deadline = self._deadline(endpoint, deadline)
+        self.stats[endpoint]["calls"] += 1
+        for attempt in itertools.count():
+            await self._start(endpoint, priority, deadline)
+            stream = make_stream()
+            try:
+                try:
+                    first = await asyncio.wait_for(stream.__anext__(), max(0.0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    self._verdict(endpoint)
+                    return
+                except asyncio.CancelledError:
+                    self._breakers[endpoint].abandon()
+                    raise
+                except Exception as e:
+                    self._verdict(endpoint, e)
+                    error = e
+                else:
+                    error = None
+                    self._verdict(endpoint)
+                    yield first
+                    async for piece in stream:
+                        yield piece
+                    return
+            finally:
+                await stream.aclose()
+                self._release(endpoint)
+            await self._backoff(endpoint, attempt, error, deadline)
+
+    def report(self) -> dict:
+        endpoints = sorted(set(self.stats) | set(self._breakers) | set(self._in_flight))
+        return {
+            "in_flight": self._total,
+            "queued": len(self._queue),
+            "endpoints": {
+                name: {
+                    **self.stats[name],
+                    "in_flight": self._in_flight[name],
+                    "queued": sum(1 for e in self._queue if e[2] == name),
+                    "circuit": self._breakers[name].state,
+                    "circuit_trips": self._breakers[name].trips,
+                }
+                for name in endpoints
+            },
+        }
+
+
+def _parse_map(spec: str) -> dict:
+    """'chat=60,scenarios=10' -> {"chat": 60.0, "scenarios": 10.0}"""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {name.strip(): float(value) for name, value in pairs}
+
+
+def create_scheduler() -> UpstreamScheduler:
+    return UpstreamScheduler(
+        max_in_flight=int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "100")),
+        caps={k: int(v) for k, v in _parse_map(os.getenv("UPSTREAM_CAPS", "scenarios=20,summary=20")).items()},
+        max_queue=int(os.getenv("UPSTREAM_MAX_QUEUE", "200")),
+        deadlines=_parse_map(os.getenv("UPSTREAM_DEADLINES",
+                                       "chat=20,moderation=5,summary=20,suggest=15,stt=20,tts=15,scenarios=45")),
+        retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "2")),
+        backoff_base=float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.25")),
+        backoff_cap=float(os.getenv("UPSTREAM_BACKOFF_CAP", "4")),
+        breaker_failures=int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5")),
+        breaker_reset=float(os.getenv("UPSTREAM_BREAKER_RESET", "5")),
+    )
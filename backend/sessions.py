@@ -0,0 +1,218 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+def _size(messages: list) -> int:
+    return sum(len(m["content"]) for m in messages)
+
+
+def _trim(messages: list, max_messages: int) -> list:
+    """Drop the oldest non-system turns once a session exceeds `max_messages`."""
+    overflow = len(messages) - max_messages
+    if overflow <= 0:
+        return messages
+    kept = []
+    for m in messages:
+        if overflow > 0 and m["role"] != "system":
+            overflow -= 1
+            continue
+        kept.append(m)
+    return kept
+
+
+class _AsyncAccess:
+    """Awaitable `acreate` / `aget` / `aappend` / `adelete` for the event loop.
+
+    Stores with `blocking = True` (SQLite) are called in a worker thread;
+    the in-memory store is only briefly locked, so it is called directly.
+    """
+
+    blocking = False
+
+    async def _call(self, method, *args):
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def acreate(self, messages: list) -> str:
+        return await self._call(self.create, messages)
+
+    async def aget(self, session_id: str):
+        return await self._call(self.get, session_id)
+
+    async def aappend(self, session_id: str, *messages) -> bool:
+        return await self._call(self.append, session_id, *messages)
+
+    async def adelete(self, session_id: str):
+        return await self._call(self.delete, session_id)
+
+
+class MemorySessionStore(_AsyncAccess):
+    """Bounded in-process conversation store.
+
+    Sessions idle for longer than `idle_ttl` seconds are evicted, and the
+    least recently used ones go first when `max_sessions` or the total
+    content size (`max_chars`) is exceeded.
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_ttl: float = 1800,
+                 max_messages: int = 200, max_chars: int = 20_000_000):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self._sessions = OrderedDict()  # id -> [last_access, messages]
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "evicted_idle": 0, "evicted_capacity": 0}
+
+    def create(self, messages: list) -> str:
+        session_id = uuid.uuid4().hex
+        messages = _trim(list(messages), self.max_messages)
+        with self._lock:
+            self._sessions[session_id] = [time.monotonic(), messages]
+            self._chars += _size(messages)
+            self.stats["created"] += 1
+            self._evict()
+        return session_id
+
+    def get(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.idle_ttl:
+                self._drop(session_id, "evicted_idle")
+                return None
+            entry[0] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return list(entry[1])
+
+    def append(self, session_id: str, *messages) -> bool:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return False
+            self._chars -= _size(entry[1])
+            entry[1] = _trim(entry[1] + list(messages), self.max_messages)
+            self._chars += _size(entry[1])
+            entry[0] = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            self._evict()
+            return True
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _drop(self, session_id: str, reason: str = None):
+        _, messages = self._sessions.pop(session_id)
+        self._chars -= _size(messages)
+        if reason:
+            self.stats[reason] += 1
+
+    def _evict(self):
+        now = time.monotonic()
+        # OrderedDict is in access order, so idle sessions sit at the front
+        while self._sessions:
+            session_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access > self.idle_ttl:
+                self._drop(session_id, "evicted_idle")
+            elif len(self._sessions) > self.max_sessions or self._chars > self.max_chars:
+                self._drop(session_id, "evicted_capacity")
+            else:
+                break
+
+
+class SQLiteSessionStore(_AsyncAccess):
+    """Same interface as MemorySessionStore, persisted in a SQLite file."""
+
+    blocking = True  # sqlite3 calls (BEGIN IMMEDIATE may wait on the write lock)
+
+    def __init__(self, path: str, max_sessions: int = 100000, idle_ttl: float = 1800,
+                 max_messages: int = 200):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY, last_access REAL NOT NULL, messages TEXT NOT NULL)""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions(last_access)")
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "evicted_idle": 0, "evicted_capacity": 0}
+
+    def create(self, messages: list) -> str:
+        session_id = uuid.uuid4().hex
+        blob = json.dumps(_trim(list(messages), self.max_messages), ensure_ascii=False)
+        with self._lock:
+            self._db.execute("INSERT INTO sessions VALUES (?, ?, ?)", (session_id, time.time(), blob))
+            self.stats["created"] += 1
+            self._evict()
+        return session_id
+
+    def get(self, session_id: str):
+        with self._lock:
+            row = self._db.execute("SELECT last_access, messages FROM sessions WHERE id = ?",
+                                   (session_id,)).fetchone()
+            if row is None:
+                return None
+            if time.time() - row[0] > self.idle_ttl:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self.stats["evicted_idle"] += 1
+                return None
+            self._db.execute("UPDATE sessions SET last_access = ? WHERE id = ?", (time.time(), session_id))
+            return json.loads(row[1])
+
+    def append(self, session_id: str, *messages) -> bool:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT messages FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                if row is None:
+                    return False
+                history = _trim(json.loads(row[0]) + list(messages), self.max_messages)
+                self._db.execute("UPDATE sessions SET messages = ?, last_access = ? WHERE id = ?",
+                                 (json.dumps(history, ensure_ascii=False), time.time(), session_id))
+            finally:
+                self._db.execute("COMMIT")
+            return True
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def _evict(self):
+        cur = self._db.execute("DELETE FROM sessions WHERE last_access < ?", (time.time() - self.idle_ttl,))
+        self.stats["evicted_idle"] += cur.rowcount
+        cur = self._db.execute("""DELETE FROM sessions WHERE id IN (
+            SELECT id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)""", (self.max_sessions,))
+        self.stats["evicted_capacity"] += cur.rowcount
+
+
+def create_store():
+    """Pick the session backend from the environment (SQLite when SESSION_DB is set)."""
+    max_sessions = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    idle_ttl = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+    max_messages = int(os.getenv("SESSION_MAX_MESSAGES", "200"))
+    if os.getenv("SESSION_DB"):
+        return SQLiteSessionStore(os.getenv("SESSION_DB"), max_sessions, idle_ttl, max_messages)
+    return MemorySessionStore(max_sessions, idle_ttl, max_messages,
+                              int(os.getenv("SESSION_MAX_CHARS", "20000000")))
+
+
+session_store = create_store()
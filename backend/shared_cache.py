@@ -0,0 +1,266 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from metrics import registry
+
+shared_lookups = registry.counter(
+    "chatbot_shared_cache_lookups_total", "Shared cache lookups by namespace and result", ("namespace", "result"),
+)
+
+
+class SharedCache:
+    """Key-value cache shared by every worker process on a node (one SQLite file in WAL mode).
+
+    Entries live in namespaces ("scenarios", "tts", "moderation") with a
+    TTL and a byte cap per namespace; past the cap the least recently used
+    entries are evicted. `get_or_compute` / `aget_or_compute` are atomic
+    across processes: the first caller takes a lease on the key and
+    computes, the others wait for its result instead of computing too.
+
+    SQLite calls block (up to `timeout` seconds while another worker holds
+    the write lock), so the async methods (`aget`, `aset`, `aget_or_compute`)
+    run them in a worker thread, off the event loop.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400, max_bytes: dict = None,
+                 default_max_bytes: int = 64 * 1024 * 1024, touch_interval: float = 10.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes or {}
+        self.default_max_bytes = default_max_bytes
+        self.touch_interval = touch_interval
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS entries (
+            ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL,
+            expires_at REAL NOT NULL, last_access REAL NOT NULL, PRIMARY KEY (ns, key))""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(ns, last_access)")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS usage (
+            ns TEXT PRIMARY KEY, bytes INTEGER NOT NULL, entries INTEGER NOT NULL)""")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS leases (
+            ns TEXT NOT NULL, key TEXT NOT NULL, owner TEXT NOT NULL, expires_at REAL NOT NULL,
+            PRIMARY KEY (ns, key))""")
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "computed": 0, "waited": 0, "evicted": 0, "expired": 0}
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction (holds the process-local lock, takes SQLite's write lock up front)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    # ---- plain get / set --------------------------------------------------
+
+    def lookup(self, ns: str, key: str):
+        """(expires_at, value bytes), or None when missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires_at, last_access FROM entries WHERE ns = ? AND key = ?",
+                                   (ns, key)).fetchone()
+        if row is not None and row[1] < now:
+            with self._transaction():
+                self._delete(ns, key, expired_before=now)
+            self.stats["expired"] += 1
+            row = None
+        elif row is not None and now - row[2] > self.touch_interval:
+            # LRU bookkeeping, at most once per touch_interval so hits stay read-only
+            with self._lock:
+                self._db.execute("UPDATE entries SET last_access = ? WHERE ns = ? AND key = ?", (now, ns, key))
+        self.stats["hits" if row else "misses"] += 1
+        shared_lookups.inc(namespace=ns, result="hit" if row else "miss")
+        return (row[1], row[0]) if row else None
+
+    def get(self, ns: str, key: str):
+        entry = self.lookup(ns, key)
+        return entry[1] if entry else None
+
+    async def aget(self, ns: str, key: str):
+        return await asyncio.to_thread(self.get, ns, key)
+
+    async def aset(self, ns: str, key: str, value: bytes, ttl: float = None):
+        await asyncio.to_thread(self.set, ns, key, value, ttl)
+
+    def set(self, ns: str, key: str, value: bytes, ttl: float = None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._transaction():
+            self._delete(ns, key)
+            self._db.execute("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                             (ns, key, value, len(value), expires_at, now))
+            self._db.execute("""INSERT INTO usage VALUES (?, ?, 1) ON CONFLICT(ns) DO UPDATE
+                SET bytes = bytes + excluded.bytes, entries = entries + 1""", (ns, len(value)))
+            self._evict(ns, now)
+
+    def delete(self, ns: str, key: str):
+        with self._transaction():
+            self._delete(ns, key)
+
+    def _delete(self, ns: str, key: str, expired_before: float = float("inf")):
+        # (another worker may have refreshed an expired entry meanwhile; only delete it if still expired)
+        rows = self._db.execute("DELETE FROM entries WHERE ns = ? AND key = ? AND expires_at < ? RETURNING size",
+                                (ns, key, expired_before)).fetchall()
+        if rows:
+            self._db.execute("UPDATE usage SET bytes = bytes - ?, entries = entries - 1 WHERE ns = ?", (rows[0][0], ns))
+
+    def _evict(self, ns: str, now: float):
+        cap = self.max_bytes.get(ns, self.default_max_bytes)
+        used = self._db.execute("SELECT bytes FROM usage WHERE ns = ?", (ns,)).fetchone()[0]
+        if used <= cap:
+            return
+        expired = self._db.execute("DELETE FROM entries WHERE ns = ? AND expires_at < ? RETURNING size",
+                                   (ns, now)).fetchall()
+        self.stats["expired"] += len(expired)
+        freed = sum(size for size, in expired)
+        victims = []
+        if used - freed > cap:
+            for key, size in self._db.execute(
+                    "SELECT key, size FROM entries WHERE ns = ? ORDER BY last_access", (ns,)).fetchall():
+                if used - freed <= cap:
+                    break
+                victims.append(key)
+                freed += size
+            self._db.executemany("DELETE FROM entries WHERE ns = ? AND key = ?", [(ns, k) for k in victims])
+            self.stats["evicted"] += len(victims)
+        self._db.execute("UPDATE usage SET bytes = bytes - ?, entries = entries - ? WHERE ns = ?",
+                         (freed, len(expired) + len(victims), ns))
+
+    # ---- cross-process single flight --------------------------------------
+
+    def _claim(self, ns: str, key: str, seconds: float) -> str:
+        """A lease token when we may compute `key` now, else None (someone else holds the lease)."""
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction():
+            self._db.execute("DELETE FROM leases WHERE ns = ? AND key = ? AND expires_at < ?", (ns, key, now))
+            cur = self._db.execute("INSERT OR IGNORE INTO leases VALUES (?, ?, ?, ?)",
+                                   (ns, key, token, now + seconds))
+        return token if cur.rowcount == 1 else None
+
+    def _release(self, ns: str, key: str, token: str):
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE ns = ? AND key = ? AND owner = ?", (ns, key, token))
+
+    def _pending(self, ns: str, key: str) -> bool:
+        """Another process holds a live lease on `key` and has not stored a value yet."""
+        with self._lock:
+            return self._db.execute(
+                """SELECT 1 FROM leases WHERE ns = ? AND key = ? AND expires_at >= ?
+                   AND NOT EXISTS (SELECT 1 FROM entries WHERE ns = ? AND key = ?)""",
+                (ns, key, time.time(), ns, key)).fetchone() is not None
+
+    def get_or_compute(self, ns: str, key: str, compute, ttl: float = None,
+                       lease_seconds: float = 60, poll: float = 0.05):
+        """Cached bytes for `key`, or `compute()`'s result stored once for all workers.
+
+        `compute` returning None is not cached. When another process is
+        already computing `key`, this waits (up to its lease) for the result.
+        """
+        while True:
+            value = self.get(ns, key)
+            if value is not None:
+                return value
+            token = self._claim(ns, key, lease_seconds)
+            if token is not None:
+                try:
+                    self.stats["computed"] += 1
+                    value = compute()
+                    if value is not None:
+                        self.set(ns, key, value, ttl)
+                    return value
+                finally:
+                    self._release(ns, key, token)
+            self.stats["waited"] += 1
+            while self._pending(ns, key):
+                time.sleep(poll)
+
+    async def aget_or_compute(self, ns: str, key: str, compute, ttl: float = None,
+                              lease_seconds: float = 60, poll: float = 0.05):
+        """`get_or_compute` for an awaitable `compute()` (neither SQLite nor waiting blocks the event loop)."""
+        while True:
+            value = await self.aget(ns, key)
+            if value is not None:
+                return value
+            token = await asyncio.to_thread(self._claim, ns, key, lease_seconds)
+            if token is not None:
+                try:
+                    self.stats["computed"] += 1
+                    value = await compute()
+                    if value is not None:
+                        await self.aset(ns, key, value, ttl)
+                    return value
+                finally:
+                    await asyncio.to_thread(self._release, ns, key, token)
+            self.stats["waited"] += 1
+            while await asyncio.to_thread(self._pending, ns, key):
+                await asyncio.sleep(poll)
+
+    def report(self) -> dict:
+        with self._lock:
+            usage = {ns: {"bytes": b, "entries": n}
+                     for ns, b, n in self._db.execute("SELECT ns, bytes, entries FROM usage")}
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "pid": os.getpid(), "namespaces": usage}
+
+
+class JSONNamespace:
+    """One namespace of a SharedCache holding JSON values.
+
+    Same `get(key) -> (expires_at, value)` / `set(key, expires_at, value)`
+    interface as scenario_cache.DiskStore, plus atomic `aget_or_compute`.
+    """
+
+    def __init__(self, cache: SharedCache, ns: str):
+        self.cache = cache
+        self.ns = ns
+
+    def get(self, key: str):
+        entry = self.cache.lookup(self.ns, key)
+        return (entry[0], json.loads(entry[1])) if entry else None
+
+    def set(self, key: str, expires_at: float, value):
+        self.cache.set(self.ns, key, json.dumps(value, ensure_ascii=False).encode("utf-8"),
+                       ttl=expires_at - time.time())
+    async def aget_or_compute(self, key: str, compute, ttl: float = None):
+        """Falsy results (e.g. a failed parse) are returned but not stored."""
+        async def encoded():
+            value = await compute()
+            return json.dumps(value, ensure_ascii=False).encode("utf-8") if value else None
+
+        blob = await self.cache.aget_or_compute(self.ns, key, encoded, ttl)
+        return json.loads(blob) if blob is not None else None
+
+
+def _parse_mb(spec: str) -> dict:
+    """'tts=500,moderation=20' -> bytes per namespace"""
+    pairs = (item.split("=", 1) for item in spec.split(",") if "=" in item)
+    return {ns.strip(): int(float(mb) * 1024 * 1024) for ns, mb in pairs}
+
+
+def create_shared_cache():
+    """SharedCache at SHARED_CACHE_DB (e.g. /tmp/koreachatbot_cache.db), or None."""
+    path = os.getenv("SHARED_CACHE_DB")
+    if not path:
+        return None
+    return SharedCache(
+        path,
+        ttl=float(os.getenv("SHARED_CACHE_TTL", "86400")),
+        max_bytes=_parse_mb(os.getenv("SHARED_CACHE_MAX_MB", "scenarios=64,tts=512,moderation=16")),
+    )
+
+
+# One connection per worker process; every worker opens the same file
+shared_cache = create_shared_cache()
@@ -0,0 +1,90 @@
+import asyncio
+
+from context_window import SUMMARY_PREFIX, ContextCompactor, count_message_tokens
+
+SYSTEM = {"role": "system", "content": "당신은 친절한 한국어 대화 파트너입니다."}
+
+
+def conversation(turns: int) -> list:
+    messages = [SYSTEM]
+    for i in range(turns):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": f"{i}번째 말입니다. " + "한국어 연습을 계속해요. " * 5})
+    return messages
+
+
+class Summarizer:
+    """Fake summarizer recording what it was asked to fold."""
+
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    def __call__(self, previous, turns):
+        self.calls.append((previous, [t["content"].split("번째")[0] for t in turns]))
+        if self.fail:
+            raise RuntimeError("summary failed")
+        return f"요약({len(self.calls)})"
+
+    async def acall(self, previous, turns):
+        return self(previous, turns)
+
+
+def compactor() -> ContextCompactor:
+    return ContextCompactor(max_tokens=300, keep_recent=6, fold_step=4)
+
+
+def test_short_conversation_is_sent_as_is():
+    messages = conversation(4)
+    summarize = Summarizer()
+    assert compactor().compact(messages, summarize) == messages
+    assert summarize.calls == []
+
+
+def test_old_turns_fold_into_a_summary_in_fold_steps():
+    messages = conversation(15)  # 15 turns: 9 foldable -> 8 folded, 7 kept
+    summarize = Summarizer()
+    out = compactor().compact(messages, summarize)
+    assert out[0] == SYSTEM
+    assert out[1] == {"role": "system", "content": SUMMARY_PREFIX + "요약(1)"}
+    assert out[2:] == messages[1 + 8:]
+    assert summarize.calls == [("", [str(i) for i in range(8)])]
+    assert count_message_tokens(out) < count_message_tokens(messages)
+
+
+def test_summary_cache_only_summarizes_new_turns():
+    ctx, summarize = compactor(), Summarizer()
+    ctx.compact(conversation(15), summarize)
+    ctx.compact(conversation(16), summarize)  # same fold point: cache hit
+    out = ctx.compact(conversation(19), summarize)  # fold point moves by one step
+    assert summarize.calls == [("", [str(i) for i in range(8)]), ("요약(1)", [str(i) for i in range(8, 12)])]
+    assert out[1]["content"] == SUMMARY_PREFIX + "요약(2)"
+    assert ctx.stats["summary_cache_hits"] == 1 and ctx.stats["summary_calls"] == 2
+
+
+def test_failed_summary_keeps_the_unsummarized_turns():
+    ctx = compactor()
+    ctx.compact(conversation(15), Summarizer())
+    messages = conversation(19)
+    out = ctx.compact(messages, Summarizer(fail=True))
+    assert out[1]["content"] == SUMMARY_PREFIX + "요약(1)"  # last good summary
+    assert out[2:] == messages[1 + 8:]  # turns 8-11 are not lost
+    assert ctx.stats["fallbacks"] == 1
+
+
+def test_failed_first_summary_sends_every_turn():
+    messages = conversation(15)
+    assert compactor().compact(messages, Summarizer(fail=True)) == messages
+
+
+def test_async_variant_matches():
+    sync_out = compactor().compact(conversation(19), Summarizer())
+    summarize = Summarizer()
+    async_out = asyncio.run(compactor().acompact(conversation(19), summarize.acall))
+    assert async_out == sync_out
+
+    ctx = compactor()
+    asyncio.run(ctx.acompact(conversation(15), Summarizer().acall))
+    messages = conversation(19)
+    out = asyncio.run(ctx.acompact(messages, Summarizer(fail=True).acall))
+    assert out[2:] == messages[1 + 8:] and ctx.stats["fallbacks"] == 1
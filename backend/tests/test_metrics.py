@@ -0,0 +1,27 @@
+import io
+
+import metrics
+
+
+def test_sampled_spans_are_logged(monkeypatch):
+    monkeypatch.setattr(metrics, "SPAN_SAMPLE_RATE", 1.0)
+    out = io.StringIO()
+    handler = metrics._span_handler  # attached at import since sampling is on by default
+    previous = handler.setStream(out)
+    try:
+        metrics.record("stt", 0.12, "test", segments=1)
+    finally:
+        handler.setStream(previous)
+    assert out.getvalue().strip() == '{"span": "stt", "op": "test", "ms": 120.0, "segments": 1}'
+
+
+def test_failed_fast_turns_are_counted_not_printed(capsys):
+    from scheduler import CircuitOpen
+
+    for _ in range(3):
+        metrics.failed_fast("chat", CircuitOpen("chat"))
+    metrics.failed_fast("voice", RuntimeError("down"))
+    rendered = metrics.busy_replies.render()
+    assert 'chatbot_busy_replies_total{path="chat",reason="circuit_open"} 3' in rendered
+    assert 'chatbot_busy_replies_total{path="voice",reason="unavailable"} 1' in rendered
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from moderation_batcher import ModerationBatcher
+
+
+class Upstream:
+    """Fake list-input moderation endpoint; flags any text containing "나쁜"."""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+
+    async def send_batch(self, texts):
+        self.batches.append(list(texts))
+        await asyncio.sleep(0.005)
+        if self.fail:
+            raise RuntimeError("moderation down")
+        return [("나쁜" in text, ["harassment"] if "나쁜" in text else []) for text in texts]
+
+
+def test_concurrent_inputs_share_one_request_and_duplicates_are_sent_once():
+    async def run():
+        upstream = Upstream()
+        batcher = ModerationBatcher(upstream.send_batch, window_ms=20)
+        results = await asyncio.gather(*(batcher.moderate(t) for t in ["네", "나쁜 말", " 네 ", "감사합니다"]))
+        return upstream, batcher, results
+
+    upstream, batcher, results = asyncio.run(run())
+    assert upstream.batches == [["네", "나쁜 말", "감사합니다"]]
+    assert results == [(False, []), (True, ["harassment"]), (False, []), (False, [])]
+    assert batcher.stats["batches"] == 1 and batcher.stats["upstream_inputs"] == 3
+
+
+def test_batches_split_at_max_batch():
+    async def run():
+        upstream = Upstream()
+        batcher = ModerationBatcher(upstream.send_batch, window_ms=1000, max_batch=4)
+        await asyncio.gather(*(batcher.moderate(f"문장 {i}") for i in range(10)))
+        return upstream
+
+    upstream = asyncio.run(run())  # a full batch flushes without waiting out the window
+    assert [len(b) for b in upstream.batches] == [4, 4, 2]
+    assert sum(upstream.batches, []) == [f"문장 {i}" for i in range(10)]
+
+
+def test_repeated_phrases_are_served_from_the_cache():
+    async def run():
+        upstream = Upstream()
+        batcher = ModerationBatcher(upstream.send_batch, window_ms=1, cache_size=2)
+        for text in ["네", "네", "감사합니다", "네", "안녕하세요", "감사합니다"]:
+            await batcher.moderate(text)
+        return upstream, batcher
+
+    upstream, batcher = asyncio.run(run())
+    assert upstream.batches == [["네"], ["감사합니다"], ["안녕하세요"], ["감사합니다"]]  # LRU of 2
+    assert batcher.stats["cache_hits"] == 2
+
+
+def test_upstream_error_reaches_every_caller_and_is_not_cached():
+    async def run():
+        upstream = Upstream(fail=True)
+        batcher = ModerationBatcher(upstream.send_batch, window_ms=5)
+        results = await asyncio.gather(batcher.moderate("네"), batcher.moderate("네"), return_exceptions=True)
+        upstream.fail = False
+        return batcher, results, await batcher.moderate("네")
+
+    batcher, results, retried = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.stats["errors"] == 1 and batcher.stats["cache_hits"] == 0
+    assert retried == (False, [])
+
+
+def test_shared_cache_verdicts_skip_the_network(tmp_path):
+    from shared_cache import SharedCache
+
+    async def run():
+        shared = SharedCache(str(tmp_path / "shared.db"))
+        first = ModerationBatcher(Upstream().send_batch, window_ms=1, shared=shared)
+        await first.moderate("나쁜 말")
+        await asyncio.gather(*first._tasks)  # the shared write lands after the caller is answered
+        upstream = Upstream()
+        other_worker = ModerationBatcher(upstream.send_batch, window_ms=1, shared=shared)
+        return upstream, other_worker, await other_worker.moderate("나쁜 말")
+
+    upstream, batcher, result = asyncio.run(run())
+    assert result == (True, ["harassment"])
+    assert upstream.batches == [] and batcher.stats["shared_hits"] == 1
+
+
+@pytest.mark.parametrize("window_ms", [0, 5])
+def test_single_caller_is_not_held_past_the_window(window_ms):
+    async def run():
+        batcher = ModerationBatcher(Upstream().send_batch, window_ms=window_ms)
+        return await asyncio.wait_for(batcher.moderate("네"), 1)
+
+    assert asyncio.run(run()) == (False, [])
+
+
+def test_short_result_list_fails_every_caller():
+    async def run():
+        async def send_batch(texts):
+            return [(False, [])] * (len(texts) - 1)
+
+        batcher = ModerationBatcher(send_batch, window_ms=5)
+        results = await asyncio.wait_for(asyncio.gather(*(batcher.moderate(t) for t in ["네", "아니요", "감사합니다"]),
+                                                        return_exceptions=True), 1)
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert batcher.stats["errors"] == 1 and batcher.report()["cache_entries"] == 0
+
+
+def test_cancelled_batch_does_not_leave_callers_waiting():
+    async def run():
+        async def send_batch(texts):
+            await asyncio.sleep(10)
+
+        batcher = ModerationBatcher(send_batch, window_ms=1)
+        callers = asyncio.gather(batcher.moderate("네"), batcher.moderate("아니요"), return_exceptions=True)
+        await asyncio.sleep(0.01)
+        for task in list(batcher._tasks):
+            task.cancel()
+        return await asyncio.wait_for(callers, 1)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
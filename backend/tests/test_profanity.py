@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from profanity import ModerationPolicy, ProfanityFilter
+
+TERMS = ["씨발", "시발", "좆", "좆같", "개새끼", "병신", "ㅅㅂ"]
+
+
+@pytest.fixture(scope="module")
+def profanity():
+    return ProfanityFilter(TERMS)
+
+
+@pytest.mark.parametrize("text", [
+    "회사 조직이 커요",        # 조+직 is not 좆
+    "시 발전소 가고 싶어요",   # 시 + 발전소 are two words
+    "볼륨 조절해 주세요",
+    "조정이 필요해요",
+    "시바라고 불러요",         # 바+라 is not 발
+    "네, 바지 사고 싶어요.",
+    "두 시 발 버스",             # 시 + 발 (departure) are only joined as a suspect
+    "열 시 발 기차를 탔어요",
+    "시발점이 어디예요?",        # allowed compounds
+    "시발역에서 만나요",
+    "시 발 점",
+])
+def test_clean_phrases_do_not_match(profanity, text):
+    assert profanity.find(text) == []
+
+
+@pytest.mark.parametrize("text, term", [
+    ("씨발", "씨발"),
+    ("개.새.끼", "개새끼"),
+    ("씨​발", "씨발"),       # zero-width space
+    ("tlqkf 뭐야", "시발"),       # typed on a Korean keyboard layout
+    ("ㅅㅂ 짜증나", "ㅅㅂ"),
+    ("씨ㅂㅏㄹ", "씨발"),         # partly typed as jamo
+    ("좆같네", "좆같"),
+])
+def test_evasions_match(profanity, text, term):
+    assert term in profanity.find(text)
+
+
+@pytest.mark.parametrize("text", ["시 발 진짜", "두 시 발 버스", "씨 발", "병  신 같네"])
+def test_spelled_out_runs_are_suspects(profanity, text):
+    words, suspects = profanity.scan(text)
+    assert words == [] and set(suspects) & {"시발", "씨발", "병신"}
+
+
+def test_tiered_policy_does_not_strike_clean_phrases(profanity):
+    remote_calls = []
+
+    async def remote(text):
+        remote_calls.append(text)
+        return False, []
+
+    policy = ModerationPolicy(profanity, remote, mode="tiered")
+    for text in ["회사 조직이 커요", "시 발전소 가고 싶어요", "볼륨 조절해 주세요", "시발점이 어디예요?"]:
+        assert asyncio.run(policy.acheck(text)) == (False, [], [])
+    assert remote_calls == []
+    flagged, _, words = asyncio.run(policy.acheck("개.새.끼"))
+    assert flagged and words == ["개새끼"]
+    assert remote_calls == []
+
+
+def test_suspect_hits_are_decided_remotely(profanity):
+    remote_calls = []
+
+    async def remote(text):
+        remote_calls.append(text)
+        return "진짜" in text, ["harassment"] if "진짜" in text else []
+
+    policy = ModerationPolicy(profanity, remote, mode="tiered")
+    assert asyncio.run(policy.acheck("열 시 발 기차를 탔어요")) == (False, [], [])
+    flagged, categories, words = asyncio.run(policy.acheck("시 발 진짜"))
+    assert flagged and categories == ["harassment"] and "시발" in words
+    assert remote_calls == ["열 시 발 기차를 탔어요", "시 발 진짜"]
+
+
+def test_deferred_audit_task_is_kept_until_done(profanity):
+    audited = []
+
+    async def remote(text):
+        await asyncio.sleep(0.01)
+        audited.append(text)
+        return False, []
+
+    async def run():
+        policy = ModerationPolicy(profanity, remote, mode="deferred")
+        assert await policy.acheck("네, 좋아요") == (False, [], [])
+        assert len(policy._audits) == 1
+        await asyncio.gather(*policy._audits)
+        return policy
+
+    policy = asyncio.run(run())
+    assert audited == ["네, 좋아요"] and not policy._audits
+    assert policy.stats["remote_deferred"] == 1
@@ -0,0 +1,16 @@
+import pytest
+
+from providers import Provider, StubProvider
+
+
+def test_provider_missing_a_method_fails_at_construction():
+    class ChatOnly(Provider):
+        async def chat(self, messages, model="gpt-4-turbo", temperature=None, response_format=None):
+            return "안녕하세요"
+
+    with pytest.raises(TypeError, match="speech"):
+        ChatOnly()
+
+
+def test_stub_provider_implements_the_interface():
+    assert isinstance(StubProvider(), Provider)
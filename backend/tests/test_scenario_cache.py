@@ -0,0 +1,138 @@
+import asyncio
+
+from scenario_cache import ScenarioCache, profile_key
+
+PROFILE = {"Name": "민수", "Industry": "Manufacturing", "Korean_Level": "3급"}
+SCENARIOS = [{"title": f"상황 {i}", "line": f"안녕하세요 {i}"} for i in range(3)]
+
+
+class Upstream:
+    """Fake generator counting calls; the streaming one yields a scenario every few ms."""
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    async def create(self, profile):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        return list(SCENARIOS)
+
+    async def create_stream(self, profile):
+        self.calls += 1
+        for i, scenario in enumerate(SCENARIOS):
+            await asyncio.sleep(0.01)
+            if self.fail and i == 1:
+                raise RuntimeError("upstream broke")
+            yield scenario
+
+
+async def collect(stream):
+    return [scenario async for scenario in stream]
+
+
+def test_concurrent_requests_share_one_generation_then_hit_the_cache():
+    async def run():
+        cache, upstream = ScenarioCache(), Upstream()
+        results = await asyncio.gather(*(cache.get_or_create(dict(PROFILE), upstream.create) for _ in range(5)))
+        return cache, upstream, results, await cache.get_or_create(PROFILE, upstream.create)
+
+    cache, upstream, results, later = asyncio.run(run())
+    assert upstream.calls == 1
+    assert all(r == SCENARIOS for r in results) and later == SCENARIOS
+    assert cache.stats["misses"] == 1 and cache.stats["coalesced"] == 4 and cache.stats["hits"] == 1
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_generation():
+    async def run():
+        cache, upstream = ScenarioCache(), Upstream()
+        leader = asyncio.ensure_future(cache.get_or_create(PROFILE, upstream.create))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_create(PROFILE, upstream.create))
+        await asyncio.sleep(0)
+        leader.cancel()  # the first client went away
+        return upstream, await follower
+
+    upstream, followed = asyncio.run(run())
+    assert upstream.calls == 1
+    assert followed == SCENARIOS
+
+
+def test_empty_generation_is_not_cached():
+    async def run():
+        cache, calls = ScenarioCache(), []
+
+        async def create(profile):
+            calls.append(profile)
+            return []
+
+        await cache.get_or_create(PROFILE, create)
+        await cache.get_or_create(PROFILE, create)
+        return cache, calls
+
+    cache, calls = asyncio.run(run())
+    assert len(calls) == 2 and cache.get(profile_key(PROFILE)) is None
+
+
+def test_concurrent_streams_share_one_generation():
+    async def run():
+        cache, upstream = ScenarioCache(), Upstream()
+        first = asyncio.ensure_future(collect(cache.stream(PROFILE, upstream.create_stream)))
+        await asyncio.sleep(0.015)  # the first scenario is already out
+        rest = [collect(cache.stream(dict(PROFILE), upstream.create_stream)) for _ in range(4)]
+        results = await asyncio.gather(first, *rest)
+        return cache, upstream, results
+
+    cache, upstream, results = asyncio.run(run())
+    assert upstream.calls == 1
+    assert all(r == SCENARIOS for r in results)
+    assert cache.stats["misses"] == 1 and cache.stats["coalesced"] == 4
+    assert cache.get(profile_key(PROFILE)) == SCENARIOS
+
+
+def test_get_or_create_attaches_to_a_stream_in_flight():
+    async def run():
+        cache, upstream = ScenarioCache(), Upstream()
+        stream = asyncio.ensure_future(collect(cache.stream(PROFILE, upstream.create_stream)))
+        await asyncio.sleep(0)
+        return upstream, await asyncio.gather(stream, cache.get_or_create(PROFILE, upstream.create))
+
+    upstream, (streamed, created) = asyncio.run(run())
+    assert upstream.calls == 1
+    assert streamed == created == SCENARIOS
+
+
+def test_stream_follower_survives_leader_disconnect():
+    async def run():
+        cache, upstream = ScenarioCache(), Upstream()
+        leader = cache.stream(PROFILE, upstream.create_stream)
+        await leader.__anext__()
+        follower = asyncio.ensure_future(collect(cache.stream(PROFILE, upstream.create_stream)))
+        await leader.aclose()  # the leader's client went away
+        return upstream, await follower
+
+    upstream, followed = asyncio.run(run())
+    assert upstream.calls == 1
+    assert followed == SCENARIOS
+
+
+def test_stream_error_reaches_every_follower_and_is_not_cached():
+    async def run():
+        cache, upstream = ScenarioCache(), Upstream(fail=True)
+        results = await asyncio.gather(*(collect(cache.stream(PROFILE, upstream.create_stream)) for _ in range(3)),
+                                       return_exceptions=True)
+        return cache, results
+
+    cache, results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.stats["errors"] == 1
+    assert cache.get(profile_key(PROFILE)) is None
+
+
+def test_ignored_fields_stay_out_of_key_and_prompt():
+    from gpt_utils import scenario_messages
+
+    other = {**PROFILE, "Name": "Ana"}
+    assert profile_key(PROFILE) == profile_key(other)
+    prompt = scenario_messages(PROFILE)[-1]["content"]
+    assert "민수" not in prompt and "Manufacturing" in prompt
@@ -0,0 +1,35 @@
+import pytest
+
+from scenario_pool import encode_profile, parse_level, parse_years
+
+FORM_PROFILE = {  # as frontend UserInfoForm sends it
+    "Name": "Minh", "Nationality": "Vietnam", "NativeLanguage": "Vietnamese", "Living_in_Korea": "Yes",
+    "Duration_of_Stay": "1–2 years", "Visa_Type": "E9", "Industry": "Manufacturing", "Work_Experience": 3,
+    "Korean_Test_Score": "", "Duration_of_Korean_Study": "6 months – 1 year", "Interests": "Travel, Food",
+    "Hobbies": "Soccer",
+}
+
+
+@pytest.mark.parametrize("value, years", [
+    ("2년", 2), ("1년 6개월", 1.5), ("18 months", 1.5), ("1–2 years", 1.5), ("6 months – 1 year", 0.75),
+    ("Less than 6 months", 0.5), ("5+ years", 5), (3, 3), (0, 0), (None, 0), ("n/a", 0),
+])
+def test_parse_years(value, years):
+    assert parse_years(value) == pytest.approx(years)
+
+
+def test_parse_level_accepts_numbers():
+    assert parse_level(4) == 4
+    assert parse_level("3급") == 3
+    assert parse_level(None) == 0
+
+
+def test_numeric_fields_encode():
+    vec = encode_profile({**FORM_PROFILE, "Korean_Test_Score": 180, "Duration_of_Stay": 2})
+    assert vec.any()
+
+
+def test_korean_and_english_answers_encode_alike():
+    korean = {**FORM_PROFILE, "Living_in_Korea": "네", "Industry": "제조", "Interests": "여행, 음식",
+              "Hobbies": "축구", "Work_Experience": "3년"}
+    assert float(encode_profile(FORM_PROFILE) @ encode_profile(korean)) == pytest.approx(1.0)
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from scenario_stream import ScenarioStreamParser, parse_legacy
+
+SCENARIOS = [
+    {"title": "회의 {준비} [2단계]", "content": "안녕하세요, 회의실이 어디예요?"},
+    {"title": "따옴표 \"네\" 연습", "content": "역슬래시 \\ 와 } 괄호도 괜찮아요"},
+    {"title": "병원", "content": "어디가 아프세요?", "meta": {"level": [1, 2]}},
+]
+EXPECTED = [{"title": s["title"], "content": s["content"]} for s in SCENARIOS]
+DOC = json.dumps({"scenarios": SCENARIOS}, ensure_ascii=False)
+
+
+def feed_all(chunks) -> tuple:
+    parser = ScenarioStreamParser()
+    return [s for chunk in chunks for s in parser.feed(chunk)], parser
+
+
+def test_whole_document():
+    scenarios, parser = feed_all([DOC])
+    assert scenarios == EXPECTED and parser.parsed == 3 and parser.invalid == 0
+
+
+def test_one_character_at_a_time():
+    assert feed_all(DOC)[0] == EXPECTED
+
+
+@pytest.mark.parametrize("marker", ['\\"네', "\\\\", "{준비}", '"content"', "} 괄호"])
+def test_split_inside_strings_and_escapes(marker):
+    at = DOC.index(marker) + 1  # cut right after the first character of the marker
+    assert feed_all([DOC[:at], DOC[at:]])[0] == EXPECTED
+
+
+def test_every_two_chunk_split():
+    for at in range(len(DOC) + 1):
+        assert feed_all([DOC[:at], DOC[at:]])[0] == EXPECTED, at
+
+
+def test_each_scenario_is_returned_by_the_chunk_that_closes_it():
+    parser = ScenarioStreamParser()
+    first_end = DOC.index("}", DOC.index("2단계]\"")) + 1
+    assert parser.feed(DOC[:first_end - 1]) == []
+    assert parser.feed(DOC[first_end - 1:first_end]) == EXPECTED[:1]
+
+
+def test_bare_array():
+    assert feed_all([json.dumps(SCENARIOS[:2], ensure_ascii=False)])[0] == EXPECTED[:2]
+
+
+def test_invalid_objects_are_skipped():
+    doc = json.dumps({"scenarios": [
+        {"title": "제목만"}, {"title": " ", "content": "빈 제목"}, {"title": 3, "content": "숫자 제목"},
+        SCENARIOS[0],
+    ]}, ensure_ascii=False)
+    scenarios, parser = feed_all(doc)
+    assert scenarios == EXPECTED[:1]
+    assert parser.parsed == 1 and parser.invalid == 3
+
+
+def test_malformed_object_is_counted_and_later_ones_still_parse():
+    doc = '{"scenarios": [{"title": "깨짐", "content": }, ' + json.dumps(SCENARIOS[1], ensure_ascii=False) + "]}"
+    scenarios, parser = feed_all([doc[:20], doc[20:]])
+    assert scenarios == EXPECTED[1:2] and parser.invalid == 1
+
+
+def test_parse_legacy():
+    text = ("1. Title: 옷 가게\nLine: 안녕하세요 손님! 무슨 옷을 사고 싶으신가요?\n"
+            "2. Title: 길 찾기\nLine: 어디 가고 싶으신 곳 있나요?\n"
+            "3. Title: 줄만 있음\n")
+    assert parse_legacy(text) == [
+        {"title": "옷 가게", "content": "안녕하세요 손님! 무슨 옷을 사고 싶으신가요?"},
+        {"title": "길 찾기", "content": "어디 가고 싶으신 곳 있나요?"},
+    ]
+    assert parse_legacy('{"scenarios": []}') == []
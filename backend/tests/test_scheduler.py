@@ -0,0 +1,201 @@
+import asyncio
+
+import pytest
+
+from scheduler import CircuitOpen, DeadlineExceeded, Overloaded, UpstreamScheduler
+
+
+class APIError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class Upstream:
+    """Fake endpoint: raises the queued errors first, then answers after `latency` seconds."""
+
+    def __init__(self, errors=(), latency: float = 0.0):
+        self.errors = list(errors)
+        self.latency = latency
+        self.calls = 0
+
+    async def call(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def scheduler(**kwargs) -> UpstreamScheduler:
+    return UpstreamScheduler(**{"backoff_base": 0.001, "backoff_cap": 0.001, "seed": 0, **kwargs})
+
+
+def test_waiting_calls_run_by_priority_then_arrival():
+    async def run():
+        sched, order, gate = scheduler(max_in_flight=1), [], asyncio.Event()
+
+        async def job(name):
+            order.append(name)
+            await gate.wait()
+
+        holder = asyncio.ensure_future(sched.call("scenarios", lambda: job("holder")))
+        await asyncio.sleep(0)
+        waiters = [asyncio.ensure_future(sched.call(endpoint, lambda n=name: job(n), priority=priority))
+                   for name, endpoint, priority in [("pool", "scenarios", 2), ("gen", "scenarios", 1),
+                                                    ("chat-1", "chat", 0), ("chat-2", "chat", 0)]]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holder, *waiters)
+        return order
+
+    assert asyncio.run(run()) == ["holder", "chat-1", "chat-2", "gen", "pool"]
+
+
+def test_per_endpoint_cap_does_not_block_other_endpoints():
+    async def run():
+        sched, gate = scheduler(caps={"scenarios": 1}), asyncio.Event()
+        slow = asyncio.ensure_future(sched.call("scenarios", gate.wait))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(sched.call("scenarios", Upstream().call))
+        chat = await asyncio.wait_for(sched.call("chat", Upstream().call), 1)
+        report = sched.report()["endpoints"]["scenarios"]
+        gate.set()
+        await asyncio.gather(slow, queued)
+        return chat, report
+
+    chat, report = asyncio.run(run())
+    assert chat == "ok"
+    assert report["in_flight"] == 1 and report["queued"] == 1
+
+
+def test_deadline_expires_while_queued():
+    async def run():
+        sched, gate = scheduler(max_in_flight=1), asyncio.Event()
+        holder = asyncio.ensure_future(sched.call("scenarios", gate.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded):
+            await sched.call("chat", Upstream().call, deadline=0.02)
+        gate.set()
+        await holder
+        return sched
+
+    sched = asyncio.run(run())
+    assert sched.stats["chat"]["deadline"] == 1
+    assert sched.report()["queued"] == 0 and sched.report()["in_flight"] == 0
+
+
+def test_deadline_bounds_a_slow_call():
+    async def run():
+        sched, upstream = scheduler(), Upstream(latency=1.0)
+        with pytest.raises(DeadlineExceeded):
+            await sched.call("chat", upstream.call, deadline=0.02)
+        return sched
+
+    assert asyncio.run(run()).report()["in_flight"] == 0
+
+
+def test_retryable_errors_are_retried_and_others_are_not():
+    async def run():
+        sched = scheduler(retries=2)
+        flaky = Upstream(errors=[APIError(503), APIError(429)])
+        bad = Upstream(errors=[APIError(400)])
+        result = await sched.call("chat", flaky.call)
+        with pytest.raises(APIError):
+            await sched.call("summary", bad.call)
+        return sched, flaky, bad, result
+
+    sched, flaky, bad, result = asyncio.run(run())
+    assert result == "ok" and flaky.calls == 3 and sched.stats["chat"]["retries"] == 2
+    assert bad.calls == 1 and sched.stats["summary"]["retries"] == 0
+
+
+def test_retries_give_up_after_the_limit():
+    async def run():
+        sched, upstream = scheduler(retries=1), Upstream(errors=[APIError(502)] * 3)
+        with pytest.raises(APIError):
+            await sched.call("chat", upstream.call)
+        return upstream
+
+    assert asyncio.run(run()).calls == 2
+
+
+def test_breaker_opens_then_lets_one_probe_through_when_half_open():
+    async def run():
+        sched = scheduler(retries=0, breaker_failures=2, breaker_reset=0.05)
+        failing = Upstream(errors=[APIError(500)] * 2)
+        for _ in range(2):
+            with pytest.raises(APIError):
+                await sched.call("chat", failing.call)
+        with pytest.raises(CircuitOpen):
+            await sched.call("chat", failing.call)  # fails fast, upstream not called
+        opened = sched.report()["endpoints"]["chat"]["circuit"], failing.calls
+
+        await asyncio.sleep(0.06)
+        probe = Upstream(latency=0.02)
+        first = asyncio.ensure_future(sched.call("chat", probe.call))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpen):
+            await sched.call("chat", probe.call)  # only the probe goes through while half-open
+        await first
+        after = await sched.call("chat", probe.call)
+        return sched, opened, probe, after
+
+    sched, opened, probe, after = asyncio.run(run())
+    assert opened == ("open", 2)
+    assert probe.calls == 2 and after == "ok"
+    report = sched.report()["endpoints"]["chat"]
+    assert report["circuit"] == "closed" and report["circuit_trips"] == 1
+
+
+def test_failed_probe_reopens_the_breaker():
+    async def run():
+        sched = scheduler(retries=0, breaker_failures=1, breaker_reset=0.02)
+        upstream = Upstream(errors=[APIError(503)] * 2)
+        with pytest.raises(APIError):
+            await sched.call("tts", upstream.call)
+        await asyncio.sleep(0.03)
+        with pytest.raises(APIError):
+            await sched.call("tts", upstream.call)  # the probe
+        with pytest.raises(CircuitOpen):
+            await sched.call("tts", upstream.call)
+        return sched, upstream
+
+    sched, upstream = asyncio.run(run())
+    assert upstream.calls == 2
+    assert sched.report()["endpoints"]["tts"]["circuit_trips"] == 2
+
+
+def test_full_queue_sheds_the_lowest_priority_newest_waiter():
+    async def run():
+        sched, gate = scheduler(max_in_flight=1, max_queue=1), asyncio.Event()
+        holder = asyncio.ensure_future(sched.call("chat", gate.wait))
+        await asyncio.sleep(0)
+        background = asyncio.ensure_future(sched.call("scenarios", Upstream().call, priority=2))
+        await asyncio.sleep(0)
+        chat = asyncio.ensure_future(sched.call("chat", Upstream().call))
+        await asyncio.sleep(0)
+        gate.set()
+        return await asyncio.gather(holder, background, chat, return_exceptions=True)
+
+    _, background, chat = asyncio.run(run())
+    assert isinstance(background, Overloaded)
+    assert chat == "ok"
+
+
+def test_stream_retries_before_the_first_chunk_only():
+    async def run():
+        sched, attempts = scheduler(retries=2), []
+
+        async def pieces():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise APIError(503)
+            for piece in ["안녕", "하세요"]:
+                yield piece
+
+        return [p async for p in sched.stream("chat", pieces)], attempts, sched
+
+    pieces, attempts, sched = asyncio.run(run())
+    assert pieces == ["안녕", "하세요"] and len(attempts) == 2
+    assert sched.report()["in_flight"] == 0
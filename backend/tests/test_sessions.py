@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from sessions import MemorySessionStore, SQLiteSessionStore
+
+OPENING = [{"role": "system", "content": "당신은 친절한 한국어 대화 파트너입니다."},
+           {"role": "assistant", "content": "안녕하세요!"}]
+
+
+def turn(i: int) -> tuple:
+    return {"role": "user", "content": f"질문 {i}"}, {"role": "assistant", "content": f"대답 {i}"}
+
+
+def test_sqlite_store_runs_off_the_event_loop(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    threads = []
+    get = store.get
+    store.get = lambda session_id: threads.append(threading.current_thread()) or get(session_id)
+
+    async def run():
+        session_id = await store.acreate(OPENING)
+        await asyncio.gather(*(store.aappend(session_id, *turn(i)) for i in range(10)))
+        return session_id, await store.aget(session_id)
+
+    session_id, history = asyncio.run(run())
+    assert threads and threads[0] is not threading.main_thread()
+    assert len(history) == 2 + 20
+    assert {m["content"] for m in history} >= {f"질문 {i}" for i in range(10)}
+    asyncio.run(store.adelete(session_id))
+    assert store.get(session_id) is None
+
+
+def test_memory_store_is_called_directly():
+    store = MemorySessionStore()
+    threads = []
+    get = store.get
+    store.get = lambda session_id: threads.append(threading.current_thread()) or get(session_id)
+
+    async def run():
+        session_id = await store.acreate(OPENING)
+        assert await store.aappend(session_id, *turn(0))
+        return await store.aget(session_id)
+
+    assert len(asyncio.run(run())) == 4
+    assert threads == [threading.main_thread()]
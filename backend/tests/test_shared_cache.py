@@ -0,0 +1,52 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+from shared_cache import JSONNamespace, SharedCache
+
+
+def test_async_calls_do_not_block_the_event_loop_while_another_worker_writes(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"))
+    other = sqlite3.connect(str(tmp_path / "cache.db"), isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")  # another worker holds the write lock for a while
+    threading.Timer(0.3, other.execute, ("COMMIT",)).start()
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.ensure_future(ticker())
+        start = time.perf_counter()
+        await cache.aset("moderation", "k", b"v")
+        waited = time.perf_counter() - start
+        beat.cancel()
+        return ticks, waited
+
+    ticks, waited = asyncio.run(run())
+    assert waited >= 0.25
+    assert ticks >= 10  # the loop kept serving other requests meanwhile
+    assert cache.get("moderation", "k") == b"v"
+
+
+def test_aget_or_compute_computes_once_across_callers(tmp_path):
+    cache = SharedCache(str(tmp_path / "cache.db"))
+    store = JSONNamespace(cache, "scenarios")
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return [{"title": "t"}]
+
+    async def run():
+        return await asyncio.gather(*(store.aget_or_compute("k", compute) for _ in range(5)))
+
+    assert asyncio.run(run()) == [[{"title": "t"}]] * 5
+    assert calls == 1
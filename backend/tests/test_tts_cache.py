@@ -0,0 +1,51 @@
+import asyncio
+
+from shared_cache import SharedCache
+from tts_cache import TTSCache
+
+
+class EmptyShared(SharedCache):
+    """Shared tier whose get_or_compute comes back empty (nothing stored for the key)."""
+
+    def get_or_compute(self, ns, key, compute, ttl=None, **kwargs):
+        return None
+
+    async def aget_or_compute(self, ns, key, compute, ttl=None, **kwargs):
+        return None
+
+
+def test_falls_back_to_local_synthesis_when_the_shared_result_is_empty(tmp_path):
+    cache = TTSCache(str(tmp_path / "tts"), shared=EmptyShared(str(tmp_path / "cache.db")))
+    calls = []
+
+    def synthesize(text):
+        calls.append(text)
+        return b"audio"
+
+    async def asynthesize(text):
+        return synthesize(text)
+
+    with open(cache.get_or_create("안녕하세요", "nova", "tts-1", synthesize), "rb") as f:
+        assert f.read() == b"audio"
+    path = asyncio.run(cache.aget_or_create("감사합니다", "nova", "tts-1", asynthesize))
+    with open(path, "rb") as f:
+        assert f.read() == b"audio"
+    assert calls == ["안녕하세요", "감사합니다"]
+
+
+def test_shared_audio_is_synthesized_once(tmp_path):
+    shared = SharedCache(str(tmp_path / "cache.db"))
+    first, second = TTSCache(str(tmp_path / "a"), shared=shared), TTSCache(str(tmp_path / "b"), shared=shared)
+    calls = []
+
+    async def synthesize(text):
+        calls.append(text)
+        await asyncio.sleep(0.02)
+        return b"audio"
+
+    async def run():
+        return await asyncio.gather(first.aget_or_create("네", "nova", "tts-1", synthesize),
+                                    second.aget_or_create("네", "nova", "tts-1", synthesize))
+
+    assert len(set(asyncio.run(run()))) == 2  # one local copy per worker
+    assert calls == ["네"]
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from concurrent.futures import Future
+
+from reply_cache import ReplyCache
+from turn_pipeline import run_turn, run_turn_sync
+
+HISTORY = [{"role": "system", "content": "대화 파트너"}, {"role": "assistant", "content": "무슨 옷을 사고 싶으신가요?"}]
+
+
+def cache():
+    return ReplyCache(variety=1)  # answer from the cache after one stored reply
+
+
+def test_flagged_turn_does_not_cache_the_discarded_reply():
+    replies = cache()
+
+    async def run(text, flagged):
+        allowed = asyncio.get_running_loop().create_future()
+
+        async def moderate(text):
+            await asyncio.sleep(0.02)  # the speculative reply finishes first
+            return flagged, [], []
+
+        async def reply(messages):
+            replies.put_when(allowed, messages, "좋아요, 바지 보여 드릴게요.")
+            return "좋아요, 바지 보여 드릴게요."
+
+        async def rewrite(text):
+            return "바지 사고 싶어요."
+
+        try:
+            result = await run_turn(text, HISTORY, moderate, reply, rewrite)
+            allowed.set_result(not result["flagged"])
+        finally:
+            allowed.cancel()
+        await asyncio.sleep(0)  # let the done callbacks run
+        return result
+
+    assert asyncio.run(run("바보 바지 사고 싶어요", True))["timings"]["speculative_reply"] == "discarded"
+    assert replies.get(HISTORY + [{"role": "user", "content": "바보 바지 사고 싶어요"}]) is None
+    asyncio.run(run("바지 사고 싶어요", False))
+    assert replies.get(HISTORY + [{"role": "user", "content": "바지 사고 싶어요"}]) == "좋아요, 바지 보여 드릴게요."
+
+
+def test_sync_turn_caches_only_after_moderation_allows_it():
+    replies = cache()
+
+    def turn(text, flagged):
+        allowed = Future()
+
+        def moderate(text):
+            time.sleep(0.02)
+            return flagged, [], []
+
+        def reply(messages):
+            replies.put_when(allowed, messages, "네, 어떤 색을 찾으세요?")
+            return "네, 어떤 색을 찾으세요?"
+
+        try:
+            result = run_turn_sync(text, HISTORY, moderate, reply, lambda t: None)
+            allowed.set_result(not result["flagged"])
+        finally:
+            allowed.cancel()
+        return result
+
+    turn("바보 바지 사고 싶어요", True)
+    assert replies.get(HISTORY + [{"role": "user", "content": "바보 바지 사고 싶어요"}]) is None
+    turn("바지 사고 싶어요", False)
+    assert replies.get(HISTORY + [{"role": "user", "content": "바지 사고 싶어요"}]) == "네, 어떤 색을 찾으세요?"
+
+
+def test_put_when_ignores_failed_or_cancelled_verdicts():
+    replies = cache()
+    messages = HISTORY + [{"role": "user", "content": "네"}]
+    failed, cancelled = Future(), Future()
+    replies.put_when(failed, messages, "좋아요")
+    replies.put_when(cancelled, messages, "좋아요")
+    failed.set_exception(RuntimeError("moderation down"))
+    cancelled.cancel()
+    assert replies.get(messages) is None
+    replies.put_when(None, messages, "좋아요")
+    assert replies.get(messages) == "좋아요"
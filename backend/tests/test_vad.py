@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from bench.vad_fixtures import FIXTURES, RATE, silence, utterance, voiced
+from vad import EndpointDetector, speech_segments, split_for_transcription, trim_silence
+
+
+@pytest.mark.parametrize("name", [name for name, make in FIXTURES.items() if make()[1] is not None])
+def test_speech_boundaries_within_250_ms(name):
+    samples, truth = FIXTURES[name]()
+    segments = speech_segments(samples, RATE)
+    assert len(segments) == 1
+    start, end = segments[0]
+    assert abs(start - truth[0]) * 1000 / RATE <= 250
+    assert abs(end - truth[1]) * 1000 / RATE <= 250
+
+
+def test_silence_only_has_no_segments():
+    samples, _ = FIXTURES["silence only"]()
+    assert speech_segments(samples, RATE) == []
+
+
+def test_trim_silence_keeps_the_speech():
+    samples, truth = utterance(-60.0)
+    trimmed = trim_silence(samples, RATE)
+    assert truth[1] - truth[0] <= len(trimmed) < len(samples) * 0.6
+
+
+def test_endpoint_after_trailing_silence():
+    samples, truth = utterance(-50.0)
+    detector = EndpointDetector(RATE, trailing_silence_ms=1000)
+    chunk = RATE // 10  # 100 ms chunks, like a live recorder
+    stopped = next(((i + chunk) / RATE for i in range(0, len(samples), chunk)
+                    if detector.feed(samples[i:i + chunk])), None)
+    assert stopped is not None
+    assert abs(stopped - (truth[1] / RATE + 1.0)) <= 0.3
+
+
+def test_long_recording_is_split_at_pauses():
+    parts = []
+    for i in range(6):  # 6 x (3 s speech + 0.5 s pause) = 21 s
+        parts += [voiced(3.0, pitch=140 + 10 * i), silence(0.5, seed=i)]
+    chunks = split_for_transcription(np.concatenate(parts), RATE, max_seconds=8)
+    assert len(chunks) >= 3
+    assert max(len(c) for c in chunks) <= 8 * RATE
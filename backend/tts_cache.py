@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+
+
+class TTSCache:
+    """Content-addressed, size-bounded on-disk cache of synthesized speech.
+
+    Audio is stored under the hash of (model, voice, text), so the same
+    sentence is only ever synthesized once. When the directory grows past
+    `max_bytes`, the least recently used files are removed (a hit refreshes
+    the file's mtime).
+
+    With a `shared` cache (SharedCache) the audio is kept in its "tts"
+    namespace and synthesized once across all worker processes; the files
+    are then only the local playback copies.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 200 * 1024 * 1024, suffix: str = ".mp3", shared=None):
+        self.path = path
+        self.shared = shared
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+        os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, voice: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\x00{voice}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, key + self.suffix)
+
+    def get(self, text: str, voice: str, model: str):
+        """Path of the cached audio, or None."""
+        key = self.key(text, voice, model)
+        path = self._file(key)
+        try:
+            os.utime(path)  # LRU: mark as recently used
+        except OSError:
+            audio = self.shared.get("tts", key) if self.shared is not None else None
+            return self._write(key, audio) if audio is not None else None
+        return path
+
+    def put(self, text: str, voice: str, model: str, audio: bytes) -> str:
+        key = self.key(text, voice, model)
+        if self.shared is not None:
+            self.shared.set("tts", key, audio)
+        return self._write(key, audio)
+
+    def _write(self, key: str, audio: bytes) -> str:
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(audio)
+        os.replace(tmp, path)
+        self._evict()
+        return path
+
+    def get_or_create(self, text: str, voice: str, model: str, synthesize) -> str:
+        """Path of the audio for `text`, calling `synthesize(text) -> bytes` only on a miss."""
+        path = self.get(text, voice, model)
+        if path is not None:
+            self.stats["hits"] += 1
+            return path
+        self.stats["misses"] += 1
+        if self.shared is not None:
+            # Another worker may be synthesizing the same sentence: wait for its audio
+            key = self.key(text, voice, model)
+            audio = self.shared.get_or_compute("tts", key, lambda: synthesize(text))
+            if audio is not None:
+                return self._write(key, audio)
+        # No shared tier, or it came back empty (nothing stored for the key): synthesize here
+        return self.put(text, voice, model, synthesize(text))
+
+    async def aget_or_create(self, text: str, voice: str, model: str, synthesize) -> str:
+        """`get_or_create` for an async `synthesize(text) -> bytes` (backend event loop).
+
+        Files and the shared cache are read and written in a worker thread.
+        """
+        path = await asyncio.to_thread(self.get, text, voice, model)
+        if path is not None:
+            self.stats["hits"] += 1
+            return path
+        self.stats["misses"] += 1
+        if self.shared is not None:
+            key = self.key(text, voice, model)
+            audio = await self.shared.aget_or_compute("tts", key, lambda: synthesize(text))
+            if audio is not None:
+                return await asyncio.to_thread(self._write, key, audio)
+        return await asyncio.to_thread(self.put, text, voice, model, await synthesize(text))
+
+    def _evict(self):
+        with self._lock:
+            files = []
+            for name in os.listdir(self.path):
+                if not name.endswith(self.suffix):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.path, name))
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, name))
+            total = sum(size for _, size, _ in files)
+            for _, size, name in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.path, name))
+                    total -= size
+                    self.stats["evicted"] += 1
+                except OSError:
+                    pass
+
+
+def create_tts_cache(shared=None) -> TTSCache:
+    return TTSCache(
+        os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "koreachatbot_tts")),
+        max_bytes=int(float(os.getenv("TTS_CACHE_MAX_MB", "200")) * 1024 * 1024),
+        shared=shared,
+    )
@@ -0,0 +1,104 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def _result(moderation: tuple, reply: str, alternative: str, timings: dict, prior_ms: float, start: float) -> dict:
+    flagged, categories, words = moderation
+    timings["total_ms"] = round(prior_ms + _ms(start), 1)
+    # What the same turn costs when each stage waits for the previous one
+    second = timings["rewrite_ms"] if flagged else timings["reply_ms"]
+    timings["sequential_ms"] = round(prior_ms + timings["moderation_ms"] + second, 1)
+    timings["saved_ms"] = round(max(0.0, timings["sequential_ms"] - timings["total_ms"]), 1)
+    return {
+        "flagged": flagged,
+        "flagged_categories": categories,
+        "flagged_words": words,
+        "reply": reply,
+        "alternative": alternative,
+        "timings": timings,
+    }
+
+
+async def run_turn(text: str, history: list, moderate, reply, rewrite, timings: dict = None) -> dict:
+    """One chat turn with reply generation started speculatively alongside moderation.
+
+    `moderate(text) -> (flagged, categories, words)`, `reply(messages) -> str` and
+    `rewrite(text) -> str` are awaitables. When the input is flagged, the
+    speculative reply is cancelled (or discarded if it already finished) and
+    `alternative` holds the suggested rewrite instead. `timings` may carry
+    earlier stages (e.g. ``{"stt_ms": ...}``) into the report; they count
+    towards `total_ms`.
+    """
+    timings = dict(timings or {})
+    prior_ms = sum(timings.values())
+    start = time.perf_counter()
+    messages = history + [{"role": "user", "content": text}]
+
+    async def timed_reply():
+        t = time.perf_counter()
+        result = await reply(messages)
+        return result, _ms(t)
+
+    speculative = asyncio.ensure_future(timed_reply())
+    try:
+        t = time.perf_counter()
+        moderation = await moderate(text)
+        timings["moderation_ms"] = _ms(t)
+    except BaseException:
+        speculative.cancel()
+        raise
+
+    if moderation[0]:
+        timings["speculative_reply"] = "discarded" if speculative.done() else "cancelled"
+        speculative.cancel()
+        t = time.perf_counter()
+        alternative = await rewrite(text)
+        timings["rewrite_ms"] = _ms(t)
+        return _result(moderation, None, alternative, timings, prior_ms, start)
+
+    answer, timings["reply_ms"] = await speculative
+    return _result(moderation, answer, None, timings, prior_ms, start)
+
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="turn")
+
+
+def run_turn_sync(text: str, history: list, moderate, reply, rewrite, timings: dict = None) -> dict:
+    """Blocking variant of `run_turn` for the Streamlit app (stages run on worker threads).
+
+    A speculative reply that is already in flight when the input gets
+    flagged cannot be interrupted; its result is simply discarded.
+    """
+    timings = dict(timings or {})
+    prior_ms = sum(timings.values())
+    start = time.perf_counter()
+    messages = history + [{"role": "user", "content": text}]
+
+    def timed_reply():
+        t = time.perf_counter()
+        result = reply(messages)
+        return result, _ms(t)
+
+    speculative = _executor.submit(timed_reply)
+    t = time.perf_counter()
+    try:
+        moderation = moderate(text)
+    except BaseException:
+        speculative.cancel()
+        raise
+    timings["moderation_ms"] = _ms(t)
+
+    if moderation[0]:
+        timings["speculative_reply"] = "cancelled" if speculative.cancel() else "discarded"
+        t = time.perf_counter()
+        alternative = rewrite(text)
+        timings["rewrite_ms"] = _ms(t)
+        return _result(moderation, None, alternative, timings, prior_ms, start)
+
+    answer, timings["reply_ms"] = speculative.result()
+    return _result(moderation, answer, None, timings, prior_ms, start)
@@ -0,0 +1,151 @@
+import os
+
+import numpy as np
+
+# ⚙️ Defaults (override via .env)
+FRAME_MS = int(os.getenv("VAD_FRAME_MS", "30"))
+TRAILING_SILENCE_MS = int(os.getenv("VAD_TRAILING_SILENCE_MS", "1200"))
+MAX_SEGMENT_SECONDS = float(os.getenv("VAD_MAX_SEGMENT_SECONDS", "10"))
+
+MIN_SPEECH_DBFS = -50.0   # frames quieter than this are never speech
+MAX_FLOOR_DBFS = -40.0    # noise floor cap, so a clip that is all speech is still detected
+SPEECH_MARGIN_DB = 10.0   # voiced speech: this far above the noise floor
+UNVOICED_ZCR = 0.25       # fricatives (ㅅ, ㅆ, ㅎ...) are quiet but have a high zero-crossing rate
+
+
+def frame_features(samples: np.ndarray, rate: int, frame_ms: int = FRAME_MS) -> tuple:
+    """Per-frame energy (dBFS) and zero-crossing rate, computed without Python loops."""
+    frame = int(rate * frame_ms / 1000)
+    count = len(samples) // frame
+    frames = samples[:count * frame].reshape(count, frame)
+    energy = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame
+    return energy, zcr
+
+
+def _flip_short_runs(mask: np.ndarray, value: bool, min_len: int, interior_only: bool) -> np.ndarray:
+    """Flip runs of `value` shorter than `min_len` frames (optionally only runs not touching the ends)."""
+    mask = mask.copy()
+    edges = np.flatnonzero(np.diff(np.r_[0, (mask == value).astype(np.int8), 0]))
+    for start, end in zip(edges[::2], edges[1::2]):
+        if interior_only and (start == 0 or end == len(mask)):
+            continue
+        if end - start < min_len:
+            mask[start:end] = not value
+    return mask
+
+
+def speech_mask(samples: np.ndarray, rate: int, frame_ms: int = FRAME_MS,
+                min_speech_ms: int = 90, min_gap_ms: int = 300) -> np.ndarray:
+    """Boolean speech/non-speech decision per frame.
+
+    The noise floor adapts to the recording (10th percentile frame energy).
+    Short pauses inside an utterance are bridged and isolated clicks dropped.
+    """
+    energy, zcr = frame_features(samples, rate, frame_ms)
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    floor = min(np.percentile(energy, 10), MAX_FLOOR_DBFS)
+    voiced = energy > max(floor + SPEECH_MARGIN_DB, MIN_SPEECH_DBFS)
+    unvoiced = (energy > max(floor + SPEECH_MARGIN_DB / 2, MIN_SPEECH_DBFS)) & (zcr > UNVOICED_ZCR)
+    mask = voiced | unvoiced
+    mask = _flip_short_runs(mask, False, min_gap_ms // frame_ms, interior_only=True)   # bridge pauses
+    return _flip_short_runs(mask, True, min_speech_ms // frame_ms, interior_only=False)  # drop clicks
+
+
+def speech_segments(samples: np.ndarray, rate: int, frame_ms: int = FRAME_MS, pad_ms: int = 150) -> list:
+    """[(start, end)] sample ranges of speech, padded by `pad_ms` on both sides."""
+    mask = speech_mask(samples, rate, frame_ms)
+    frame = int(rate * frame_ms / 1000)
+    pad = int(rate * pad_ms / 1000)
+    edges = np.flatnonzero(np.diff(np.r_[0, mask.astype(np.int8), 0]))
+    return [(max(0, s * frame - pad), min(len(samples), e * frame + pad))
+            for s, e in zip(edges[::2], edges[1::2])]
+
+
+def trim_silence(samples: np.ndarray, rate: int, pad_ms: int = 150) -> np.ndarray:
+    """Drop leading and trailing silence (empty array when there is no speech)."""
+    segments = speech_segments(samples, rate, pad_ms=pad_ms)
+    if not segments:
+        return samples[:0]
+    return samples[segments[0][0]:segments[-1][1]]
+
+
+def split_for_transcription(samples: np.ndarray, rate: int,
+                            max_seconds: float = MAX_SEGMENT_SECONDS) -> list:
+    """Split an utterance at pauses into chunks of at most ~`max_seconds`.
+
+    Chunks can be transcribed concurrently and joined in order. A single
+    stretch of speech longer than the limit is cut at the limit.
+    """
+    limit = int(max_seconds * rate)
+    chunks, start, end = [], None, None
+    for seg_start, seg_end in speech_segments(samples, rate):
+        if start is not None and seg_end - start > limit:
+            chunks.append((start, end))
+            start = None
+        if start is None:
+            start = seg_start
+        end = seg_end
+        while end - start > limit:
+            chunks.append((start, start + limit))
+            start += limit
+    if start is not None:
+        chunks.append((start, end))
+    return [samples[s:e] for s, e in chunks]
+
+
+class EndpointDetector:
+    """Streaming end-of-utterance detection for live capture.
+
+    Feed PCM chunks as they arrive; `feed` returns True once speech has been
+    heard and followed by `trailing_silence_ms` of silence, so capture can
+    stop instead of waiting for a fixed timeout.
+    """
+
+    def __init__(self, rate: int = 16000, trailing_silence_ms: int = TRAILING_SILENCE_MS,
+                 frame_ms: int = FRAME_MS, max_seconds: float = 30.0):
+        self.rate = rate
+        self.frame_ms = frame_ms
+        self.frame = int(rate * frame_ms / 1000)
+        self.silence_frames_needed = trailing_silence_ms // frame_ms
+        self.max_frames = int(max_seconds * 1000 / frame_ms)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._floor = None
+        self.frames = 0
+        self.speech_frames = 0
+        self.trailing_silence = 0
+
+    def feed(self, chunk: np.ndarray) -> bool:
+        self._pending = np.concatenate([self._pending, chunk.astype(np.float32, copy=False)])
+        usable = len(self._pending) // self.frame * self.frame
+        if usable:
+            energy, zcr = frame_features(self._pending[:usable], self.rate, self.frame_ms)
+            self._pending = self._pending[usable:]
+            for e, z in zip(energy, zcr):
+                self._update(e, z)
+        return self.done
+
+    def _update(self, energy: float, zcr: float):
+        self.frames += 1
+        # Noise floor: follows quiet frames quickly, loud frames very slowly
+        if self._floor is None:
+            self._floor = energy
+        else:
+            rate = 0.2 if energy < self._floor else 0.002
+            self._floor += rate * (energy - self._floor)
+        self._floor = min(self._floor, MAX_FLOOR_DBFS)
+        threshold = max(self._floor + SPEECH_MARGIN_DB, MIN_SPEECH_DBFS)
+        is_speech = energy > threshold or (energy > threshold - SPEECH_MARGIN_DB / 2 and zcr > UNVOICED_ZCR)
+        if is_speech:
+            self.speech_frames += 1
+            self.trailing_silence = 0
+        elif self.speech_frames:
+            self.trailing_silence += 1
+
+    @property
+    def done(self) -> bool:
+        if self.frames >= self.max_frames:
+            return True
+        return self.speech_frames >= 3 and self.trailing_silence >= self.silence_frames_needed
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import os
+import re
+import time
+from contextlib import aclosing
+
+import numpy as np
+from fastapi import WebSocket
+
+from audio_utils import TARGET_RATE, encode_for_upload, to_mono_16k
+from gpt_utils import CHAT_BUSY_REPLY, CHAT_ERROR_REPLY, flagged_reply
+from gpt_utils import moderate_text, stream_chat_response, suggest_better_response, synthesize_speech, transcribe_audio
+from metrics import failed_fast, record, span
+from scheduler import UpstreamUnavailable
+from vad import TRAILING_SILENCE_MS, EndpointDetector, split_for_transcription, trim_silence
+
+# Sentence ends: . ! ? … (and ~, common in casual Korean) once the next token starts
+SENTENCE_END = re.compile(r"[.!?…~]+[\"'”’)\]]*\s")
+MIN_SENTENCE_CHARS = int(os.getenv("VOICE_MIN_SENTENCE_CHARS", "4"))
+BARGE_IN_FRAMES = int(os.getenv("VOICE_BARGE_IN_FRAMES", "5"))  # ~150 ms of speech interrupts the reply
+
+
+def ms_since(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+class SentenceSplitter:
+    """Cuts a stream of reply tokens into sentences, each as soon as it is complete.
+
+    Pieces shorter than `min_chars` ("네.") are joined with the next
+    sentence rather than synthesized on their own.
+    """
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, token: str) -> list:
+        self._buffer += token
+        sentences, start = [], 0
+        for m in SENTENCE_END.finditer(self._buffer):
+            sentence = self._buffer[start:m.end()].strip()
+            if len(sentence) >= self.min_chars:
+                sentences.append(sentence)
+                start = m.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> list:
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def audio_format(audio: bytes) -> str:
+    return "wav" if audio[:4] == b"RIFF" else "mp3"
+
+
+class VoiceSession:
+    """One full-duplex voice conversation over a WebSocket.
+
+    The client streams 16-bit mono PCM (binary frames at `rate` Hz) and may
+    keep streaming while the bot speaks. Each utterance ends when the
+    EndpointDetector hears `trailing_silence_ms` of silence after speech,
+    or when the client sends {"type": "end"} (push-to-talk). The turn then
+    runs as a pipeline: STT → moderation (concurrent with a speculative
+    reply) → reply tokens → TTS per sentence, sent in order as soon as each
+    sentence is synthesized, so playback starts while the model is still
+    generating. Speech heard during a reply (barge-in) cancels it.
+
+    Server frames (JSON text): endpoint, transcript, token, audio (followed
+    by one binary frame with the audio), flagged, interrupted, error, done
+    (with timings; `first_audio_ms` is end of speech → first audio byte).
+    `await on_turn(text, result)` runs for every completed or flagged turn.
+    """
+
+    def __init__(self, websocket: WebSocket, history: list, on_turn=None, moderate: bool = False,
+                 rate: int = TARGET_RATE, trailing_silence_ms: int = TRAILING_SILENCE_MS, barge_in: bool = True):
+        self.ws = websocket
+        self.history = list(history)
+        self.on_turn = on_turn
+        self.moderate = moderate
+        self.rate = rate
+        self.trailing_silence_ms = trailing_silence_ms
+        self.barge_in = barge_in
+        self._send_lock = asyncio.Lock()
+        self._reply = None
+
+    async def send(self, data: dict, audio: bytes = None):
+        async with self._send_lock:  # an audio header and its bytes go out back to back
+            await self.ws.send_text(json.dumps(data, ensure_ascii=False))
+            if audio is not None:
+                await self.ws.send_bytes(audio)
+
+    def _replying(self) -> bool:
+        return self._reply is not None and not self._reply.done()
+
+    async def run(self):
+        detector = EndpointDetector(self.rate, self.trailing_silence_ms)
+        captured = []
+        try:
+            while True:
+                message = await self.ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    return
+                ended = False
+                if message.get("bytes") is not None:
+                    samples = to_mono_16k(message["bytes"], self.rate, 1)
+                    captured.append(samples)
+                    ended = detector.feed(samples)
+                    if self.barge_in and self._replying() and detector.speech_frames >= BARGE_IN_FRAMES:
+                        self._reply.cancel()  # 🗣️ the learner talks over the bot: stop speaking
+                        await self.send({"type": "interrupted"})
+                else:
+                    event = json.loads(message.get("text") or "{}")
+                    if event.get("type") == "close":
+                        return
+                    ended = event.get("type") == "end"
+                if not ended:
+                    continue
+
+                # End of speech ≈ now minus the trailing silence the detector waited for
+                silence_ms = detector.trailing_silence * detector.frame_ms
+                speech_end = time.perf_counter() - silence_ms / 1000
+                samples = np.concatenate(captured) if captured else np.zeros(0, dtype=np.float32)
+                heard = detector.speech_frames > 0 or not detector.done
+                detector, captured = EndpointDetector(self.rate, self.trailing_silence_ms), []
+                if not heard:
+                    continue  # max_seconds of silence: start listening afresh
+                await self.send({"type": "endpoint", "silence_ms": silence_ms})
+                if self._replying():
+                    self._reply.cancel()
+                self._reply = asyncio.ensure_future(self._turn(samples, speech_end, silence_ms))
+        finally:
+            if self._reply is not None:
+                self._reply.cancel()
+
+    async def _transcribe(self, samples: np.ndarray) -> str:
+        samples = trim_silence(samples, TARGET_RATE) if len(samples) else samples
+        if len(samples) == 0:
+            return ""
+        fmt = os.getenv("AUDIO_UPLOAD_FORMAT", "wav")
+        segments = split_for_transcription(samples, TARGET_RATE)
+        return await transcribe_audio([encode_for_upload(s, fmt, name=f"speech_{i}") for i, s in enumerate(segments)])
+
+    async def _turn(self, samples: np.ndarray, speech_end: float, silence_ms: float):
+        timings = {"endpoint_ms": silence_ms}
+        start = time.perf_counter()
+        tokens = asyncio.Queue()
+        sentences = asyncio.Queue()
+        producer = speaker = None
+        # The speculative reply is only cached once moderation allows the turn
+        allowed = asyncio.get_running_loop().create_future() if self.moderate else None
+        try:
+            with span("stt", "voice"):
+                text = await self._transcribe(samples)
+            timings["stt_ms"] = ms_since(start)
+            await self.send({"type": "transcript", "text": text})
+            if not text:
+                return
+            user_turn = {"role": "user", "content": text}
+
+            async def pump():
+                try:
+                    async with aclosing(stream_chat_response(self.history + [user_turn], allowed)) as stream:
+                        async for token in stream:
+                            await tokens.put(token)
+                    await tokens.put(None)
+                except Exception as e:
+                    await tokens.put(e)
+
+            producer = asyncio.ensure_future(pump())  # 🏃 speculative: starts before moderation finishes
+            if self.moderate:
+                flagged, categories, words = await moderate_text(text)
+                timings["moderation_ms"] = ms_since(start)
+                allowed.set_result(not flagged)
+                if flagged:
+                    producer.cancel()
+                    alternative = await suggest_better_response(text)
+                    result = {"flagged": True, "flagged_categories": categories, "flagged_words": words,
+                              "alternative": alternative, "timings": timings}
+                    result["reply"] = flagged_reply(result)
+                    await self.send({"type": "flagged", **result})
+                    if self.on_turn:
+                        await self.on_turn(text, result)
+                    return
+
+            speaker = asyncio.ensure_future(self._speak(sentences, timings, speech_end))
+            splitter = SentenceSplitter()
+            reply = []
+            while (token := await tokens.get()) is not None:
+                if isinstance(token, Exception):
+                    raise token
+                if not reply:
+                    timings["ttft_ms"] = ms_since(start)
+                reply.append(token)
+                await self.send({"type": "token", "token": token})
+                for sentence in splitter.feed(token):
+                    await sentences.put((sentence, asyncio.ensure_future(synthesize_speech(sentence))))
+            for sentence in splitter.flush():
+                await sentences.put((sentence, asyncio.ensure_future(synthesize_speech(sentence))))
+            await sentences.put(None)
+            await speaker
+
+            reply = "".join(reply).strip()
+            timings["total_ms"] = ms_since(start)
+            self.history += [user_turn, {"role": "assistant", "content": reply}]
+            if self.on_turn:
+                await self.on_turn(text, {"reply": reply, "timings": timings})
+            await self.send({"type": "done", "reply": reply, "timings": timings})
+        except UpstreamUnavailable as e:
+            failed_fast("voice", e)
+            await self.send({"type": "error", "reply": CHAT_BUSY_REPLY, "retry_after": e.retry_after})
+        except asyncio.CancelledError:
+            raise  # barge-in or disconnect
+        except Exception as e:
+            print("❌ Voice turn error:", e)
+            await self.send({"type": "error", "reply": CHAT_ERROR_REPLY})
+        finally:
+            if allowed is not None:
+                allowed.cancel()  # no-op once the verdict is set
+            for task in (producer, speaker):
+                if task is not None:
+                    task.cancel()
+            while not sentences.empty():
+                item = sentences.get_nowait()
+                if item is not None:
+                    item[1].cancel()
+
+    async def _speak(self, sentences: asyncio.Queue, timings: dict, speech_end: float):
+        """Send each sentence's audio in order; synthesis of later sentences is already running."""
+        index = 0
+        while (item := await sentences.get()) is not None:
+            sentence, synthesis = item
+            try:
+                audio = await synthesis
+            except Exception as e:
+                print("❌ Voice TTS error:", e)
+                continue  # the text already went out as tokens
+            if index == 0:
+                timings["first_sentence_chars"] = len(sentence)
+                timings["first_audio_ms"] = ms_since(speech_end)
+                record("voice_first_audio", timings["first_audio_ms"] / 1000, "ws")
+            await self.send({"type": "audio", "index": index, "text": sentence, "format": audio_format(audio),
+                             "bytes": len(audio)}, audio)
+            index += 1
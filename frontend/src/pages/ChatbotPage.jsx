@@ -1,6 +1,5 @@
 import React, { useEffect, useRef, useState } from "react";
 import { useUser } from "../context/UserContext";
-import axios from "axios";
 import { useNavigate } from "react-router-dom";
 
 const ChatbotPage = () => {
@@ -15,6 +14,7 @@ const ChatbotPage = () => {
   const [lastReply, setLastReply] = useState("");
   const [repeatCount, setRepeatCount] = useState(1);
   const [speakingMessageIndex, setSpeakingMessageIndex] = useState(null);
+  const [sessionId, setSessionId] = useState(null);
 
   const chatEndRef = useRef(null);
 
@@ -111,33 +111,100 @@ const ChatbotPage = () => {
     setMessages([system, start]);
     setLastReply(start.content);
     if (ttsEnabled) speak(start.content, repeatCount, 1);
+
+    // 💾 History lives on the server; each turn only sends the new message
+    fetch("http://localhost:8000/sessions", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ opening_line: start.content, system_prompt: system.content }),
+    })
+      .then((res) => res.json())
+      .then((data) => setSessionId(data.session_id))
+      .catch((err) => console.error("Session error:", err));
   }, [selectedScenario, navigate]);
 
   const userMessageCount = messages.filter((m) => m.role === "user").length;
   const limitReached = userMessageCount >= 5;
 
+  // 🔊 Queue one sentence without cancelling what is already being spoken
+  const speakSentence = (text, index, lang = "ko-KR") => {
+    const synth = window.speechSynthesis;
+    if (!synth || !text.trim()) return;
+
+    const utter = new SpeechSynthesisUtterance(text);
+    utter.lang = lang;
+    utter.onstart = () => setSpeakingMessageIndex(index);
+    utter.onend = () => setSpeakingMessageIndex(null);
+    synth.speak(utter);
+  };
+
   const handleSend = async () => {
-    if (!input.trim() || limitReached) return;
+    if (!input.trim() || limitReached || !sessionId) return;
 
     const updatedMessages = [...messages, { role: "user", content: input }];
-    setMessages(updatedMessages);
+    const replyIndex = updatedMessages.length;
+    // Speak sentence-by-sentence while streaming only when no repeat is requested
+    const speakPartial = ttsEnabled && repeatCount === 1;
+    setMessages([...updatedMessages, { role: "assistant", content: "" }]);
     setInput("");
     setLoading(true);
+    if (speakPartial) window.speechSynthesis?.cancel();
+
+    let reply = "";
+    let spokenUpTo = 0;
+    const showReply = (text) =>
+      setMessages([...updatedMessages, { role: "assistant", content: text }]);
 
     try {
-      const res = await axios.post("http://localhost:8000/chat", {
-        messages: updatedMessages,
+      const res = await fetch(`http://localhost:8000/sessions/${sessionId}/turns/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ content: input }),
       });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE frames are separated by a blank line
+        const frames = buffer.split("\n\n");
+        buffer = frames.pop();
+        for (const frame of frames) {
+          const event = frame.match(/^event: (.*)$/m)?.[1];
+          const data = frame.match(/^data: (.*)$/m)?.[1];
+          if (!data) continue;
+          const parsed = JSON.parse(data);
+
+          if (event === "token") {
+            reply += parsed.token;
+          } else {
+            reply = parsed.reply;
+          }
+          showReply(reply);
+
+          // 🔊 Speak each finished sentence as soon as it arrives
+          if (speakPartial) {
+            const pending = reply.slice(spokenUpTo);
+            const boundary = event === "token" ? pending.search(/[.!?。？！]\s[^.!?。？！]*$/) : pending.length - 1;
+            if (boundary >= 0) {
+              speakSentence(pending.slice(0, boundary + 1), replyIndex);
+              spokenUpTo += boundary + 1;
+            }
+          }
+        }
+      }
 
-      const reply = res.data.reply;
-      const newMessages = [...updatedMessages, { role: "assistant", content: reply }];
-      setMessages(newMessages);
       setLastReply(reply);
-
-      if (ttsEnabled) speak(reply, repeatCount, newMessages.length - 1);
+      if (ttsEnabled && !speakPartial) speak(reply, repeatCount, replyIndex);
     } catch (err) {
       console.error("Chatbot error:", err);
-      setMessages([...updatedMessages, { role: "assistant", content: "⚠️ 응답을 가져오는 데 실패했습니다." }]);
+      showReply("⚠️ 응답을 가져오는 데 실패했습니다.");
     } finally {
       setLoading(false);
     }
@@ -179,7 +246,7 @@ const ChatbotPage = () => {
       />
 
       <div className="d-flex flex-wrap gap-2 align-items-center">
-        <button className="btn btn-primary" onClick={handleSend} disabled={loading || limitReached}>
+        <button className="btn btn-primary" onClick={handleSend} disabled={loading || limitReached || !sessionId}>
           {loading ? "응답 중..." : "보내기"}
         </button>
 
@@ -1,6 +1,5 @@
 import React, { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
-import axios from "axios";
 import { useUser } from "../context/UserContext";
 
 const ScenarioScreen = () => {
@@ -17,18 +16,45 @@ const ScenarioScreen = () => {
     const fetchScenarios = async () => {
       try {
         setLoading(true);
-        const res = await axios.post("http://localhost:8000/scenarios", userInfo, {
-          headers: { "Content-Type": "application/json" }
+        // 🌊 Streamed: each scenario is shown as soon as the model has finished it
+        const res = await fetch("http://localhost:8000/scenarios?stream=true", {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify(userInfo),
         });
-    
-        console.log("🎯 GPT Structured Response:", res.data.scenarios);
-    
-        if (Array.isArray(res.data.scenarios)) {
-          setScenarios(res.data.scenarios);
-          setIsLoaded(true);  // ✅ Set loaded flag only after setting scenarios
-        } else {
-          throw new Error("Scenarios is not an array");
+        if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        const received = [];
+        let buffer = "";
+
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+
+          // SSE frames are separated by a blank line
+          const frames = buffer.split("\n\n");
+          buffer = frames.pop();
+          for (const frame of frames) {
+            const event = frame.match(/^event: (.*)$/m)?.[1];
+            const data = frame.match(/^data: (.*)$/m)?.[1];
+            if (!data) continue;
+            const parsed = JSON.parse(data);
+
+            if (event === "scenario") {
+              received.push(parsed.scenario);
+              setScenarios([...received]);
+              setIsLoaded(true);  // ✅ Show the list as soon as the first scenario arrives
+            } else if (event === "error") {
+              throw new Error("Scenario stream failed");
+            }
+          }
         }
+
+        console.log("🎯 GPT Structured Response:", received);
+        if (received.length === 0) throw new Error("No scenarios received");
       } catch (err) {
         console.error("Failed to fetch scenarios:", err);
         setError("시나리오를 불러오는 데 실패했습니다.");
@@ -58,7 +84,7 @@ const ScenarioScreen = () => {
       {loading && <p>시나리오 생성 중... ⏳</p>}
       {error && <p className="text-danger">{error}</p>}
 
-      {!loading && isLoaded && scenarios.length > 0 &&(
+      {isLoaded && scenarios.length > 0 &&(
   <div className="mb-3">
     <select className="form-select" onChange={handleSelect} defaultValue="">
       <option value="" disabled>시나리오를 선택하세요</option>